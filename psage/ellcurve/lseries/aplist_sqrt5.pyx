@@ -46,11 +46,20 @@ from sage.rings.integer cimport Integer
 
 from psage.libs.smalljac.wrapper1 import elliptic_curve_ap
 
-from psage.number_fields.sqrt5.prime import primes_of_bounded_norm
+from psage.number_fields.sqrt5.prime import primes_of_bounded_norm, prime_range
 
 from psage.modform.hilbert.sqrt5.sqrt5_fast cimport ResidueRing_abstract, residue_element
 from psage.modform.hilbert.sqrt5.sqrt5_fast import ResidueRing
 
+from sage.parallel.decorate import parallel
+import sage.parallel.ncpus
+
+import numpy as np
+
+# Entry of the int32 arrays returned by aplist_parallel for an `a_P`
+# that was not computed (it plays the role of None in aplist).
+APLIST_UNKNOWN = 2**31 - 1
+
 def short_weierstrass_invariants(E):
     """
     Compute the invariants of a short Weierstrass form of E.
@@ -157,6 +166,147 @@ def aplist(E, bound, fast_only=False):
         aplist_remaining_slow(E, v, primes)
     return v
 
+def aplist_parallel(E, bound, ncpus=None, chunk_size=None, fast_only=False, inert=None):
+    """
+    Compute the traces of Frobenius `a_P` of the elliptic curve E over
+    Q(sqrt(5)) for all primes `P` with norm less than the given bound,
+    using several worker processes.
+
+    The range of norms is cut into intervals, and each worker process
+    enumerates the primes in its intervals itself (using prime_range),
+    so no list of primes is ever built or sent between processes.  The
+    results are merged into one int32 array, with the `a_P` in the
+    same order as the output of primes_of_bounded_norm(bound).
+
+    INPUT:
+        - `E` -- an elliptic curve given by an integral model over
+          the number field with defining polynomial `x^2-x-1`.
+        - ``bound`` -- a nonnegative integer
+        - ``ncpus`` -- integer (default: number of cpus)
+        - ``chunk_size`` -- integer (default: None); length of the
+          intervals of norms handled by one worker at a time.  By
+          default the range is cut into 8*ncpus intervals.
+        - ``fast_only`` -- (bool, default: False) -- if True, only the
+          `a_P` that can be computed efficiently are computed, and the
+          rest are set to APLIST_UNKNOWN
+        - ``inert`` -- an InertTraceCalculator (default: None); if
+          given, its tables are used for the inert primes it knows.
+          Since the tables only depend on the prime, the same
+          calculator can be used for many curves (see
+          InertTraceCalculator.init_tables).
+
+    OUTPUT:
+        - numpy array of type int32
+
+    EXAMPLES::
+
+        sage: from psage.ellcurve.lseries.aplist_sqrt5 import aplist, aplist_parallel
+        sage: K.<a> = NumberField(x^2-x-1); E = EllipticCurve([1,-a,a,a-1,a+3])
+        sage: v = aplist_parallel(E, 60, ncpus=2); v.dtype
+        dtype('int32')
+        sage: list(v)
+        [1, -2, 2, -4, -2, 0, -5, 0, -5, 0, 2, 11, 12, 10, -11, -6]
+        sage: list(aplist_parallel(E, 10^4, ncpus=2, chunk_size=1000)) == aplist(E, 10^4)
+        True
+
+    The inert primes can be handled using precomputed tables::
+
+        sage: import psage.ellcurve.lseries.sqrt5 as sqrt5
+        sage: C = sqrt5.InertTraceCalculator(); C.init_tables(sqrt5.inert_primes(10^4), ncpus=2)
+        sage: list(aplist_parallel(E, 10^4, ncpus=2, inert=C)) == aplist(E, 10^4)
+        True
+
+    With fast_only, the `a_P` that would require slow methods are
+    set to APLIST_UNKNOWN::
+
+        sage: from psage.ellcurve.lseries.aplist_sqrt5 import APLIST_UNKNOWN
+        sage: w = aplist_parallel(E, 60, ncpus=2, fast_only=True)
+        sage: [None if b == APLIST_UNKNOWN else b for b in w] == aplist(E, 60, fast_only=True)
+        True
+        sage: aplist_parallel(E, 0)
+        array([], dtype=int32)
+    """
+    if list(E.base_field().defining_polynomial()) != [-1,-1,1]:
+        raise ValueError, "E must have base field with defining polynomial x^2-x-1"
+    bound = int(bound)
+    if bound >= 2**31:
+        raise ValueError, "bound must be less than 2^31"
+    if ncpus is None:
+        ncpus = sage.parallel.ncpus.ncpus()
+    if chunk_size is None:
+        chunk_size = max(1000, (bound + 8*ncpus - 1) // (8*ncpus))
+    chunk_size = int(chunk_size)
+    if chunk_size <= 0:
+        raise ValueError, "chunk_size must be positive"
+
+    A, B = short_weierstrass_invariants(E)
+    # Everything needed by the workers is computed here, once, so that
+    # the forked processes inherit it.
+    if fast_only:
+        F = N = None
+    else:
+        F = E.global_minimal_model()
+        N = F.conductor()
+    if inert is not None:
+        D = 4*A*A*A + 27*B*B
+        if B:
+            inert = (inert, (-110592*A*A*A)/(-64*A*A*A - 432*B*B),
+                     (-48*A)/(-864*B), [Integer(c) for c in D._coefficients()])
+        else:
+            # c4/c6 is infinite, which the tables don't handle
+            inert = None
+
+    intervals = [(start, min(start + chunk_size, bound))
+                 for start in range(0, bound, chunk_size)]
+    if len(intervals) == 0:
+        return np.zeros(0, dtype=np.int32)
+
+    pieces = {}
+    for X in parallel(ncpus)(_aplist_interval)(
+              [(A, B, start, stop, F, N, inert) for start, stop in intervals]):
+        start = X[0][0][2]
+        if not isinstance(X[1], np.ndarray):
+            raise RuntimeError, "computation of a_P for norms in [%s, %s) failed"%(
+                start, min(start + chunk_size, bound))
+        pieces[start] = X[1]
+    return np.concatenate([pieces[start] for start, _ in intervals])
+
+def _aplist_interval(A, B, start, stop, F, N, inert):
+    """
+    Return int32 array of the `a_P` of `y^2=x^3+Ax+B` for the primes
+    with norm in [start, stop).  This is run by the worker processes
+    of aplist_parallel; see there for the meaning of F, N and inert.
+    """
+    primes = prime_range(start, stop)
+    v = aplist_short(A, B, primes)
+    if inert is not None:
+        _aplist_inert(v, primes, *inert)
+    if F is not None:
+        _aplist_remaining_slow(F, N, v, primes)
+    return np.array([APLIST_UNKNOWN if ap is None else ap for ap in v], dtype=np.int32)
+
+def _aplist_inert(v, primes, C, j, c_quo, D):
+    """
+    Fill in the entries of v that are None at inert primes for which
+    the InertTraceCalculator C has a table.  Here j and c_quo are the
+    j-invariant and c4/c6 of the curve, and D is the list of
+    coefficients of `4A^3+27B^2`, which is used to skip the primes
+    where the short Weierstrass model is singular.
+    """
+    cdef Py_ssize_t i
+    cdef dict tables = C.tables
+    for i in range(len(v)):
+        P = primes[i]
+        if v[i] is None and P.is_inert() and tables.has_key(P.p):
+            if all([c % P.p == 0 for c in D]):
+                continue
+            try:
+                v[i] = C.trace_of_frobenius(j, c_quo, P.p)
+            except (NotImplementedError, ArithmeticError):
+                # j = 0 or 1728 (NotImplementedError), or j or c4/c6 not
+                # integral at P (ZeroDivisionError) -- leave this to the slow method
+                pass
+
 def aplist_remaining_slow(E, v, primes):
     """
     Compute -- using possibly very slow methods -- the `a_P` in the
@@ -197,9 +347,16 @@ def aplist_remaining_slow(E, v, primes):
     """
     if len(v) != len(primes):
         raise ValueError, "input lists v and primes must have the same length"
-    cdef Py_ssize_t i
     F = E.global_minimal_model()
-    N = F.conductor()
+    _aplist_remaining_slow(F, F.conductor(), v, primes)
+
+def _aplist_remaining_slow(F, N, v, primes):
+    """
+    Same as aplist_remaining_slow, but with the global minimal model F
+    and its conductor N given, so they are only computed once when
+    the primes are processed in several pieces.
+    """
+    cdef Py_ssize_t i
     for i in range(len(v)):
         if v[i] is None:
             P = primes[i].sage_ideal()
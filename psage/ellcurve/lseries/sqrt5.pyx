@@ -357,6 +357,21 @@ def inert_primes(N):
 
 from sage.stats.intlist cimport IntList
 
+from sage.parallel.decorate import parallel
+import sage.parallel.ncpus
+
+def _inert_table_worker(long p):
+    """
+    Return the lists of entries of the 'ap', 'c_quo' and 'squares'
+    tables of an InertTraceCalculator for the inert prime p.  The
+    residue ring is not returned, since it can't be pickled; it is
+    recreated by InertTraceCalculator.init_tables.
+    """
+    C = InertTraceCalculator()
+    C.init_table(p)
+    T = C.tables[p]
+    return T['ap'].list(), T['c_quo'].list(), T['squares'].list()
+
 def unpickle_InertTraceCalculator(tables):
     C = InertTraceCalculator()
     C.tables = tables
@@ -394,6 +409,44 @@ cdef class InertTraceCalculator:
             return a
         
 
+    def init_tables(self, primes, ncpus=None):
+        """
+        Create the tables for all inert primes `p\geq 7` in the list
+        primes that aren't already known.  The tables for different
+        primes are computed by separate worker processes.
+
+        INPUT:
+            - primes -- list of integers
+            - ncpus -- integer (default: number of cpus)
+
+        EXAMPLES::
+
+            sage: import psage.ellcurve.lseries.sqrt5 as sqrt5
+            sage: C = sqrt5.InertTraceCalculator()
+            sage: C.init_tables(sqrt5.inert_primes(2000), ncpus=2); C
+            Inert trace calculator with precomputed tables for p in {[7, 13, 17, 23, 37, 43]}
+            sage: D = sqrt5.InertTraceCalculator(); D.init_table(37)
+            sage: D.tables[37]['ap'].list() == C.tables[37]['ap'].list()
+            True
+        """
+        todo = sorted(set([int(p) for p in primes
+                           if p >= 7 and (p%5 == 2 or p%5 == 3) and not self.tables.has_key(p)]))
+        if len(todo) == 0:
+            return
+        if ncpus is None:
+            ncpus = sage.parallel.ncpus.ncpus()
+        from psage.modform.hilbert.sqrt5.sqrt5 import F
+        # The largest primes are by far the most expensive (the cost is
+        # about p^4), so start them first.
+        todo.reverse()
+        for X in parallel(ncpus)(_inert_table_worker)(todo):
+            p = X[0][0][0]
+            if not isinstance(X[1], tuple):
+                raise RuntimeError, "computation of the table for p=%s failed"%p
+            ap, c_quo, squares = X[1]
+            self.tables[p] = {'R':ResidueRing(F.ideal(p), 1), 'ap':IntList(ap),
+                              'c_quo':IntList(c_quo), 'squares':IntList(squares)}
+
     def init_table(self, int p):
         assert p >= 7 and (p%5 == 2 or p%5 == 3)  # inert prime >= 7
         if self.tables.has_key(p):
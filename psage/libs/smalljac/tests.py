@@ -24,3 +24,33 @@ def test2(B=500):
 
     
     
+def test3(B=10**5):
+    from sage.all import polygen, QQ
+    import psage.libs.smalljac.wrapper
+    from psage.libs.smalljac.wrapper1 import BAD_PRIME
+    x = polygen(QQ, 'x')
+    J = psage.libs.smalljac.wrapper.SmallJac(x**3 + 17*x + 3)
+    d = J.ap(0, B)
+    for ncpus in [1, 2]:
+        primes, ap = J.ap_array(0, B, ncpus=ncpus, chunk_size=B//7)
+        assert sorted(d.keys()) == list(primes)
+        for p, a in zip(primes, ap):
+            assert d[p] == (None if a == BAD_PRIME else a)
+    v = [(list(P), list(A)) for P, A in J.ap_iter(0, B, chunk_size=B//7, ncpus=2)]
+    assert sum([P for P, _ in v], []) == list(primes)
+    assert sum([A for _, A in v], []) == list(ap)
+
+def test4(B=2000):
+    from sage.all import EllipticCurve
+    from psage.libs.smalljac.wrapper1 import elliptic_curves_ap, BAD_PRIME
+    curves = [[a4, a6] for a4 in range(-3, 4) for a6 in [1, 3, 5]] + [[0,-1,1,-10,-20], [1,0,1,4,-6]]
+    for ncpus in [1, 2]:
+        primes, A = elliptic_curves_ap(curves, 0, B, ncpus=ncpus)
+        for v, row in zip(curves, A):
+            E = EllipticCurve(v)
+            N = E.discriminant()
+            for p, a in zip(primes, row):
+                if a != BAD_PRIME:
+                    assert E.ap(p) == a
+                else:
+                    assert N % p == 0 or p in [2, 3]
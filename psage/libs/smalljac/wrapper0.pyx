@@ -1,14 +1,85 @@
 from defs cimport *
 
+from sage.parallel.decorate import parallel
+import sage.parallel.ncpus
+
+import numpy as np
+cimport numpy as cnp
+cnp.import_array()
+
+# Entry stored by ap_array, frob_array, ap_iter and frob_iter at the
+# primes of bad reduction for the given model.
+BAD_PRIME = -9223372036854775807 - 1
+cdef cnp.int64_t c_BAD_PRIME = -9223372036854775807 - 1
+
+cdef struct array_fill_t:
+    cnp.int64_t* primes   # primes[i] is the i-th prime of the range
+    cnp.int64_t* values   # row i (of length width) belongs to primes[i]
+    Py_ssize_t n          # number of rows allocated
+    Py_ssize_t i          # next row to be filled
+    int width
+    bint negate
+
+cdef int callback_fill_array(smalljac_Qcurve_t c, unsigned long p, int good,  long a[],  int n, void *arg):
+    cdef array_fill_t* t = <array_fill_t*>arg
+    cdef cnp.int64_t* row
+    cdef int j
+    if t.i >= t.n:
+        return 0
+    t.primes[t.i] = p
+    row = t.values + t.i*t.width
+    for j in range(t.width):
+        if good and j < n:
+            if t.negate:
+                row[j] = -a[j]
+            else:
+                row[j] = a[j]
+        else:
+            row[j] = c_BAD_PRIME
+    t.i += 1
+    return 1
+
+def _prime_count(unsigned long start, unsigned long end):
+    """
+    Return the number of primes in the closed interval [start, end].
+    """
+    from sage.all import prime_pi
+    if end < start:
+        return 0
+    if start <= 2:
+        return int(prime_pi(end))
+    return int(prime_pi(end) - prime_pi(start-1))
+
+def _subranges(unsigned long p, unsigned long b, chunk_size):
+    """
+    Split the closed interval [p, b] into consecutive closed intervals
+    of length at most chunk_size.
+    """
+    if b < p:
+        return []
+    chunk_size = max(int(chunk_size), 1)
+    v = []
+    s = p
+    while s <= b:
+        e = min(s + chunk_size - 1, b)
+        v.append((s, e))
+        s = e + 1
+    return v
+
+def _range_arrays_worker(curve, start, end, count, flags, width, negate):
+    return SmallJac(curve)._range_arrays(start, end, count, flags, width, negate)
+
 cdef class SmallJac:
     cdef smalljac_Qcurve_t c
     cdef object tmp
+    cdef object curve
     
     def __cinit__(self):
         self.c = <smalljac_Qcurve_t>0
         
     def __init__(self, v):
         curve = str(v)
+        self.curve = curve
         cdef int err
         self.c = smalljac_Qcurve_init(curve, &err)
         if err:
@@ -86,6 +157,175 @@ cdef class SmallJac:
         smalljac_Lpolys(self.c, p, b, 0, callback_Lpolys, <void*>self)
         return self.tmp
 
+    def _fill_arrays(self, unsigned long p, unsigned long b, unsigned long flags,
+                     int width, bint negate, cnp.ndarray primes, cnp.ndarray values):
+        """
+        Fill the C-contiguous int64 arrays primes and values (of shape
+        (n,) and (n,width), or (n,) if width is 1) with the primes in
+        [p, b] and the corresponding coefficients, without creating any
+        Python objects.  Return the number of primes filled in.
+        """
+        cdef array_fill_t t
+        cdef long r
+        t.primes = <cnp.int64_t*> primes.data
+        t.values = <cnp.int64_t*> values.data
+        t.n = primes.shape[0]
+        t.i = 0
+        t.width = width
+        t.negate = negate
+        r = smalljac_Lpolys(self.c, p, b, flags, callback_fill_array, <void*>&t)
+        if r < 0:
+            raise RuntimeError, "smalljac error code %s computing [%s, %s]"%(r, p, b)
+        return t.i
+
+    def _range_arrays(self, unsigned long p, unsigned long b, count,
+                      unsigned long flags, int width, bint negate):
+        """
+        Return arrays (primes, values) for the closed interval [p, b],
+        which contains exactly count primes.
+        """
+        primes = np.empty(count, dtype=np.int64)
+        if width == 1:
+            values = np.empty(count, dtype=np.int64)
+        else:
+            values = np.empty((count, width), dtype=np.int64)
+        if count:
+            n = self._fill_arrays(p, b, flags, width, negate, primes, values)
+            if n != count:
+                raise RuntimeError, "expected %s primes in [%s, %s] but got %s"%(count, p, b, n)
+        return primes, values
+
+    def _arrays(self, unsigned long p, unsigned long b, unsigned long flags,
+                int width, bint negate, ncpus, chunk_size):
+        if ncpus is None:
+            ncpus = sage.parallel.ncpus.ncpus()
+        if chunk_size is None:
+            chunk_size = max((b - p + 1) // (8*ncpus) + 1, 10**5)
+        ranges = _subranges(p, b, chunk_size)
+        counts = [_prime_count(s, e) for s, e in ranges]
+        offsets = {}
+        total = 0
+        for (s, e), k in zip(ranges, counts):
+            offsets[s] = (total, k)
+            total += k
+
+        # All results are written into these two preallocated arrays.
+        primes = np.empty(total, dtype=np.int64)
+        if width == 1:
+            values = np.empty(total, dtype=np.int64)
+        else:
+            values = np.empty((total, width), dtype=np.int64)
+
+        if ncpus == 1 or len(ranges) <= 1:
+            for s, e in ranges:
+                i, k = offsets[s]
+                if k and self._fill_arrays(s, e, flags, width, negate,
+                                           primes[i:i+k], values[i:i+k]) != k:
+                    raise RuntimeError, "wrong number of primes in [%s, %s]"%(s, e)
+            return primes, values
+
+        args = [(self.curve, s, e, k, flags, width, negate) for (s, e), k in zip(ranges, counts)]
+        for X, Y in parallel(ncpus)(_range_arrays_worker)(args):
+            if not isinstance(Y, tuple):
+                raise RuntimeError, "computation of [%s, %s] failed: %s"%(X[0][1], X[0][2], Y)
+            i, k = offsets[X[0][1]]
+            primes[i:i+k] = Y[0]
+            values[i:i+k] = Y[1]
+        return primes, values
+
+    def _iter(self, unsigned long p, unsigned long b, unsigned long flags,
+              int width, bint negate, ncpus, chunk_size):
+        if ncpus is None:
+            ncpus = sage.parallel.ncpus.ncpus()
+        ranges = _subranges(p, b, chunk_size)
+        for j in range(0, len(ranges), ncpus):
+            batch = ranges[j:j+ncpus]
+            args = [(self.curve, s, e, _prime_count(s, e), flags, width, negate) for s, e in batch]
+            if ncpus == 1:
+                yield _range_arrays_worker(*args[0])
+                continue
+            results = {}
+            for X, Y in parallel(ncpus)(_range_arrays_worker)(args):
+                if not isinstance(Y, tuple):
+                    raise RuntimeError, "computation of [%s, %s] failed: %s"%(X[0][1], X[0][2], Y)
+                results[X[0][1]] = Y
+            for s, e in batch:
+                yield results[s]
+
+    def ap_array(self, unsigned long p, unsigned long b, ncpus=1, chunk_size=None):
+        """
+        Return a pair (primes, ap) of int64 NumPy arrays, where primes
+        are the primes in [p, b] and ap[i] is the trace of Frobenius at
+        primes[i], or BAD_PRIME if primes[i] is bad for the given model.
+
+        This is the same data as ``self.ap(p, b)``, but no Python object
+        is created per prime.  The interval is split into subintervals of
+        length chunk_size, which are computed on ncpus processes (all
+        available cpus if ncpus is None) and written straight into the
+        preallocated output arrays.
+
+        EXAMPLES::
+
+            sage: import psage.libs.smalljac.wrapper as smalljac
+            sage: C = smalljac.SmallJac(x^3 - 13392*x - 1080432)
+            sage: primes, ap = C.ap_array(19, 37)
+            sage: primes
+            array([19, 23, 29, 31, 37])
+            sage: ap
+            array([ 0, -1,  0,  7,  3])
+            sage: primes, ap = C.ap_array(0, 10^4, ncpus=2, chunk_size=1000)
+            sage: d = C.ap(0, 10^4)
+            sage: from psage.libs.smalljac.wrapper1 import BAD_PRIME
+            sage: all(d[p] == (a if a != BAD_PRIME else None) for p, a in zip(primes, ap))
+            True
+        """
+        return self._arrays(p, b, SMALLJAC_A1_ONLY, 1, True, ncpus, chunk_size)
+
+    def frob_array(self, unsigned long p, unsigned long b, ncpus=1, chunk_size=None):
+        """
+        Return a pair (primes, a) of int64 NumPy arrays, where primes
+        are the primes in [p, b] and the row a[i] holds the g
+        coefficients a_1, ..., a_g of the L-polynomial at primes[i], or
+        BAD_PRIME if primes[i] is bad for the given model.  See
+        :meth:`ap_array` for ncpus and chunk_size.
+
+        EXAMPLES::
+
+            sage: import psage.libs.smalljac.wrapper as smalljac
+            sage: C = smalljac.SmallJac(x^5 + 17*x + 3)
+            sage: primes, a = C.frob_array(45, 500, ncpus=2, chunk_size=100)
+            sage: from psage.libs.smalljac.wrapper2 import BAD_PRIME
+            sage: all(C.frob(p).charpoly().list()[3:1:-1] == list(a[i]) for i, p in enumerate(primes) if a[i,0] != BAD_PRIME)
+            True
+        """
+        return self._arrays(p, b, 0, self.genus(), False, ncpus, chunk_size)
+
+    def ap_iter(self, unsigned long p, unsigned long b, chunk_size=10**6, ncpus=1):
+        """
+        Iterate over pairs (primes, ap) of int64 NumPy arrays as in
+        :meth:`ap_array`, one pair for each subinterval of [p, b] of
+        length chunk_size, in increasing order.  Only ncpus chunks are
+        held in memory at a time, so this is suitable for huge bounds.
+
+        EXAMPLES::
+
+            sage: import psage.libs.smalljac.wrapper as smalljac
+            sage: C = smalljac.SmallJac(x^3 - 13392*x - 1080432)
+            sage: [list(v) for v, _ in C.ap_iter(0, 40, chunk_size=20)]
+            [[2, 3, 5, 7, 11, 13, 17, 19], [23, 29, 31, 37]]
+            sage: sum(len(v) for v, _ in C.ap_iter(0, 10^5, chunk_size=10^4, ncpus=2))
+            9592
+        """
+        return self._iter(p, b, SMALLJAC_A1_ONLY, 1, True, ncpus, chunk_size)
+
+    def frob_iter(self, unsigned long p, unsigned long b, chunk_size=10**6, ncpus=1):
+        """
+        Iterate over pairs (primes, a) of int64 NumPy arrays as in
+        :meth:`frob_array`, one pair for each subinterval of [p, b] of
+        length chunk_size, in increasing order.
+        """
+        return self._iter(p, b, 0, self.genus(), False, ncpus, chunk_size)
+
     def group(self, unsigned long p, unsigned long b=0):
         raise NotImplementedError
 
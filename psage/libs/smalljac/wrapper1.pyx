@@ -69,3 +69,106 @@ cpdef long elliptic_curve_ap(unsigned long a4, unsigned long a6, unsigned long p
     cdef long a[2]
     smalljac_Lpoly(a, s, p, flags)
     return -a[0]
+
+def _weierstrass_string(v):
+    v = [int(a) for a in v]
+    if len(v) == 2:
+        v = [0, 0, 0] + v
+    if len(v) != 5:
+        raise ValueError, "each curve must be given as [a4,a6] or [a1,a2,a3,a4,a6]"
+    return '[%s,%s,%s,%s,%s]'%tuple(v)
+
+def _fill_curves_ap(curves, unsigned long p, unsigned long b, cnp.ndarray A):
+    """
+    Fill row i of the C-contiguous int64 array A with the traces of
+    Frobenius of the curve given by the Weierstrass string curves[i]
+    at the A.shape[1] primes in [p, b].
+    """
+    cdef Py_ssize_t i, n = A.shape[1]
+    cdef array_fill_t t
+    cdef smalljac_Qcurve_t c
+    cdef int err
+    cdef long r
+    if n == 0:
+        return
+    # The primes written by the callback are the same for every curve,
+    # so one scratch buffer is shared by all of them.
+    cdef cnp.ndarray scratch = np.empty(n, dtype=np.int64)
+    t.primes = <cnp.int64_t*> scratch.data
+    t.n = n
+    t.width = 1
+    t.negate = True
+    for i in range(len(curves)):
+        curve = curves[i]
+        err = 0
+        c = smalljac_Qcurve_init(curve, &err)
+        if err:
+            raise RuntimeError, "Error code %s for the curve %s"%(err, curve)
+        t.values = (<cnp.int64_t*> A.data) + i*n
+        t.i = 0
+        r = smalljac_Lpolys(c, p, b, SMALLJAC_A1_ONLY, callback_fill_array, <void*>&t)
+        smalljac_Qcurve_clear(c)
+        if r < 0:
+            raise RuntimeError, "smalljac error code %s for the curve %s"%(r, curve)
+        if t.i != n:
+            raise RuntimeError, "expected %s primes in [%s, %s] but got %s"%(n, p, b, t.i)
+
+def _elliptic_curves_ap_worker(start, curves, p, b, n):
+    A = np.empty((len(curves), n), dtype=np.int64)
+    _fill_curves_ap(curves, p, b, A)
+    return A
+
+def elliptic_curves_ap(curves, unsigned long p, unsigned long b, ncpus=1):
+    """
+    Return a pair (primes, A) of int64 NumPy arrays, where primes are
+    the primes in [p, b] and A[i,j] is the trace of Frobenius of the
+    i-th curve at primes[j], or BAD_PRIME if primes[j] is bad for the
+    given model.
+
+    INPUT:
+
+    - ``curves`` -- list or matrix whose rows are the coefficients
+      [a4,a6] or [a1,a2,a3,a4,a6] of Weierstrass equations over ZZ
+    - ``p``, ``b`` -- nonnegative integers
+    - ``ncpus`` -- number of processes (default: 1); if None, use all
+      available cpus
+
+    The table of primes and the output array are set up once for all
+    curves, and each curve fills its row of A directly, without creating
+    a SmallJac object or any Python object per prime.  The curves are
+    split into blocks which are computed in parallel.
+
+    EXAMPLES::
+
+        sage: from psage.libs.smalljac.wrapper1 import elliptic_curves_ap
+        sage: primes, A = elliptic_curves_ap([[-1,0], [0,-1,1,-10,-20], [0,0,1,-1,0]], 5, 30)
+        sage: primes
+        array([ 5,  7, 11, 13, 17, 19, 23, 29])
+        sage: A[1:].tolist()
+        [[1, -2, -9223372036854775808, 4, -2, 0, -1, 0], [-2, -1, -5, -2, 0, 0, 2, 6]]
+        sage: [EllipticCurve([-1,0]).ap(p) for p in primes] == list(A[0])
+        True
+        sage: M = matrix(ZZ, 40, 2, range(1, 81))
+        sage: B = elliptic_curves_ap(M, 0, 1000, ncpus=2)[1]
+        sage: (B == elliptic_curves_ap(M, 0, 1000)[1]).all()
+        True
+    """
+    from sage.all import prime_range
+    curves = [_weierstrass_string(v) for v in curves]
+    primes = np.array(prime_range(p, b+1), dtype=np.int64)
+    n = len(primes)
+    A = np.empty((len(curves), n), dtype=np.int64)
+    if ncpus is None:
+        ncpus = sage.parallel.ncpus.ncpus()
+    if ncpus == 1 or len(curves) <= 1:
+        _fill_curves_ap(curves, p, b, A)
+        return primes, A
+
+    k = max(len(curves) // (4*ncpus), 1)
+    args = [(i, curves[i:i+k], p, b, n) for i in range(0, len(curves), k)]
+    for X, Y in parallel(ncpus)(_elliptic_curves_ap_worker)(args):
+        i = X[0][0]
+        if not isinstance(Y, np.ndarray):
+            raise RuntimeError, "computation for curves %s to %s failed: %s"%(i, i+len(X[0][1])-1, Y)
+        A[i:i+len(Y)] = Y
+    return primes, A
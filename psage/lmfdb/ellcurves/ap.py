@@ -31,10 +31,15 @@ def populate_db(address, level_min, level_max, pmax=100,
     included), using the given number of threads.
 
     Only curves with ap not yet set are affected by this function.
+
+    The a_p of all curves of a block are computed with one call to
+    smalljac; pari is only used at the primes that are bad for the
+    given model.
     """
     user, password = userpass()
     import math, random
     from sage.all import prime_range, parallel, pari
+    from psage.libs.smalljac.wrapper1 import elliptic_curves_ap, BAD_PRIME
 
     level_min = int(level_min); level_max = int(level_max)
     P = prime_range(pmax)
@@ -47,11 +52,22 @@ def populate_db(address, level_min, level_max, pmax=100,
         C = Connection(address).research
         C.authenticate(user, password)
         C = C.ellcurves
-        for v in C.find({'level':{'$gte':level_min, '$lt':level_max},
+        V = list(C.find({'level':{'$gte':level_min, '$lt':level_max},
                          'number':1,
-                         'ap':{'$exists':False}}):
-            E = pari('ellinit(%s,1)'%v['weq'])
-            ap = dict([(str(p),int(E.ellap(p))) for p in P])
+                         'ap':{'$exists':False}}))
+        if len(V) == 0 or len(P) == 0:
+            return
+        W = [[int(a) for a in str(v['weq']).strip('[]').split(',')] for v in V]
+        primes, A = elliptic_curves_ap(W, 0, P[-1])
+        for v, row in zip(V, A):
+            E = None
+            ap = {}
+            for p, a in zip(P, row):
+                if a == BAD_PRIME:
+                    if E is None:
+                        E = pari('ellinit(%s,1)'%v['weq'])
+                    a = E.ellap(p)
+                ap[str(p)] = int(a)
             C.update({'_id':v['_id']}, {'$set':{'ap':ap}})
 
     for ans in f(blocks):
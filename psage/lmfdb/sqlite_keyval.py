@@ -26,11 +26,88 @@ cPickle, and other useful tools built on top of it.
 """
 
 import cPickle, sqlite3, zlib
+from contextlib import contextmanager
+from collections import OrderedDict
+
+# An in-memory least recently used cache
+
+class LRUCache:
+    def __init__(self, max_items=1000, max_bytes=None):
+        """
+        A dictionary of bounded size which discards the least recently used items.
+
+        INPUTS:
+            - max_items -- integer; the maximal number of items
+            - max_bytes -- integer or None; the maximal total size of the items,
+              where the size of an item is given when it is stored (e.g. the
+              length of its pickle)
+        """
+        self._max_items = max_items
+        self._max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Return the item with the given key and mark it as recently used."""
+        try:
+            value, size = self._data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data[key] = (value, size)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, size=0):
+        """Store an item, evicting the least recently used ones if necessary."""
+        if self._max_bytes is not None and size > self._max_bytes:
+            return  # would evict everything else
+        try:
+            old_value, old_size = self._data.pop(key)
+            self._bytes -= old_size
+        except KeyError:
+            pass
+        self._data[key] = (value, size)
+        self._bytes += size
+        while len(self._data) > self._max_items or (self._max_bytes is not None and self._bytes > self._max_bytes):
+            k, (v, sz) = self._data.popitem(last=False)
+            self._bytes -= sz
+            self.evictions += 1
+
+    def discard(self, key):
+        """
+        Remove the item with the given key if it is present, counting
+        it as an invalidation (the value stored under key changed).
+        """
+        try:
+            value, size = self._data.pop(key)
+        except KeyError:
+            return
+        self._bytes -= size
+        self.invalidations += 1
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def stats(self):
+        """Return a dictionary of statistics."""
+        return {'hits':self.hits, 'misses':self.misses, 'evictions':self.evictions,
+                'invalidations':self.invalidations, 'items':len(self._data), 'bytes':self._bytes}
+
 
 # A key:value store
 
 class SQLiteKeyValueStore:
-    def __init__(self, file, compress=False):
+    def __init__(self, file, compress=False, wal=False, synchronous=None, cache_size=None,
+                 mmap_size=None, timeout=60, lru_size=0, lru_bytes=None):
         """
         Create or open the SQLite3-based key:value database stored in the given file.
 
@@ -38,14 +115,42 @@ class SQLiteKeyValueStore:
             - file -- string; the name of a file.
             - compress -- bool (default: False); if True, by default compress all
               pickled values using zlib
+            - wal -- bool (default: False); if True, use write-ahead logging, so
+              that readers do not block writers
+            - synchronous -- string or None; if given, the SQLite synchronous
+              setting, e.g. 'NORMAL', which together with wal=True avoids an
+              fsync per commit at the risk of losing the last commits on a
+              power failure
+            - cache_size -- integer or None; the SQLite page cache size
+              (in pages if positive, in KiB if negative)
+            - mmap_size -- integer or None; the number of bytes of the database
+              file that are memory mapped
+            - timeout -- float (default: 60); the number of seconds to wait
+              for a lock held by another process
+            - lru_size -- integer (default: 0); if positive, keep up to this many
+              unpickled values in a process-local LRUCache, so that repeated
+              lookups of the same key avoid the query and the unpickling
+            - lru_bytes -- integer or None; the maximal total size of the
+              (uncompressed) pickles of the values in the LRUCache
+
+        Values in the LRUCache are shared between lookups, so they should
+        not be modified.  Assignments and deletions through this object
+        invalidate the cached values, but changes made by other processes
+        are not seen until the values are evicted.
 
         You do not have to be consistent with the compress option.   The database will still
         work if you switch back and forth between compress=True and compress=False.
         """
-        self._db = sqlite3.connect(file)
+        # Transactions are managed explicitly (see _begin and batch), since
+        # the sqlite3 module would commit before each SAVEPOINT statement.
+        self._db = sqlite3.connect(file, timeout=timeout, isolation_level=None)
         self._cursor = self._db.cursor()
         self._file = file
         self._compress = compress
+        self._batch_depth = 0
+        self._in_transaction = False
+        self._lru = LRUCache(lru_size, lru_bytes) if lru_size > 0 else None
+        self._set_pragmas(wal, synchronous, cache_size, mmap_size)
         try:
             self._cursor.execute("select * from sqlite_master").next()
         except StopIteration:
@@ -53,10 +158,24 @@ class SQLiteKeyValueStore:
             try: 
                 self._cursor.execute("CREATE TABLE cache (key BLOB, value BLOB, compressed INTEGER, UNIQUE(key))")
                 self._cursor.execute("CREATE INDEX cache_idx ON cache(key)")
-                self._db.commit()
             except sqlite3.OperationalError: 
                 pass  # failure could happen if another process maybe created 
                       # and initialized the database at the same time.  That's fine.
+
+    def _set_pragmas(self, wal, synchronous, cache_size, mmap_size):
+        """Set the journal mode and the page cache parameters of the connection."""
+        try:
+            if wal:
+                self._cursor.execute("PRAGMA journal_mode=WAL").fetchall()
+            if synchronous is not None:
+                self._cursor.execute("PRAGMA synchronous=%s"%synchronous)
+            if cache_size is not None:
+                self._cursor.execute("PRAGMA cache_size=%d"%int(cache_size))
+            if mmap_size is not None:
+                self._cursor.execute("PRAGMA mmap_size=%d"%int(mmap_size)).fetchall()
+        except sqlite3.OperationalError:
+            pass  # another process may hold a lock while switching the journal mode;
+                  # the database works in either mode.
             
     def __del__(self):
         """Called when the database is freed to close the connection."""        
@@ -65,6 +184,12 @@ class SQLiteKeyValueStore:
     def __repr__(self):
         """String representation of the database."""
         return "SQLite3-based key:value database stored in '%s'"%self._file
+
+    def _begin(self):
+        """Start a transaction before a write, unless one is open already."""
+        if not self._in_transaction and self._batch_depth == 0:
+            self._cursor.execute("BEGIN")
+            self._in_transaction = True
     
     def has_key(self, key):    
         """Returns True if database has the given key."""
@@ -72,21 +197,125 @@ class SQLiteKeyValueStore:
             
     def __getitem__(self, key):
         """Return item in the database with given key, or raise KeyError."""        
-        s = self._cursor.execute( "SELECT value,compressed FROM cache WHERE key=?", (self._dumps(key),) )
+        k = self._dumps(key)
+        if self._lru is not None:
+            v = self._lru.get(str(k), self)
+            if v is not self:
+                return v
+        s = self._cursor.execute( "SELECT value,compressed FROM cache WHERE key=?", (k,) )
         try:
             v = s.next()
-            return self._loads(str(v[0]), bool(v[1]))
         except StopIteration:
             raise KeyError, str(key)
+        return self._load_and_cache(str(k), str(v[0]), bool(v[1]))
+
+    def _load_and_cache(self, k, x, compress):
+        """Unpickle the value x stored with the pickled key k and put it into the LRUCache."""
+        if compress:
+            x = zlib.decompress(x)
+        v = self._loads(x)
+        if self._lru is not None:
+            self._lru.set(k, v, len(x))
+        return v
         
     def __setitem__(self, key, value):
         """Sets an item in the database.  Call commit to make this permanent."""
+        k = self._dumps(key)
+        if self._lru is not None:
+            self._lru.discard(str(k))
+        self._begin()
         self._cursor.execute("INSERT OR REPLACE INTO cache VALUES(?, ?, ?)", (
-            self._dumps(key), self._dumps(value, self._compress), self._compress))
+            k, self._dumps(value, self._compress), self._compress))
+
+    def get_many(self, keys):
+        """
+        Return a dictionary with the items in the database with the given keys.
+        Keys that are not in the database are omitted.
+        """
+        keys = list(keys)
+        blobs = dict((str(self._dumps(k)), k) for k in keys)
+        result = {}
+        if self._lru is not None:
+            for b, k in blobs.items():
+                v = self._lru.get(b, self)
+                if v is not self:
+                    result[k] = v
+                    del blobs[b]
+        B = blobs.keys()
+        # SQLite limits the number of parameters of a query to 999.
+        for i in range(0, len(B), 500):
+            chunk = B[i:i+500]
+            query = "SELECT key,value,compressed FROM cache WHERE key IN (%s)"%(','.join(['?']*len(chunk)))
+            for k, v, c in self._cursor.execute(query, [sqlite3.Binary(b) for b in chunk]):
+                result[blobs[str(k)]] = self._load_and_cache(str(k), str(v), bool(c))
+        return result
+
+    def update(self, items):
+        """
+        Sets all items of the dictionary (or list of pairs) items in the database
+        using a single statement.  Call commit to make this permanent.
+        """
+        if isinstance(items, dict):
+            items = items.iteritems()
+        c = self._compress
+        def rows():
+            for k, v in items:
+                k = self._dumps(k)
+                if self._lru is not None:
+                    self._lru.discard(str(k))
+                yield (k, self._dumps(v, c), c)
+        self._begin()
+        self._cursor.executemany("INSERT OR REPLACE INTO cache VALUES(?, ?, ?)", rows())
+
+    bulk_set = update
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager for a transaction: all assignments made in the with
+        block are committed at the end, or rolled back if an exception occurs.
+        Each batch is a SQLite savepoint, so batches can be nested, and an
+        exception in an inner batch only rolls back the assignments made in
+        that batch.  Assignments made before the batch and not committed yet
+        are neither committed nor rolled back by it; the batch then becomes
+        part of their transaction, which is committed by commit().
+
+        EXAMPLES::
+
+            with db.batch():
+                for n in range(100):
+                    db[n] = n**2
+        """
+        self._batch_depth += 1
+        savepoint = "sp_%d"%self._batch_depth
+        self._cursor.execute("SAVEPOINT %s"%savepoint)
+        try:
+            yield self
+        except:
+            self._cursor.execute("ROLLBACK TO %s"%savepoint)
+            self._cursor.execute("RELEASE %s"%savepoint)
+            self._batch_depth -= 1
+            if self._lru is not None:
+                self._lru.clear()
+            raise
+        # Releasing the outermost savepoint commits, unless it is
+        # nested in a transaction started by an earlier assignment.
+        self._cursor.execute("RELEASE %s"%savepoint)
+        self._batch_depth -= 1
         
     def __delitem__(self, key):
         """Removes an item from the database.  Call commit to make this permanent."""
-        self._cursor.execute("DELETE FROM cache WHERE key=?", (self._dumps(key),) )    
+        k = self._dumps(key)
+        if self._lru is not None:
+            self._lru.discard(str(k))
+        self._begin()
+        self._cursor.execute("DELETE FROM cache WHERE key=?", (k,) )    
+
+    def cache_stats(self):
+        """Return a dictionary with the statistics of the LRUCache (or None if there is none)."""
+        if self._lru is None:
+            return None
+        return self._lru.stats()
         
     def _dumps(self, x, compress=False):
         """Converts a Python object to a binary string that can be stored in the database."""
@@ -106,8 +335,15 @@ class SQLiteKeyValueStore:
         return [self._loads(str(x[0])) for x in self._cursor.execute( "SELECT key FROM cache" )]       
         
     def commit(self):
-        """Write assignments made to the database to disk."""
-        self._db.commit()
+        """Write assignments made to the database to disk (postponed inside a batch)."""
+        if self._batch_depth == 0 and self._in_transaction:
+            self._cursor.execute("COMMIT")
+            self._in_transaction = False
+
+    def close(self):
+        """Commit and close the connection to the database."""
+        self.commit()
+        self._db.close()
 
         
 def test_sqlite_keyval_1():
@@ -141,6 +377,94 @@ def test_sqlite_keyval_1():
             import os; os.unlink(file)
 
 
+def test_sqlite_keyval_2():
+    """Test the bulk and batch interface."""
+    import tempfile, os
+    file = tempfile.mktemp()
+    try:
+        db = SQLiteKeyValueStore(file, cache_size=-2000, mmap_size=2**24)
+        db.update(dict((n, n**2) for n in range(1000)))
+        db.bulk_set([('a', [1,2]), ('b', {3:4})])
+        assert db.get_many([5, 'a', 'c', 999]) == {5:25, 'a':[1,2], 999:998001}
+        db.commit()
+
+        with db.batch():
+            db[1000] = 0
+            with db.batch():
+                db[1001] = 1
+            try:
+                with db.batch():
+                    db[1003] = 3
+                    raise ValueError
+            except ValueError:
+                pass
+        try:
+            with db.batch():
+                db[1002] = 2
+                raise ValueError
+        except ValueError:
+            pass
+        db['c'] = 5      # not committed by the following batch
+        with db.batch():
+            db['d'] = 6
+
+        db2 = SQLiteKeyValueStore(file)
+        assert db2[1000] == 0 and db2[1001] == 1
+        assert not db2.has_key(1002) and not db2.has_key(1003)
+        assert not db2.has_key('c') and not db2.has_key('d')
+        assert len(db2.get_many(range(1004))) == 1002
+        assert db2['b'] == {3:4}
+        db.close()
+        assert db2['c'] == 5 and db2['d'] == 6
+        del db, db2
+
+        db = SQLiteKeyValueStore(file, wal=True, synchronous='NORMAL')
+        with db.batch():
+            db['e'] = 7
+        del db
+        assert SQLiteKeyValueStore(file)['e'] == 7
+    finally:
+        for ext in ['', '-wal', '-shm']:
+            if os.path.exists(file + ext):
+                os.unlink(file + ext)
+
+
+def test_sqlite_keyval_lru():
+    """Test the in-memory LRU cache."""
+    import tempfile, os
+    file = tempfile.mktemp()
+    try:
+        for compress in [False, True]:
+            db = SQLiteKeyValueStore(file, compress, lru_size=2, lru_bytes=10**6)
+            db.update([(n, [n]*10) for n in range(5)])
+            assert db[1] == [1]*10 and db[1] == [1]*10
+            assert db[2] == [2]*10 and db[3] == [3]*10
+            st = db.cache_stats()
+            assert st['hits'] == 1 and st['misses'] == 3 and st['evictions'] == 1 and st['items'] == 2
+            db[3] = 'new'                    # invalidates the cached value
+            assert db.cache_stats()['invalidations'] == 1
+            assert db[3] == 'new'
+            assert db.get_many([2, 3, 4]) == {2:[2]*10, 3:'new', 4:[4]*10}
+            del db[4]
+            assert not db.has_key(4)
+            try:
+                db[4]
+                assert False, "4 should have been deleted"
+            except KeyError:
+                pass
+            del db
+            os.unlink(file)
+        cache = LRUCache(10, max_bytes=5)
+        cache.set(1, 'a', 3); cache.set(2, 'b', 3)
+        assert 1 not in cache and cache.get(2) == 'b' and cache.stats()['bytes'] == 3
+        cache.set(2, 'c', 2)
+        assert cache.get(2) == 'c' and cache.stats()['bytes'] == 2 and cache.stats()['invalidations'] == 0
+    finally:
+        for ext in ['', '-wal', '-shm']:
+            if os.path.exists(file + ext):
+                os.unlink(file + ext)
+
+
 # A SQLite cached function decorator
 
 class sqlite_cached_function:
@@ -156,9 +480,22 @@ class sqlite_cached_function:
     sessions, of course.     Moreover, f.db is the underlying
     SQLiteKeyValueStore and f.keys() is a list of all keys computed
     so far (normalized by ArgumentFixer). 
+
+    New values are committed after every commit_every calls (default: 1);
+    call f.commit() to commit the remaining ones.  The other keyword
+    arguments are passed on to SQLiteKeyValueStore; e.g. with lru_size=1000
+    the last 1000 values used are also kept in memory, and
+    f.cache_stats() returns the hit/miss/eviction statistics.
     """
-    def __init__(self, file, compress=False):
-        self.db = SQLiteKeyValueStore(file, compress=compress)
+    def __init__(self, file, compress=False, commit_every=1, **kwds):
+        self.db = SQLiteKeyValueStore(file, compress=compress, **kwds)
+        self._commit_every = commit_every
+        self._uncommitted = 0
+
+    def commit(self):
+        """Commit all values computed so far."""
+        self.db.commit()
+        self._uncommitted = 0
         
     def __call__(self, f):
         """Return decorated version of f."""
@@ -170,12 +507,16 @@ class sqlite_cached_function:
                 return self.db[k]
             except KeyError: pass    
             x = self.db[k] = f(*args, **kwds)  
-            self.db.commit()
+            self._uncommitted += 1
+            if self._uncommitted >= self._commit_every:
+                self.commit()
             return x            
         def keys():
             return self.db.keys()
         g.keys = keys    
         g.db = self.db
+        g.commit = self.commit
+        g.cache_stats = self.db.cache_stats
         return g
 
 def test_sqlite_cached_function_1():
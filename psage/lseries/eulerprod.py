@@ -36,7 +36,8 @@ TODO:
 #
 #################################################################################
 
-import copy, math, types
+import copy, math, os
+import numpy as np
 
 from sage.all import prime_range, cached_method, sqrt, SR, vector
 from sage.rings.all import is_RationalField, ZZ, Integer, QQ, O, ComplexField, CDF, primes, infinity as oo
@@ -53,6 +54,9 @@ import sage.modular.modform.element
 from sage.modular.all import Newform
 from sage.structure.factorization import Factorization
 from sage.misc.mrange import cartesian_product_iterator
+from sage.misc.misc import tmp_filename
+from sage.parallel.decorate import parallel
+import sage.parallel.ncpus
 
 I = sqrt(-1)
 
@@ -130,6 +134,297 @@ def prime_below(P):
         return ZZ(P)
 
 
+def _smallest_prime_factors(B):
+    """
+    Return a NumPy array spf with spf[n] the smallest prime factor of n
+    for 2 <= n <= B (and spf[0] = spf[1] = 0).
+
+    EXAMPLES::
+
+        sage: from psage.lseries.eulerprod import _smallest_prime_factors
+        sage: list(_smallest_prime_factors(12))
+        [0, 0, 2, 3, 2, 5, 2, 7, 2, 3, 2, 11, 2]
+    """
+    spf = np.zeros(B+1, dtype=np.int64)
+    for p in prime_range(int(math.sqrt(B))+1):
+        v = spf[p*p::p]
+        v[v == 0] = p
+    n = np.arange(B+1, dtype=np.int64)
+    w = (spf == 0) & (n >= 2)
+    spf[w] = n[w]
+    return spf
+
+def _is_exact(z):
+    """
+    Return True if z is an element of an exact ring (e.g., ZZ, QQ or a number field).
+    """
+    if isinstance(z, (int, long)):
+        return True
+    try:
+        return z.parent().is_exact()
+    except AttributeError:
+        return False
+
+def write_gp_vector(file, v):
+    """
+    Write the entries of v to the given file, one per line, in a form
+    that can be read by the GP function readvec.
+
+    INPUT:
+        - file -- file object open for writing
+        - v -- NumPy array with dtype int64 or complex128, or a list
+          of integers and Sage numbers
+
+    EXAMPLES::
+
+        sage: from psage.lseries.eulerprod import write_gp_vector
+        sage: import numpy, StringIO
+        sage: f = StringIO.StringIO(); write_gp_vector(f, numpy.array([1,-2,3])); f.getvalue()
+        '1\n-2\n3\n'
+        sage: f = StringIO.StringIO(); write_gp_vector(f, numpy.array([1.5,2-1j])); f.getvalue()
+        '1.5\n2+-1*I\n'
+    """
+    if isinstance(v, np.ndarray) and v.dtype == np.int64:
+        np.savetxt(file, v, fmt='%d')
+    elif isinstance(v, np.ndarray) and v.dtype == np.complex128:
+        file.write(''.join(['%.17g\n'%z.real if z.imag == 0 else '%.17g+%.17g*I\n'%(z.real, z.imag)
+                            for z in v.tolist()]))
+    else:
+        file.write(''.join([(str(z) if isinstance(z, (int,long,Integer)) else z._pari_init_()) + '\n'
+                            for z in v]))
+
+class AnlistEngine(object):
+    """
+    The Dirichlet coefficients a_0, ..., a_B of an L-series stored in
+    a NumPy array, which can be extended incrementally from B to a
+    larger bound B' by computing only the local factors at primes
+    that have a power in (B, B'] and the coefficients a_n with
+    B < n <= B'.
+
+    The array has dtype int64 as long as all coefficients are integers
+    of absolute value less than 2^62, complex128 if the coefficients
+    are approximations with at most 53 bits of precision, and object
+    otherwise.  In particular exact coefficients which are not small
+    integers (e.g. rationals) are always kept in an object array.
+
+    EXAMPLES::
+
+        sage: from psage.lseries.eulerprod import LSeries, AnlistEngine
+        sage: L = LSeries(EllipticCurve('11a'))
+        sage: A = AnlistEngine(None)
+        sage: A.extend(L, 10)
+        True
+        sage: A.array()
+        array([ 0,  1, -2, -1,  2,  1,  2, -2,  0, -2, -2])
+        sage: A.extend(L, 30); list(A.array()) == L.anlist(30)
+        True
+        True
+    """
+    def __init__(self, prec):
+        """
+        INPUT:
+            - prec -- None or positive integer (bits of precision passed to the local factors)
+        """
+        self._prec = prec
+        self._a = np.array([0,1], dtype=np.int64)
+        self._exact = True
+        self._spf = None
+
+    def __repr__(self):
+        return "Dirichlet coefficients a_n for n <= %s (dtype %s)"%(self.bound(), self._a.dtype)
+
+    def bound(self):
+        """Return the largest n such that a_n is known."""
+        return len(self._a) - 1
+
+    def is_exact(self):
+        """Return True if all coefficients computed so far are exact."""
+        return self._exact
+
+    def array(self, bound=None):
+        """
+        Return a read-only view of the array of coefficients a_0, ..., a_bound.
+        """
+        if bound is None:
+            bound = self.bound()
+        v = self._a[:bound+1]
+        v.setflags(write=False)
+        return v
+
+    def list(self, bound=None, prec=None):
+        """
+        Return the list of coefficients a_0, ..., a_bound as Sage
+        numbers.  If prec is given, they are returned as elements of
+        ComplexField(prec), even if they are exact.
+
+        EXAMPLES::
+
+            sage: from psage.lseries.eulerprod import LSeries, AnlistEngine
+            sage: A = AnlistEngine(None); A.extend(LSeries(EllipticCurve('11a')), 5)
+            True
+            sage: A.list()
+            [0, 1, -2, -1, 2, 1]
+            sage: A.list(3, prec=53)[2].parent()
+            Complex Field with 53 bits of precision
+        """
+        v = self.array(bound)
+        if prec is not None:
+            C = ComplexField(prec)
+            if v.dtype == np.complex128:
+                return [C(z.real, z.imag) for z in v.tolist()]
+            return [C(z) for z in v.tolist()]
+        if v.dtype == np.int64:
+            return [Integer(z) for z in v.tolist()]
+        if v.dtype == np.complex128:
+            C = ComplexField(self._prec)
+            return [C(z.real, z.imag) for z in v.tolist()]
+        return list(v)
+
+    @staticmethod
+    def from_array(prec, a, exact):
+        """
+        Return an AnlistEngine with the coefficients in the NumPy
+        array a (with dtype int64, complex128 or object).
+        """
+        A = AnlistEngine(prec)
+        A._exact = exact
+        A._a = a
+        return A
+
+    @staticmethod
+    def from_list(prec, coefficients):
+        """
+        Return an AnlistEngine with the given list of coefficients.
+        """
+        A = AnlistEngine(prec)
+        A._exact = all(_is_exact(z) for z in coefficients[1:])
+        A._a = np.zeros(len(coefficients), dtype=A._dtype_for(coefficients[1:]))
+        for n, z in enumerate(A._convert(coefficients[1:])):
+            A._a[n+1] = z
+        return A
+
+    def _dtype_for(self, values):
+        """
+        Return the dtype needed to store the current coefficients and the given values.
+        """
+        dtype = self._a.dtype
+        if dtype == np.int64 and \
+               all(_is_exact(z) and z in ZZ and abs(ZZ(z)) < 2**62 for z in values):
+            return np.int64
+        # Only approximations (and small integers) go into a complex128
+        # array; exact coefficients must not be rounded.
+        if dtype != object and self._prec is not None and self._prec <= 53 and \
+               not any(_is_exact(z) and not (z in ZZ and abs(ZZ(z)) < 2**53) for z in values):
+            return np.complex128
+        return object
+
+    def _convert(self, values):
+        """
+        Return the values as a list of numbers suitable for the dtype of self.
+        """
+        if self._a.dtype == np.int64:
+            return [int(ZZ(z)) for z in values]
+        if self._a.dtype == np.complex128:
+            return [complex(z) for z in values]
+        return list(values)
+
+    def _set_dtype(self, dtype):
+        if dtype != self._a.dtype:
+            self._a = self._a.astype(dtype)
+
+    def extend(self, L, bound):
+        """
+        Extend the coefficients of the L-series L up to the given bound.
+
+        INPUT:
+            - L -- an LSeriesAbstract
+            - bound -- nonnegative integer
+
+        OUTPUT:
+            - True, or False if some local factor is ambiguous (i.e.,
+              a list of possibilities), in which case self is not changed.
+        """
+        B1 = self.bound(); B2 = int(bound)
+        if B2 <= B1:
+            return True
+        prec = self._prec
+        L._precompute_local_factors(B2+1, prec=prec)
+
+        # The coefficients a_{p^r} with B1 < p^r <= B2.
+        new = {}
+        for p in prime_range(B2+1):
+            q = p
+            while q <= B1:
+                q *= p
+            if q > B2:
+                continue
+            lf = []
+            for P in L._primes_above(p):
+                if norm(P) <= B2:
+                    F = L._local_factor(P, prec)
+                    if isinstance(F, list):
+                        return False
+                    lf.append(F)
+            if len(lf) == 0:
+                continue
+            f = prod(lf)
+            accuracy_p = 1
+            q = 1
+            while q*p <= B2:
+                q *= p
+                accuracy_p += 1
+            T = f.parent().gen()
+            series_p = (f + O(T**accuracy_p))**(-1)
+            q = p
+            for j in range(1, accuracy_p):
+                if q > B1:
+                    new[q] = series_p[j]
+                q *= p
+
+        values = new.values()
+        if self._exact and not all(_is_exact(z) for z in values):
+            self._exact = False
+        self._set_dtype(self._dtype_for(values))
+        a = np.zeros(B2+1, dtype=self._a.dtype)
+        a[:B1+1] = self._a
+        if a.dtype == object:
+            for n, z in new.iteritems():
+                a[n] = z
+        elif len(new) > 0:
+            a[np.array(new.keys(), dtype=np.int64)] = self._convert(values)
+        self._a = a
+
+        # The remaining a_n with B1 < n <= B2, using a_n = a_{p^r} a_{n/p^r}
+        # where p is the smallest prime dividing n.  Since n/p^r <= n/2,
+        # the blocks (lo, 2*lo-1] can be done at once.
+        if self._spf is None or len(self._spf) <= B2:
+            n0 = 0 if self._spf is None else len(self._spf)
+            self._spf = _smallest_prime_factors(max(B2, 2*n0))
+        lo = B1 + 1
+        while lo <= B2:
+            hi = min(B2, 2*lo - 1)
+            n = np.arange(lo, hi+1, dtype=np.int64)
+            p = self._spf[lo:hi+1]
+            q = p.copy()
+            m = n // p
+            w = (m % p == 0)
+            while w.any():
+                m[w] //= p[w]
+                q[w] *= p[w]
+                w = (m % p == 0)
+            w = m > 1
+            n, q, m = n[w], q[w], m[w]
+            a = self._a
+            if a.dtype == np.int64 and len(n) > 0:
+                if (np.abs(a[q].astype(np.float64)) * np.abs(a[m].astype(np.float64)) >= 2.0**62).any():
+                    # switch to Python integers to avoid overflow
+                    self._set_dtype(object)
+                    a = self._a
+            a[n] = a[q] * a[m]
+            lo = hi + 1
+        return True
+
+
 class LSeriesDerivative(object):
     """
     The formal derivative of an L-series.
@@ -414,7 +709,8 @@ class LSeriesAbstract(object):
             sage: L
             Euler Product L-series with conductor 1, Hodge numbers [0], weight 1, epsilon 1, poles [1], residues [-1] over Rational Field
         """
-        self._anlist = {None:[]}
+        # prec --> AnlistEngine created with that precision (None for exact coefficients).
+        self._anlist = {}
 
         (self._conductor, self._hodge_numbers, self._weight, self._epsilon,
          self._poles, self._residues, self._base_field, self._is_selfdual) = (
@@ -1146,46 +1442,87 @@ class LSeriesAbstract(object):
             sage: from psage.lseries.eulerprod import LSeries; L = LSeries(EllipticCurve('11a'))
             sage: L.anlist(30)
             [0, 1, -2, -1, 2, 1, 2, -2, 0, -2, -2, 1, -2, 4, 4, -1, -4, -2, 4, 0, 2, 2, -2, -1, 0, -4, -8, 5, -4, 0, 2]
+            sage: L.anlist(30, prec=53)[2]
+            -2.00000000000000
+            sage: L.anlist(10, prec=53)[2].parent(), L.anlist(10)[2].parent()
+            (Complex Field with 53 bits of precision, Integer Ring)
             sage: K.<a> = NumberField(x^2-x-1); L = LSeries(EllipticCurve([0,-a,a,0,0]))
             sage: L.anlist(30)
             [0, 1, 0, 0, -2, -1, 0, 0, 0, -4, 0, 3, 0, 0, 0, 0, 0, 0, 0, 5, 2, 0, 0, 0, 0, -4, 0, 0, 0, 11, 0]
         """
-        # First check if we know anlist to infinite bit precision up to given bound:
-        if len(self._anlist[None]) > bound:
-            if prec is None:
-                # request it to infinite precision
-                return self._anlist[None][:bound+1]
-            else:
-                # finite precision request
-                C = ComplexField(prec)
-                return [C(a) for a in self._anlist[None]]
-
-        if prec is not None:
-            # check if numerically computed already to at least this precision
-            t = [z for z in self._anlist.iteritems() if z[0] >= prec and len(z[1]) > bound]
-            if len(t) > 0:
-                C = ComplexField(prec)
-                return [C(a) for a in t[0][1][:bound+1]]
+        A = self._anlist_engine(bound, prec)
+        if A is not None:
+            return A.list(bound, prec)
 
+        # Some local factor is ambiguous.
         self._precompute_local_factors(bound+1, prec=prec)
-        compute_anlist_multiple = False
         LF = []
         for p in prime_range(bound+1):
             lf = []
             for P in self._primes_above(p):
                 if norm(P) <= bound:
-                    F = self._local_factor(P, prec)
-                    if isinstance(F, list):
-                        compute_anlist_multiple = True
-                    lf.append(F)
+                    lf.append(self._local_factor(P, prec))
             LF.append((p, lf))
-                        
-        coefficients = self._compute_anlist(LF, bound, prec)
-        if not compute_anlist_multiple:
-            coefficients = list(coefficients)[0]
-            # save answer in cache
-            self._anlist[prec] = coefficients
-        return coefficients
+        return self._compute_anlist(LF, bound, prec)
+
+    def anlist_array(self, bound, prec=None):
+        """
+        Return a read-only NumPy array `v` of the Dirichlet series
+        coefficients `a_n` for `n` up to and including bound, where
+        `v[n] = a_n` (see AnlistEngine for the possible dtypes), or
+        None if some local factor is ambiguous (see anlist).
+
+        EXAMPLES::
+
+            sage: from psage.lseries.eulerprod import LSeries; L = LSeries(EllipticCurve('11a'))
+            sage: L.anlist_array(10)
+            array([ 0,  1, -2, -1,  2,  1,  2, -2,  0, -2, -2])
+        """
+        A = self._anlist_engine(bound, prec)
+        if A is None:
+            return None
+        return A.array(bound)
+
+    def _anlist_engine(self, bound, prec):
+        """
+        Return an AnlistEngine which knows the coefficients up to
+        the given bound, to infinite precision or to at least prec
+        bits of precision, extending a cached one if possible.
+        Return None if some local factor is ambiguous.
+        """
+        # Exact coefficients are good for every precision, whatever
+        # precision they were computed with, so they are stored under None.
+        E = self._anlist.get(None)
+        if E is not None and E.bound() >= bound:
+            return E
+        A = None
+        if prec is not None:
+            # check if numerically computed already to at least this precision
+            t = [z for z in self._anlist.iteritems()
+                 if z[0] is not None and z[0] >= prec and z[1].bound() >= bound]
+            if len(t) > 0:
+                return t[0][1]
+            A = self._anlist.get(prec)
+        if A is None:
+            if E is not None:
+                # continue the exact coefficients at the requested precision
+                A = AnlistEngine.from_array(prec, E.array(), True)
+            else:
+                A = AnlistEngine(prec)
+        if not A.extend(self, bound):
+            return None
+        self._store_anlist_engine(A)
+        return A
+
+    def _store_anlist_engine(self, A):
+        """
+        Cache the AnlistEngine A: under None if its coefficients are
+        exact, and under its precision otherwise.
+        """
+        if A.is_exact():
+            self._anlist[None] = A
+        else:
+            self._anlist[A._prec] = A
 
     def _compute_anlist(self, LF, bound, prec):
         """
@@ -1245,6 +1582,88 @@ class LSeriesAbstract(object):
         a = self.anlist(bound, prec)
         return sum(a[n]/n**s for n in range(1,bound+1))
 
+    def values(self, ss, prec=53, T=1.2):
+        """
+        Return the values of this L-function at the points in the list ss,
+        computed to prec bits of precision.
+
+        All points share the Dokchitser object (and hence the Dirichlet
+        coefficients and the data of the functional equation), and
+        they are evaluated in batches by single GP calls instead of one
+        call per point.
+
+        The theta function cutoff is not adapted to the points: all of
+        them use the one given by T.  As for a single value, points
+        with a large imaginary part lose precision to cancellation
+        unless T is increased.
+
+        INPUT:
+            - ss -- list of complex numbers
+            - prec -- integer (default: 53); bits of precision
+            - T -- real number (default: 1.2), see number_of_coefficients
+
+        OUTPUT:
+            - NumPy array with dtype complex128 if prec is 53, and a
+              list of complex numbers otherwise.
+
+        EXAMPLES::
+
+            sage: from psage.lseries.eulerprod import LSeries
+            sage: L = LSeries(EllipticCurve('37a'))
+            sage: v = L.values([2, 3, 1/2 + 10*I]); v.dtype
+            dtype('complex128')
+            sage: abs(v[0] - L(2)) < 1e-14
+            True
+            sage: w = L.values([2, 3], prec=100); w[0].prec()
+            100
+            sage: abs(w[0] - L(RealField(100)(2))) < 1e-28
+            True
+        """
+        L = self._function(prec, T)
+        C = ComplexField(prec)
+        R = C._real_field()
+        ss = [C(s) for s in ss]
+        res = []
+        batch = 200
+        for i in range(0, len(ss), batch):
+            pts = ','.join(['%s+%s*I'%(z.real(), z.imag()) for z in ss[i:i+batch]])
+            z = L._gp_eval('Lvals=[%s]; v=vector(#Lvals,k,L(Lvals[k])); concat(vector(#v,k,[real(v[k]),imag(v[k])]))'%pts)
+            if 'pole' in z:
+                raise ZeroDivisionError, "pole at one of the points %s"%(ss[i:i+batch],)
+            elif '***' in z:
+                raise RuntimeError, z
+            # drop warnings printed before the vector
+            z = z[z.rfind('['):].strip()[1:-1].replace(' ','').replace('.E','.0E')
+            x = [R(t) for t in z.split(',')]
+            res.extend([C(x[2*k], x[2*k+1]) for k in range(len(x)//2)])
+        if prec == 53:
+            return np.array([complex(z) for z in res], dtype=np.complex128)
+        return res
+
+    def values_on_line(self, sigma, t0, t1, N, prec=53, T=1.2):
+        """
+        Return the values of this L-function at the N equally spaced points
+        `\sigma + i t_k`, where `t_k = t_0 + k (t_1-t_0)/(N-1)` for `0 \leq k < N`
+        (see values).
+
+        EXAMPLES::
+
+            sage: from psage.lseries.eulerprod import LSeries
+            sage: L = LSeries(EllipticCurve('11a'))
+            sage: v = L.values_on_line(1, 0, 10, 11); len(v)
+            11
+            sage: abs(v[0] - L(1)) < 1e-14
+            True
+        """
+        R = ComplexField(prec)._real_field()
+        sigma = R(sigma); t0 = R(t0); t1 = R(t1); N = int(N)
+        if N == 1:
+            ts = [t0]
+        else:
+            ts = [t0 + k*(t1-t0)/(N-1) for k in range(N)]
+        I = ComplexField(prec).gen()
+        return self.values([sigma + I*t for t in ts], prec=prec, T=T)
+
     def __call__(self, s):
         """
         Return value of this L-function at s.  If s is a real or
@@ -1446,30 +1865,41 @@ class LSeriesAbstract(object):
         #    print "num coeffs =", n
 
         # Compute the Dirichlet series coefficients
-        X = self.anlist(n, prec)
-        if isinstance(X, types.GeneratorType):
+        X = self.anlist_array(n, prec)
+        if X is None:
             # Several possible coefficients -- we try them until finding on that works.
-            coeff_lists = X
+            coeff_lists = self.anlist(n, prec)
         else:
             # Only one to try
             coeff_lists = [X]
 
         tiny0 = tiny(prec)
+        coeff_file = tmp_filename()
         for coeffs in coeff_lists:
-            # Define a string that when evaluated in PARI defines a function
-            # a(k), which returns the Dirichlet coefficient a_k.
-            s = 'v=[%s]; a(k)=v[k];'%','.join([str(z) if isinstance(z, (int,long,Integer)) else z._pari_init_() for z in coeffs[1:]])
+            # Write the coefficients to a file, which GP reads with readvec;
+            # this is much faster than sending a huge vector through the
+            # interface as a string.  Then define a function a(k), which
+            # returns the Dirichlet coefficient a_k.
+            f = open(coeff_file, 'w')
+            try:
+                write_gp_vector(f, coeffs[1:])
+            finally:
+                f.close()
+            s = 'v=readvec("%s"); a(k)=v[k];'%coeff_file
 
             # Tell the L-series / PARI about the coefficients.
 
-            if self.is_selfdual():
-                L.init_coeffs('a(k)', pari_precode = s)
-            else:
-                # Have to directly call gp_eval, since case of functional equation having two different
-                # (conjugate) L-functions isn't supported in Dokchitser class (yet).
-                L._Dokchitser__init = True
-                L._gp_eval(s)
-                L._gp_eval('initLdata("a(k)",1,"conj(a(k))")')
+            try:
+                if self.is_selfdual():
+                    L.init_coeffs('a(k)', pari_precode = s)
+                else:
+                    # Have to directly call gp_eval, since case of functional equation having two different
+                    # (conjugate) L-functions isn't supported in Dokchitser class (yet).
+                    L._Dokchitser__init = True
+                    L._gp_eval(s)
+                    L._gp_eval('initLdata("a(k)",1,"conj(a(k))")')
+            finally:
+                os.unlink(coeff_file)
 
             if epsilon == 'solve':
                 cmd = "sgneq = Vec(checkfeq()); sgn = -sgneq[2]/sgneq[1]; sgn"
@@ -1488,7 +1918,8 @@ class LSeriesAbstract(object):
             fe = L.check_functional_equation()
             if abs(fe) <= tiny0:
                 # one worked!
-                self._anlist[prec] = coeffs
+                if X is None:
+                    self._store_anlist_engine(AnlistEngine.from_list(prec, coeffs))
                 return L
             else:
                 pass
@@ -1499,6 +1930,57 @@ class LSeriesAbstract(object):
     def check_functional_equation(self, T, prec=53):
         return self._function(prec=prec).check_functional_equation(T)
 
+def lseries_values(Ls, ss, prec=53, ncpus=None):
+    """
+    Return the values of each of the L-series in the list Ls at each
+    of the points in the list ss, computed by a pool of worker processes.
+
+    The L-series are split into chunks, each of which is handled by
+    one (forked) worker, so anything cached in the L-series before the
+    call (e.g., Dirichlet coefficients) is shared by the workers.
+
+    INPUT:
+        - Ls -- list of L-series
+        - ss -- list of complex numbers
+        - prec -- integer (default: 53); bits of precision
+        - ncpus -- integer (default: number of cpus)
+
+    OUTPUT:
+        - list of lists v, where v[i][j] is the value of Ls[i] at ss[j],
+          or None if the computation failed.
+
+    EXAMPLES::
+
+        sage: from psage.lseries.eulerprod import LSeries, lseries_values
+        sage: Ls = [LSeries(EllipticCurve(lbl)) for lbl in ['11a','37a']]
+        sage: v = lseries_values(Ls, [1,2], ncpus=2)
+        sage: v[0][0]
+        0.253841860855911
+        sage: abs(v[1][1] - Ls[1](2)) < 1e-12
+        True
+    """
+    ss = list(ss)
+    if ncpus is None:
+        ncpus = sage.parallel.ncpus.ncpus()
+    chunk_size = max(1, int(math.ceil(len(Ls)/float(4*ncpus))))
+    chunks = [range(i, min(len(Ls), i+chunk_size)) for i in range(0, len(Ls), chunk_size)]
+
+    @parallel(ncpus)
+    def f(I):
+        C = ComplexField(prec)
+        res = []
+        for i in I:
+            F = Ls[i]._function(prec)
+            res.append((i, [F(C(s)) for s in ss]))
+        return res
+
+    values = [None]*len(Ls)
+    for X in f(chunks):
+        if isinstance(X[1], list):
+            for i, v in X[1]:
+                values[i] = v
+    return values
+
 class LSeriesProductEvaluator(object):
     def __init__(self, factorization, prec):
         self._factorization = factorization
@@ -1631,6 +2113,24 @@ class LSeriesProduct(object):
     def factor(self):
         return self._factorization
 
+    def values(self, ss, prec=53, ncpus=None):
+        """
+        Return the list of values of this product at the points in the
+        list ss.  The factors are evaluated in parallel (see lseries_values).
+
+        EXAMPLES::
+
+            sage: from psage.lseries.eulerprod import LSeries
+            sage: L = LSeries('zeta') * LSeries(DirichletGroup(9).0)
+            sage: abs(L.values([2,3], ncpus=2)[0] - L(2)) < 1e-12
+            True
+        """
+        F = self._factorization
+        v = lseries_values([L for L, e in F], ss, prec=prec, ncpus=ncpus)
+        if None in v:
+            raise RuntimeError, "unable to evaluate some factors"
+        return [prod(v[i][j]**F[i][1] for i in range(len(F))) for j in range(len(ss))]
+
     def hodge_numbers(self):
         """
         Return the Hodge numbers of this product of L-series.
@@ -2485,6 +2985,53 @@ class LSeriesTwist(LSeriesAbstract):
             c = ComplexField(prec)(c)
         return L0(c*T)
 
+    def _anlist_engine(self, bound, prec):
+        """
+        Return an AnlistEngine with the coefficients up to bound.
+
+        Over QQ we have `b_n = \chi(n) a_n`, where `a_n` are the coefficients of the
+        untwisted L-series, so the twisted coefficients are computed from
+        the (cached) untwisted ones by a single multiplication of arrays.
+        """
+        if not (is_RationalField(self.base_field()) and is_DirichletCharacter(self._chi)):
+            return LSeriesAbstract._anlist_engine(self, bound, prec)
+        for A in (self._anlist.get(None), self._anlist.get(prec)):
+            if A is not None and A.bound() >= bound:
+                return A
+        B = self._L._anlist_engine(bound, prec)
+        if B is None:
+            return LSeriesAbstract._anlist_engine(self, bound, prec)
+        c, exact = self._character_array(bound, prec)
+        a = B.array(bound)
+        if a.dtype == np.int64 and c.dtype == np.complex128 and (np.abs(a) >= 2**53).any():
+            a = a.astype(object)
+        A = AnlistEngine.from_array(prec, a*c, exact and B.is_exact())
+        self._store_anlist_engine(A)
+        return A
+
+    def _character_array(self, bound, prec):
+        """
+        Return a NumPy array of the values `\chi(n)` for `0 \leq n \leq` bound and
+        True if these are exact.  The dtype is int64 if `\chi` is
+        quadratic or trivial, and complex128 if prec is at most 53.
+        """
+        chi = self._chi
+        m = int(chi.modulus())
+        vals = chi.values()
+        if all(z in ZZ for z in vals):
+            c = np.array([int(z) for z in vals], dtype=np.int64)
+            exact = True
+        elif prec is not None and prec <= 53:
+            C = ComplexField(prec)
+            c = np.array([complex(C(z)) for z in vals], dtype=np.complex128)
+            exact = False
+        else:
+            c = np.empty(m, dtype=object)
+            for n, z in enumerate(vals):
+                c[n] = z if prec is None else ComplexField(prec)(z)
+            exact = prec is None
+        return c[np.arange(bound+1) % m], exact
+
     def __repr__(self):
         return "Twist of %s by %s"%(self._L, self._chi)
 
@@ -2497,6 +3044,77 @@ class LSeriesTwist(LSeriesAbstract):
     def twist_character(self):
         return self._chi
 
+class LSeriesTwistFamily(object):
+    """
+    The family of twists of an L-series by a list of characters.
+
+    The Dirichlet coefficients of the untwisted L-series are computed
+    only once, and the twisted coefficients are obtained from them by
+    multiplication with the values of the characters (see
+    LSeriesTwist).  The family is evaluated by a pool of worker
+    processes.
+
+    EXAMPLES::
+
+        sage: from psage.lseries.eulerprod import LSeries, LSeriesTwistFamily
+        sage: L = LSeries(EllipticCurve('11a'))
+        sage: F = LSeriesTwistFamily(L, [kronecker_character(d) for d in [-3, 5, -7, 8]]); F
+        Family of 4 twists of L-series of Elliptic Curve defined by y^2 + y = x^3 - x^2 - 10*x - 20 over Rational Field
+        sage: v = F.values([1], ncpus=2)
+        sage: abs(v[0][0] - L.twist(kronecker_character(-3))(1)) < 1e-12
+        True
+    """
+    def __init__(self, L, chis, conductor=None, epsilon=None, prec=53):
+        """
+        INPUT:
+            - `L` -- an L-series
+            - ``chis`` -- list of primitive characters of the base field of L
+            - ``conductor``, ``epsilon``, ``prec`` -- passed on to L.twist
+        """
+        self._L = L
+        self._twists = [L.twist(chi, conductor=conductor, epsilon=epsilon, prec=prec) for chi in chis]
+
+    def __repr__(self):
+        return "Family of %s twists of %s"%(len(self._twists), self._L)
+
+    def __len__(self):
+        return len(self._twists)
+
+    def __getitem__(self, i):
+        return self._twists[i]
+
+    def untwisted_lseries(self):
+        return self._L
+
+    def values(self, ss, prec=53, ncpus=None):
+        """
+        Return the values of the twists at the points in the list ss.
+
+        INPUT:
+            - ss -- list of complex numbers
+            - prec -- integer (default: 53); bits of precision
+            - ncpus -- integer (default: number of cpus)
+
+        OUTPUT:
+            - list of lists v, where v[i][j] is the value of the i-th
+              twist at ss[j] (or None if it could not be computed)
+        """
+        # Compute the untwisted coefficients needed for the twist of largest
+        # conductor before the workers are started, so that they are shared.
+        def max_conductor(X):
+            N = X.conductor()
+            return max(N) if isinstance(N, list) else N
+        if len(self._twists) > 0:
+            X = max(self._twists, key=max_conductor)
+            try:
+                n = X.number_of_coefficients(prec)
+            except Exception:
+                # e.g., if the conductor is not known yet
+                n = 0
+            if n > 0:
+                self._L._anlist_engine(n, prec)
+        return lseries_values(self._twists, ss, prec=prec, ncpus=ncpus)
+
 ##############
 # TODO: General tensor products and symmetric powers: see
 #   http://magma.maths.usyd.edu.au/magma/handbook/text/1392#15272
@@ -30,7 +30,9 @@ cdef int _reconstruct_matrix(mpc_t** Q, mpc_t** A, int n, int m, int k, int prec
 
 cdef int _hessenberg_reduction(mpc_t** A, int nrows, QR_set  q,int prec, mpc_rnd_t rnd,mpfr_rnd_t rnd_re, int rt =?)
 
-#cdef void _hessenberg_reduction_par(mpc_t** A, int nrows, QR_set  q,int prec, int nthreads,mpc_rnd_t rnd,mpfr_rnd_t rnd_re, int rt =?) nogil
+cdef int _hessenberg_reduction_par(mpc_t** A, int nrows, QR_set  q,int prec,int nthreads,int static,mpc_rnd_t rnd,mpfr_rnd_t rnd_re, int rt =?) nogil
+
+cdef int _eigenvalues_par(mpc_t* res, mpc_t** A,int nrows,int prec,int nthreads,int static,int verbose,mpc_rnd_t rnd,mpfr_rnd_t rnd_re) except -3
 
 cdef int _norm(mpfr_t norm,mpc_t** A, int nrows,int ncols, int prec,mpfr_rnd_t rnd_re,int ntype) nogil
 
@@ -38,8 +40,6 @@ cdef int solve_upper_triangular(mpc_t** R,mpc_t* b,int n, int prec, mpc_rnd_t rn
 
 ## TODO: Parallel routines
 #cdef int qr_decomp_par(mpc_t** A,int m, int n, int prec, mpfr_t eps, int nthreads,int static,mpc_rnd_t rnd, mpfr_rnd_t rnd_re) nogil
-#cdef int _eigenvalues_par(mpc_t* res, mpc_t** A,int nrows,int prec,int nthreads,int static,int verbose,mpc_rnd_t rnd,mpfr_rnd_t rnd_re) nogil
-#cdef int _hessenberg_reduction_par(mpc_t** A, int nrows, QR_set  q,int prec,int nthreads,int static,mpc_rnd_t rnd,mpfr_rnd_t rnd_re, int rt = ?) nogil
 
 ## cdef void _wilkinson_shift(mpc_t* mu,mpc_t* a,mpc_t* b,mpc_t* c,mpc_t* d,int prec,mpc_rnd_t rnd,mpfr_rnd_t rnd_re, mpc_t zz[4], mpfr_t xx[4])
 
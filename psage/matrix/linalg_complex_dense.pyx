@@ -31,7 +31,9 @@ from sage.rings.complex_mpc import _mpfr_rounding_modes,_mpc_rounding_modes
 
 
 import cython
-from cython.parallel import parallel, prange
+from cython.parallel cimport parallel, prange, threadid
+from libc.stdlib cimport malloc, free
+from openmp cimport omp_get_max_threads
 
 
 cdef void givens(mpc_t *s, mpc_t *skk, mpfr_t *c, mpc_t *r, mpc_t *f, mpc_t *g, mpc_t *t, mpc_rnd_t rnd,mpfr_rnd_t rnd_re) nogil:
@@ -1142,3 +1144,389 @@ cdef void mm_get_delta(mpfr_t *delta,mpfr_rnd_t rnd_re):
 ##         _mpc_sub(&s,x,y,rnd)
 
 
+
+###
+### Parallel (OpenMP) versions of the Hessenberg reduction and the QR-algorithm.
+### The Givens rotations are applied to blocks of _ROT_CHUNK rows / columns in parallel.
+### The QR-algorithm uses aggressive early deflation (AED) on a window at the bottom
+### of the active block and uses the undeflated eigenvalues of the window as shifts
+### for the following sweeps.
+###
+
+cdef int _ROT_CHUNK = 32
+
+cdef mpc_t* _init_thread_tmps(int nthreads,int prec) nogil:
+    r"""
+    Allocate and initialize 3 temporary variables per thread.
+    """
+    cdef mpc_t* tmps
+    cdef int i
+    tmps = <mpc_t*>malloc(sizeof(mpc_t)*3*nthreads)
+    if tmps==NULL:
+        return NULL
+    for i in range(3*nthreads):
+        mpc_init2(tmps[i],prec)
+    return tmps
+
+cdef void _clear_thread_tmps(mpc_t* tmps,int nthreads) nogil:
+    cdef int i
+    if tmps==NULL:
+        return
+    for i in range(3*nthreads):
+        mpc_clear(tmps[i])
+    free(tmps)
+
+cdef void RotateLeft_par(mpc_t s, mpc_t skk, mpfr_t c,mpc_t** A, int i, int k, int min_j,int max_j, mpc_t *tmps,int nthreads,int static,mpc_rnd_t rnd,mpfr_rnd_t rnd_re) nogil:
+    r"""
+    Parallel version of RotateLeft_. Here tmps is an array of 3*nthreads temporary variables.
+    """
+    cdef int b,nb,j0,j1
+    if nthreads<=1 or max_j-min_j < 2*_ROT_CHUNK:
+        RotateLeft_(s,skk,c,A,i,k,min_j,max_j,tmps,rnd,rnd_re)
+        return
+    nb = (max_j-min_j+_ROT_CHUNK-1)/_ROT_CHUNK
+    if static==1:
+        for b in prange(nb,num_threads=nthreads,schedule='static'):
+            j0 = min_j+b*_ROT_CHUNK
+            j1 = min(j0+_ROT_CHUNK,max_j)
+            RotateLeft_(s,skk,c,A,i,k,j0,j1,tmps+3*threadid(),rnd,rnd_re)
+    else:
+        for b in prange(nb,num_threads=nthreads,schedule='dynamic'):
+            j0 = min_j+b*_ROT_CHUNK
+            j1 = min(j0+_ROT_CHUNK,max_j)
+            RotateLeft_(s,skk,c,A,i,k,j0,j1,tmps+3*threadid(),rnd,rnd_re)
+
+cdef void RotateRight_par(mpc_t s, mpc_t skk, mpfr_t c,mpc_t** A, int i, int k, int min_j,int max_j, mpc_t *tmps,int nthreads,int static,mpc_rnd_t rnd,mpfr_rnd_t rnd_re) nogil:
+    r"""
+    Parallel version of RotateRight_. Here tmps is an array of 3*nthreads temporary variables.
+    """
+    cdef int b,nb,j0,j1
+    if nthreads<=1 or max_j-min_j < 2*_ROT_CHUNK:
+        RotateRight_(s,skk,c,A,i,k,min_j,max_j,tmps,rnd,rnd_re)
+        return
+    nb = (max_j-min_j+_ROT_CHUNK-1)/_ROT_CHUNK
+    if static==1:
+        for b in prange(nb,num_threads=nthreads,schedule='static'):
+            j0 = min_j+b*_ROT_CHUNK
+            j1 = min(j0+_ROT_CHUNK,max_j)
+            RotateRight_(s,skk,c,A,i,k,j0,j1,tmps+3*threadid(),rnd,rnd_re)
+    else:
+        for b in prange(nb,num_threads=nthreads,schedule='dynamic'):
+            j0 = min_j+b*_ROT_CHUNK
+            j1 = min(j0+_ROT_CHUNK,max_j)
+            RotateRight_(s,skk,c,A,i,k,j0,j1,tmps+3*threadid(),rnd,rnd_re)
+
+cdef int _hessenberg_reduction_par(mpc_t** A, int nrows, QR_set  q,int prec,int nthreads,int static,mpc_rnd_t rnd,mpfr_rnd_t rnd_re, int rt = 0) nogil:
+    r"""
+    Parallel version of _hessenberg_reduction.
+    """
+    cdef int i,j
+    cdef mpc_t t
+    cdef mpc_t* tmps
+    tmps = _init_thread_tmps(nthreads,prec)
+    if tmps==NULL:
+        return -1
+    mpc_init2(t,prec)
+    for j in range(nrows-2):
+        for i in range(j+2,nrows):
+            if (mpc_zero_p(A[i][j])):
+                continue
+            givens(&q.s, &q.skk, &q.c, &q.r,&A[j + 1][j], &A[i][j],q.t, rnd,rnd_re)
+            if rt:
+                _mpc_div(&t,A[i][j],A[j+1][j],q.t,rnd_re)
+                mpc_conj(t,t,rnd)
+            mpc_set_si(A[i][j], 0, rnd)
+            mpc_set(A[j + 1][j], q.r,rnd)
+            RotateLeft_par(q.s, q.skk, q.c, A, j + 1, i, j + 1, nrows, tmps,nthreads,static,rnd,rnd_re)
+            RotateRight_par(q.s, q.skk, q.c, A, j + 1, i, 0, nrows, tmps,nthreads,static,rnd,rnd_re)
+            if rt:
+                mpc_set(A[i][j], t,rnd)
+    mpc_clear(t)
+    _clear_thread_tmps(tmps,nthreads)
+    return 0
+
+cdef int _qr_step_par(mpc_t** A, int start, int end, QR_set * q, mpc_t mu,mpc_t* tmps,int nthreads,int static,mpc_rnd_t rnd,mpfr_rnd_t rnd_re) nogil:
+    r"""
+    One shifted QR-step on the active block A[start:end,start:end]
+    (see _qr_step) using parallel rotations.
+    """
+    cdef int j
+    for j in range(start,end):
+        mpc_sub(A[j][j], A[j][j], mu,rnd)
+    for j in range(start,end):
+        if j < end - 1:
+            givens(&q.s, &q.skk, &q.c, &q.r, &A[j][j], &A[j + 1][j],q.t,rnd,rnd_re)
+            mpc_set_si(A[j + 1][j], 0, rnd)
+            _mpc_set(&A[j][j], q.r,rnd_re)
+            RotateLeft_par(q.s, q.skk, q.c, A, j, j + 1, j + 1, end, tmps,nthreads,static,rnd,rnd_re)
+        if j > start:
+            RotateRight_par(q.s_t, q.skk_t, q.c_t, A, j - 1, j, start, j + 1, tmps,nthreads,static,rnd,rnd_re)
+        _mpc_set(&q.s_t, q.s,rnd_re)
+        _mpc_set(&q.skk_t, q.skk,rnd_re)
+        mpfr_set(q.c_t, q.c, rnd_re)
+    for j in range(start,end):
+        mpc_add(A[j][j], A[j][j], mu,rnd)
+    return 0
+
+cdef int _qr_step_acc(mpc_t** W, mpc_t** Z, int n, int start, int end, QR_set * q, mpc_t mu,mpc_rnd_t rnd,mpfr_rnd_t rnd_re) nogil:
+    r"""
+    One shifted QR-step on the block W[start:end,start:end] of the n x n matrix W
+    where the rotations are applied to the full rows and columns of W
+    and accumulated in Z, i.e. W -> G W G^H and Z -> Z G^H.
+    """
+    cdef int j
+    for j in range(start,end):
+        mpc_sub(W[j][j], W[j][j], mu,rnd)
+    for j in range(start,end):
+        if j < end - 1:
+            givens(&q.s, &q.skk, &q.c, &q.r, &W[j][j], &W[j + 1][j],q.t,rnd,rnd_re)
+            mpc_set_si(W[j + 1][j], 0, rnd)
+            _mpc_set(&W[j][j], q.r,rnd_re)
+            RotateLeft_(q.s, q.skk, q.c, W, j, j + 1, j + 1, n, q.t,rnd,rnd_re)
+        if j > start:
+            RotateRight_(q.s_t, q.skk_t, q.c_t, W, j - 1, j, 0, j + 1, q.t,rnd,rnd_re)
+            RotateRight_(q.s_t, q.skk_t, q.c_t, Z, j - 1, j, 0, n, q.t,rnd,rnd_re)
+        _mpc_set(&q.s_t, q.s,rnd_re)
+        _mpc_set(&q.skk_t, q.skk,rnd_re)
+        mpfr_set(q.c_t, q.c, rnd_re)
+    for j in range(start,end):
+        mpc_add(W[j][j], W[j][j], mu,rnd)
+    return 0
+
+cdef mpc_t** _alloc_square(int n,int prec) nogil:
+    cdef mpc_t** W
+    cdef int i,j
+    W = <mpc_t**>malloc(sizeof(mpc_t*)*n)
+    if W==NULL:
+        return NULL
+    for i in range(n):
+        W[i] = <mpc_t*>malloc(sizeof(mpc_t)*n)
+        for j in range(n):
+            mpc_init2(W[i][j],prec)
+    return W
+
+cdef void _free_square(mpc_t** W,int n) nogil:
+    cdef int i,j
+    if W==NULL:
+        return
+    for i in range(n):
+        for j in range(n):
+            mpc_clear(W[i][j])
+        free(W[i])
+    free(W)
+
+cdef int _schur_window(mpc_t** W, mpc_t** Z, int w, mpfr_t delta, QR_set * q, int prec, int maxit, mpc_rnd_t rnd, mpfr_rnd_t rnd_re) nogil:
+    r"""
+    Reduce the w x w upper Hessenberg matrix W to upper triangular (Schur) form T
+    and accumulate the transformations in Z (which should be the identity at input),
+    i.e. at exit the input W is equal to Z T Z^H.
+    Returns 0 if successful and -1 if the QR-algorithm did not converge.
+    """
+    cdef int it,s,e,i,prec0
+    e = 1
+    for it in range(maxit):
+        set_zero(W, &w, delta, &q.r,rnd,rnd_re)
+        get_submatrix(&s, &e, W, &w)
+        if e==0:
+            break
+        _wilkinson_shift(&q.mu2, &W[e - 2][e - 2], &W[e - 2][e - 1], &W[e - 1][e - 2], &W[e - 1][e - 1],prec,rnd,rnd_re, q.t,q.x)
+        _qr_step_acc(W, Z, w, s, e, q, q.mu2, rnd, rnd_re)
+    if e<>0:
+        return -1
+    ## The remaining 2x2 blocks are triangularized using an eigenvector
+    ## v = (lambda-d, c) of [[a,b],[c,d]].
+    for i in range(w-1):
+        if mpc_zero_p(W[i + 1][i]):
+            continue
+        _wilkinson_shift(&q.mu1, &W[i][i], &W[i][i + 1], &W[i + 1][i], &W[i + 1][i + 1],prec,rnd,rnd_re, q.t,q.x)
+        mpc_sub(q.mu2,q.mu1,W[i + 1][i + 1],rnd)
+        mpc_set(q.mu1,W[i + 1][i],rnd)
+        givens(&q.s, &q.skk, &q.c, &q.r, &q.mu2, &q.mu1,q.t,rnd,rnd_re)
+        RotateLeft_(q.s, q.skk, q.c, W, i, i + 1, i, w, q.t,rnd,rnd_re)
+        RotateRight_(q.s, q.skk, q.c, W, i, i + 1, 0, i + 2, q.t,rnd,rnd_re)
+        RotateRight_(q.s, q.skk, q.c, Z, i, i + 1, 0, w, q.t,rnd,rnd_re)
+        mpc_set_si(W[i + 1][i], 0, rnd)
+    return 0
+
+cdef int _aggressive_early_deflation(mpc_t** A, int start, int end, int w, mpc_t* shifts, int* nshifts, mpfr_t delta, QR_set * q, int prec, mpc_t* tmps, int nthreads, int static, mpc_rnd_t rnd, mpfr_rnd_t rnd_re) nogil:
+    r"""
+    Aggressive early deflation on the trailing w x w window of the active
+    (unreduced upper Hessenberg) block A[start:end,start:end], where w < end-start.
+
+    The window is reduced to Schur form T = Z^H W Z and the trailing eigenvalues
+    of T whose corresponding entry in the 'spike' A[kw][kw-1]*Z[0,:] is negligible are
+    deflated. If anything is deflated the transformation is applied to the active block
+    which is then reduced back to Hessenberg form.
+
+    Returns the number of deflated eigenvalues (-1 if the Schur form could not be computed).
+    The undeflated eigenvalues of the window are returned in shifts[0:nshifts[0]].
+    """
+    cdef int kw = end - w
+    cdef int i,j,k,nd,p1
+    cdef mpc_t** W
+    cdef mpc_t** Z
+    cdef mpc_t* row
+    cdef mpc_t z
+    cdef mpfr_t x,y
+    nshifts[0] = 0
+    W = _alloc_square(w,prec)
+    Z = _alloc_square(w,prec)
+    if W==NULL or Z==NULL:
+        _free_square(W,w); _free_square(Z,w)
+        return -1
+    for i in range(w):
+        for j in range(w):
+            mpc_set(W[i][j],A[kw + i][kw + j],rnd)
+            if i==j:
+                mpc_set_ui(Z[i][j],1,rnd)
+            else:
+                mpc_set_ui(Z[i][j],0,rnd)
+    if _schur_window(W, Z, w, delta, q, prec, 100*w, rnd, rnd_re)<>0:
+        _free_square(W,w); _free_square(Z,w)
+        return -1
+    mpc_init2(z,prec)
+    mpfr_init2(x,prec); mpfr_init2(y,prec)
+    ## Check the spike from the bottom.
+    nd = 0
+    for i in range(w-1,-1,-1):
+        mpc_abs(x,A[kw][kw - 1],rnd_re)
+        mpc_abs(y,Z[0][i],rnd_re)
+        mpfr_mul(x,x,y,rnd_re)
+        mpc_abs(y,W[i][i],rnd_re)
+        if mpfr_zero_p(y):
+            mpfr_set_ui(y,1,rnd_re)
+        mpfr_mul(y,y,delta,rnd_re)
+        if mpfr_cmp(x,y)>0:
+            break
+        nd = nd + 1
+    for i in range(w-nd):
+        mpc_set(shifts[i],W[i][i],rnd)
+    nshifts[0] = w - nd
+    if nd>0:
+        ## A[start:kw,kw:end] -> A[start:kw,kw:end]*Z
+        row = <mpc_t*>malloc(sizeof(mpc_t)*w)
+        for j in range(w):
+            mpc_init2(row[j],prec)
+        for k in range(start,kw):
+            for j in range(w):
+                mpc_set_ui(row[j],0,rnd)
+                for i in range(w):
+                    mpc_mul(z,A[k][kw + i],Z[i][j],rnd)
+                    mpc_add(row[j],row[j],z,rnd)
+            for j in range(w):
+                mpc_set(A[k][kw + j],row[j],rnd)
+        for j in range(w):
+            mpc_clear(row[j])
+        free(row)
+        ## The spike: Z^H * (A[kw][kw-1] e_1)
+        mpc_set(z,A[kw][kw - 1],rnd)
+        for i in range(w):
+            if i < w - nd:
+                mpc_conj(A[kw + i][kw - 1],Z[0][i],rnd)
+                mpc_mul(A[kw + i][kw - 1],A[kw + i][kw - 1],z,rnd)
+            else:
+                mpc_set_ui(A[kw + i][kw - 1],0,rnd)
+            for j in range(w):
+                mpc_set(A[kw + i][kw + j],W[i][j],rnd)
+        ## Reduce A[kw-1:p1,kw-1:p1] back to Hessenberg form.
+        p1 = end - nd
+        for j in range(kw - 1,p1 - 2):
+            for i in range(p1 - 1,j + 1,-1):
+                if mpc_zero_p(A[i][j]):
+                    continue
+                givens(&q.s, &q.skk, &q.c, &q.r,&A[i - 1][j], &A[i][j],q.t, rnd,rnd_re)
+                mpc_set_si(A[i][j], 0, rnd)
+                mpc_set(A[i - 1][j], q.r,rnd)
+                RotateLeft_par(q.s, q.skk, q.c, A, i - 1, i, j + 1, end, tmps,nthreads,static,rnd,rnd_re)
+                RotateRight_par(q.s, q.skk, q.c, A, i - 1, i, start, p1, tmps,nthreads,static,rnd,rnd_re)
+    mpc_clear(z)
+    mpfr_clear(x); mpfr_clear(y)
+    _free_square(W,w); _free_square(Z,w)
+    return nd
+
+cdef int _eigenvalues_par(mpc_t* res, mpc_t** A,int nrows,int prec,int nthreads,int static,int verbose,mpc_rnd_t rnd,mpfr_rnd_t rnd_re) except -3:
+    r"""
+    Compute the eigenvalues of the square nrows x nrows matrix A using
+    a multishift QR-algorithm with aggressive early deflation.
+    The Givens rotations are applied in parallel using nthreads threads
+    (if nthreads<=0 we use the default number of OpenMP threads)
+    and static (static=1) or dynamic (static=0) scheduling.
+
+    For small active blocks we use the usual single-shift QR-step.
+    For larger blocks we perform aggressive early deflation on a window of size
+    about 1/8 of the block and then chase one bulge for each of (up to) 2/3 of the
+    undeflated eigenvalues of the window.
+    """
+    cdef mpfr_t delta
+    cdef QR_set q
+    cdef int i,j,start,end,bs,w,nd,ns,nshifts,e,it,maxit
+    cdef mpc_t* shifts=NULL
+    cdef mpc_t* tmps=NULL
+    if nthreads<=0:
+        nthreads = omp_get_max_threads()
+    q = init_QR(prec)
+    mpfr_init2(delta,prec)
+    mm_get_delta(&delta,rnd_re)
+    shifts = <mpc_t*>malloc(sizeof(mpc_t)*nrows)
+    tmps = _init_thread_tmps(nthreads,prec)
+    if shifts==NULL or tmps==NULL:
+        free(shifts)
+        _clear_thread_tmps(tmps,nthreads)
+        clear_QR(&q)
+        mpfr_clear(delta)
+        raise MemoryError
+    for i in range(nrows):
+        mpc_init2(shifts[i],prec)
+    e = 0
+    end = 1
+    maxit = 100*nrows*nrows
+    with nogil:
+        e = _hessenberg_reduction_par(A, nrows, q, prec, nthreads, static, rnd, rnd_re)
+        if e<>0:
+            ## the reduction failed, so we don't iterate
+            maxit = 0
+        for it in range(maxit):
+            set_zero(A, &nrows, delta, &q.r,rnd,rnd_re)
+            get_submatrix(&start, &end, A, &nrows)
+            if end==0:
+                break
+            bs = end - start
+            if bs <= 12:
+                e = _qr_single_step(A, &nrows, &start, &end, &q, rnd, rnd_re)
+                if e<>0:
+                    break
+                continue
+            w = max(4,bs/8)
+            nd = _aggressive_early_deflation(A, start, end, w, shifts, &nshifts, delta, &q, prec, tmps, nthreads, static, rnd, rnd_re)
+            if nd > 0 and 100*nd > 14*w:
+                ## enough was deflated, so we skip the sweep
+                continue
+            if nd > 0:
+                end = end - nd
+            if nd < 0 or nshifts==0:
+                _wilkinson_shift(&q.mu2, &A[end - 2][end - 2], &A[end - 2][end - 1], &A[end - 1][end - 2], &A[end - 1][end - 1],prec,rnd,rnd_re, q.t,q.x)
+                _qr_step_par(A, start, end, &q, q.mu2, tmps, nthreads, static, rnd, rnd_re)
+                continue
+            ns = max(1,(2*nshifts)/3)
+            for j in range(nshifts - ns,nshifts):
+                _qr_step_par(A, start, end, &q, shifts[j], tmps, nthreads, static, rnd, rnd_re)
+    for i in range(nrows):
+        mpc_clear(shifts[i])
+    free(shifts)
+    _clear_thread_tmps(tmps,nthreads)
+    if e<>0:
+        clear_QR(&q)
+        mpfr_clear(delta)
+        if verbose>0:
+            print "exiting with code:{0}".format(e)
+        return e
+    if end<>0:
+        clear_QR(&q)
+        mpfr_clear(delta)
+        raise ArithmeticError,"QR-algorithm did not converge in {0} steps!".format(maxit)
+    if verbose>0:
+        print "QR-algorithm converged in {0} steps".format(it)
+    e = get_eigenvalues(res, A,nrows,prec,q.t,rnd,rnd_re)
+    clear_QR(&q)
+    mpfr_clear(delta)
+    return e
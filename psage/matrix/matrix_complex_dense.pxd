@@ -86,6 +86,11 @@ cdef class Matrix_complex_dense(Matrix_dense):
     cpdef Vector_complex_dense solve(self,Vector_complex_dense b,int overwrite=?,int num_threads=?,int schedule=?)
     cpdef Matrix_complex_dense mat_solve(self,Matrix_complex_dense B,int overwrite=*)
     cpdef Matrix_complex_dense inverse(self,int overwrite=?)
+    cpdef Vector_complex_dense solve_refined(self,Vector_complex_dense b,int maxit=?,double max_cond=?,int fallback=?)
+    cpdef Matrix_complex_dense mat_solve_refined(self,Matrix_complex_dense B,int maxit=?,double max_cond=?,int fallback=?)
+    cdef _double_inverse(self,double max_cond)
+    cdef int _refine_maxit(self,int maxit,double cond)
+    cdef int _refine_solution(self,mpc_t* b,mpc_t* x,Ainv,int maxit) except -2
 
 #    cpdef tuple qr_decomp2(self,int check=?)
   
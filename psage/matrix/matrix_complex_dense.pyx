@@ -26,7 +26,7 @@ from sage.rings.real_mpfr import RealField as RFF
 from sage.matrix.matrix cimport Matrix
 
 from psage.modules.vector_complex_dense cimport Vector_complex_dense
-from psage.matrix.linalg_complex_dense cimport _eigenvalues,qr_decomp,_norm,_hessenberg_reduction,init_QR,QR_set
+from psage.matrix.linalg_complex_dense cimport _eigenvalues,_eigenvalues_par,_hessenberg_reduction_par,qr_decomp,_norm,_hessenberg_reduction,init_QR,QR_set
 from psage.rings.mpc_extras cimport *
 from psage.matrix.linalg_complex_dense cimport qr_decomp,_reconstruct_matrix,solve_upper_triangular
 from psage.modules.vector_complex_dense cimport Vector_complex_dense
@@ -37,6 +37,12 @@ from sage.all import MatrixSpace
 from  sage.modules.free_module_element import vector
 from sage.all import FreeModule
 from sage.functions.other import ceil
+from libc.math cimport log
+from libc.limits cimport LONG_MIN
+import numpy as np
+cimport numpy as cnp
+from cython.parallel cimport prange
+from openmp cimport omp_get_max_threads
 from sage.rings.ring import is_Ring
 from sage.rings.rational_field import QQ
 from sage.rings.complex_double import CDF
@@ -981,13 +987,13 @@ cdef class Matrix_complex_dense(Matrix_dense):
          #cdef Vector_complex_dense z
          cdef MPComplexNumber a
          if isinstance(right,Matrix_complex_dense):
-             return Matrix_complex_dense._multiply_classical(self,right)
+             return Matrix_complex_dense._multiply_classical(self,right,0)
          if is_Vector(right):
              if right.degree() <>self.ncols():
                  raise ValueError,"Dimensions do not match! %s<>%s" %(right.degree(),self.ncols())
              return Matrix_complex_dense._matrix_times_vector_(self,right)
          if is_Matrix(right): ## if any other kind of matrix we have to coerce
-             return Matrix_complex_dense._multiply_classical(self,right)
+             return Matrix_complex_dense._multiply_classical(self,right,0)
          #return right._vector_times_matrix(self)
          if not isinstance(right,MPComplexNumber):
              z = self._base_ring(right)
@@ -1095,20 +1101,38 @@ cdef class Matrix_complex_dense(Matrix_dense):
 
 
 
-    def _multiply_classical(self, Matrix_complex_dense right):
+    def _multiply_classical(self, Matrix_complex_dense right,int num_threads=0,int use_3m=0,int block_size=0):
         """
         Use the standard `O(n^3)` matrix multiplication algorithm.
-        This is never used by default, since it is slow.
-        
+
+        The product is computed in blocks of block_size x block_size entries
+        (default 32), walking both self and right along rows, and the blocks
+        of rows of the result are distributed over num_threads threads
+        (num_threads<=0 means the default number of OpenMP threads, which is
+        what self*right uses).
+        If use_3m=1 each complex product is computed with three real
+        multiplications instead of four (this is faster at high precision but
+        the imaginary parts can lose a few bits to cancellation).
+
+        INPUT:
+
+        - ``right`` -- Matrix_complex_dense
+        - ``num_threads`` -- integer (default 0)
+        - ``use_3m`` -- integer (default 0)
+        - ``block_size`` -- integer (default 0, meaning 32)
+
         EXAMPLES::
         
-            sage: n = 3
-            sage: a = matrix(QQ,n,range(n^2))/3
-            sage: b = matrix(QQ,n,range(1, n^2 + 1))/5
-            sage: a._multiply_classical(b)
-            [ 6/5  7/5  8/5]
-            [18/5 22/5 26/5]
-            [   6 37/5 44/5]
+            sage: F = MPComplexField(103)
+            sage: a = Matrix_complex_dense(MatrixSpace(F,3),range(9))
+            sage: b = Matrix_complex_dense(MatrixSpace(F,3),range(1,10))
+            sage: c = a._multiply_classical(b)
+            sage: c[2,2] == 132
+            True
+            sage: (a._multiply_classical(b,num_threads=2,use_3m=1)-c).norm() < c.eps()*1000
+            True
+            sage: a*b == a._multiply_classical(b,num_threads=1)
+            True
         """
         #print "In multiply classical!!"
         if self._ncols != right._nrows:
@@ -1140,23 +1164,42 @@ cdef class Matrix_complex_dense(Matrix_dense):
         #cdef mpc_t *entries
         #entries = M._entries
 
-        cdef mpc_t s, z
-        mpc_init2(s,self._prec)
-        mpc_init2(z,self._prec)
-        sig_on()
-        l = 0
-        for i from 0 <= i < nr:
-            v = self._matrix[i]
-            for j from 0 <= j < nc:
-                mpc_set_si(s,0,self._rnd)   # set s = 0
+        cdef int bs,nb,ib,prec
+        cdef mpfr_t *Asum=NULL
+        cdef mpfr_t *Bsum=NULL
+        cdef mpc_rnd_t rnd_c = self._rnd
+        if block_size<=0:
+            bs = 32
+        else:
+            bs = block_size
+        if num_threads<1:
+            num_threads = omp_get_max_threads()
+        prec = self._prec
+        nb = (nr+bs-1)/bs
+        if use_3m==1:
+            ## Precompute Re+Im of the entries of both matrices.
+            Asum = <mpfr_t*>sage_malloc(sizeof(mpfr_t)*nr*snc)
+            Bsum = <mpfr_t*>sage_malloc(sizeof(mpfr_t)*snc*nc)
+            if Asum==NULL or Bsum==NULL: raise MemoryError
+            for i from 0 <= i < nr:
                 for k from 0 <= k < snc:
-                    mpc_mul(z, v[k], _right._matrix[k][j],self._rnd)
-                    mpc_add(s, s, z,self._rnd)
-                mpc_set(M._entries[l], s,self._rnd)
-                l += 1
+                    mpfr_init2(Asum[i*snc+k],prec)
+                    mpfr_add(Asum[i*snc+k],self._matrix[i][k].re,self._matrix[i][k].im,self._rnd_re)
+            for k from 0 <= k < snc:
+                for j from 0 <= j < nc:
+                    mpfr_init2(Bsum[k*nc+j],prec)
+                    mpfr_add(Bsum[k*nc+j],_right._matrix[k][j].re,_right._matrix[k][j].im,self._rnd_re)
+        sig_on()
+        with nogil:
+            for ib in prange(nb,num_threads=num_threads,schedule='dynamic'):
+                _mul_row_block(self._matrix,_right._matrix,M._entries,Asum,Bsum,ib*bs,min(ib*bs+bs,nr),nc,snc,bs,prec,use_3m,rnd_c)
         sig_off()
-        mpc_clear(s)
-        mpc_clear(z)
+        if use_3m==1:
+            for i from 0 <= i < nr*snc:
+                mpfr_clear(Asum[i])
+            for i from 0 <= i < snc*nc:
+                mpfr_clear(Bsum[i])
+            sage_free(Asum); sage_free(Bsum)
         return M
     
     # cdef _mul_(self, Matrix right):
@@ -1291,22 +1334,26 @@ cdef class Matrix_complex_dense(Matrix_dense):
         the transformations.
         This method should primarily be used when we need the
         transformations.
-        NOTE: num_threads>1 is not implemented
+        If num_threads<>1 the Givens rotations are applied in parallel
+        (num_threads=-1 means the default number of OpenMP threads) with
+        dynamic (schedule=0) or static (schedule=1) scheduling.
         """
-        cdef int i,j,n,m
+        cdef int i,j,n,m,res
         cdef QR_set q = init_QR(self._prec)
         cdef Matrix_complex_dense Q
         cdef mpc_t t,s,sc,tt[3]
         cdef mpfr_t x,c
         m = self._nrows
         n = self._ncols
-        if num_threads>1:
-            raise NotImplementedError,"Parallel linear algebra is not implemented!"
         if num_threads==1:
             _hessenberg_reduction(self._matrix, n, q, self._prec, self._rnd, self._rnd_re, return_transformation)
         else:
-            raise NotImplementedError,"Parallel linear algebra is not implemented!"
-            #_hessenberg_reduction_par(self._matrix, n, q, self._prec, num_threads,schedule,self._rnd, self._rnd_re, return_transformation)       
+            if num_threads<=0:
+                num_threads = omp_get_max_threads()
+            with nogil:
+                res = _hessenberg_reduction_par(self._matrix, n, q, self._prec, num_threads,schedule,self._rnd, self._rnd_re, return_transformation)
+            if res<>0:
+                raise MemoryError,"Could not allocate the temporaries for {0} threads in the Hessenberg reduction!".format(num_threads)
         if return_transformation:
             Q = Matrix_complex_dense.__new__(Matrix_complex_dense,self._parent,None,None,None)
             _reconstruct_matrix(Q._matrix,self._matrix, m, n, 2, self._prec, self._rnd, self._rnd_re)
@@ -1805,6 +1852,220 @@ cdef class Matrix_complex_dense(Matrix_dense):
             sage_free(A)
         return res
 
+    cpdef Vector_complex_dense solve_refined(self,Vector_complex_dense b,int maxit=0,double max_cond=1E12,int fallback=1):
+        r"""
+        Self should be n x n.
+        Solve self*X=b using mixed precision iterative refinement.
+
+        The matrix is inverted once in double precision (using LAPACK through numpy)
+        and the solution is then refined using residuals computed at the precision of self.
+        This needs O(n^2) multiprecision operations per iteration instead of the O(n^3)
+        operations of solve().
+
+        INPUT:
+
+        - ``b`` -- vector
+        - ``maxit`` -- integer (default: determined by the precision and condition number)
+        - ``max_cond`` -- double. If the (estimated) condition number of self is larger
+                          than this we can not use double precision.
+        - ``fallback`` -- integer. If 1 we use solve() if the refinement fails,
+                          otherwise an ArithmeticError is raised.
+
+        EXAMPLES::
+
+            sage: F = MPComplexField(200)
+            sage: A = Matrix_complex_dense(MatrixSpace(F,3),[4,1,0,1,3,1,0,1,2])
+            sage: b = A.column(0)
+            sage: x = A.solve_refined(b)
+            sage: (A*x-b).norm() < A.eps()*10
+            True
+            sage: abs(x[0]-1) < A.eps()*10
+            True
+
+        """
+        cdef Vector_complex_dense res
+        assert self._is_square
+        cdef int n = self._nrows
+        assert len(b)==n
+        Ainv = self._double_inverse(max_cond)
+        if Ainv is None:
+            if fallback==1:
+                return self.solve(b)
+            raise ArithmeticError,"Matrix is too ill-conditioned for double precision!"
+        res = Vector_complex_dense.__new__(Vector_complex_dense,b._parent,None,False,False)
+        for i from 0 <= i < n:
+            mpc_init2(res._entries[i],self._prec)
+        if self._refine_solution(b._entries,res._entries,Ainv[0],self._refine_maxit(maxit,Ainv[1]))<>0:
+            if fallback==1:
+                return self.solve(b)
+            raise ArithmeticError,"Iterative refinement did not converge!"
+        return res
+
+    cpdef Matrix_complex_dense mat_solve_refined(self,Matrix_complex_dense B,int maxit=0,double max_cond=1E12,int fallback=1):
+        r"""
+        Self should be n x n.
+        Solve self*X=B using mixed precision iterative refinement.
+        The double precision inverse of self is computed once and used for all columns of B.
+        See solve_refined for a description of the parameters.
+
+        EXAMPLES::
+
+            sage: F = MPComplexField(200)
+            sage: A = Matrix_complex_dense(MatrixSpace(F,3),[4,1,0,1,3,1,0,1,2])
+            sage: X = A.mat_solve_refined(A)
+            sage: abs(X[0,0]-1) < A.eps()*10 and abs(X[1,0]) < A.eps()*10
+            True
+
+        """
+        assert self._is_square
+        cdef int n = self._nrows
+        assert B._nrows == n
+        cdef int i,k
+        cdef mpc_t *b
+        cdef mpc_t *x
+        cdef int ok = 0
+        cdef Matrix_complex_dense res
+        Ainv = self._double_inverse(max_cond)
+        if Ainv is None:
+            if fallback==1:
+                return self.mat_solve(B)
+            raise ArithmeticError,"Matrix is too ill-conditioned for double precision!"
+        maxit = self._refine_maxit(maxit,Ainv[1])
+        res = Matrix_complex_dense.__new__(Matrix_complex_dense,B._parent,None,None,None)
+        b = <mpc_t *> sage_malloc(sizeof(mpc_t) * n)
+        x = <mpc_t *> sage_malloc(sizeof(mpc_t) * n)
+        if b==NULL or x==NULL: raise MemoryError
+        for i from 0 <= i < n:
+            mpc_init2(b[i],self._prec)
+            mpc_init2(x[i],self._prec)
+        for k from 0 <= k < B._ncols:
+            for i from 0 <= i < n:
+                mpc_set(b[i],B._matrix[i][k],self._rnd)
+            ok = self._refine_solution(b,x,Ainv[0],maxit)
+            if ok<>0:
+                break
+            for i from 0 <= i < n:
+                mpc_set(res._matrix[i][k],x[i],self._rnd)
+        for i from 0 <= i < n:
+            mpc_clear(b[i]); mpc_clear(x[i])
+        sage_free(b); sage_free(x)
+        if ok<>0:
+            if fallback==1:
+                return self.mat_solve(B)
+            raise ArithmeticError,"Iterative refinement did not converge!"
+        return res
+
+    cdef _double_inverse(self,double max_cond):
+        r"""
+        Return a tuple with the inverse of self in double precision and the estimated
+        (infinity-norm) condition number of self, or None if self is too
+        ill-conditioned (or not representable) in double precision.
+        """
+        cdef int n = self._nrows
+        cdef int i,j
+        cdef cnp.ndarray[cnp.complex128_t,ndim=2] Ad
+        Ad = np.empty((n,n),dtype=np.complex128)
+        for i from 0 <= i < n:
+            for j from 0 <= j < n:
+                Ad[i,j] = mpfr_get_d(self._matrix[i][j].re,self._rnd_re)+1j*mpfr_get_d(self._matrix[i][j].im,self._rnd_re)
+        if not np.isfinite(Ad).all():
+            return None
+        try:
+            Ainv = np.linalg.inv(Ad)
+        except np.linalg.LinAlgError:
+            return None
+        cond = np.linalg.norm(Ad,np.inf)*np.linalg.norm(Ainv,np.inf)
+        if not np.isfinite(cond) or cond > max_cond:
+            if self._verbose>0:
+                print "Condition number {0} too large for double precision!".format(cond)
+            return None
+        return Ainv,cond
+
+    cdef int _refine_maxit(self,int maxit,double cond):
+        r"""
+        The number of refinement steps needed: every step gains about
+        53-log_2(cond) bits.
+        """
+        cdef double bits
+        if maxit>0:
+            return maxit
+        bits = 53.0 - log(max(cond,1.0))/log(2.0) - log(<double>max(self._nrows,1))/log(2.0)
+        if bits < 1.0:
+            bits = 1.0
+        return <int>(self._prec/bits)+6
+
+    cdef int _refine_solution(self,mpc_t* b,mpc_t* x,Ainv,int maxit) except -2:
+        r"""
+        Solve self*x=b by iterative refinement using the approximate (double precision)
+        inverse Ainv of self. The residuals are computed at the precision of self.
+        Returns 0 if the correction is below the precision of x and -1 if the
+        refinement stagnates or does not converge in maxit steps.
+        """
+        cdef int n = self._nrows
+        cdef int i,j,it,res
+        cdef long e,ex
+        cdef double dmax,corr,corr_old,xr
+        cdef mpc_t *r
+        cdef mpc_t t
+        cdef mpfr_t tr
+        cdef cnp.ndarray[cnp.complex128_t,ndim=1] rd,dd
+        r = <mpc_t*>sage_malloc(sizeof(mpc_t)*n)
+        if r==NULL: raise MemoryError
+        for i from 0 <= i < n:
+            mpc_init2(r[i],self._prec)
+            mpc_set(r[i],b[i],self._rnd)
+            mpc_set_ui(x[i],0,self._rnd)
+        mpc_init2(t,self._prec)
+        mpfr_init2(tr,53)
+        rd = np.empty(n,dtype=np.complex128)
+        res = -1
+        corr_old = 0
+        for it from 0 <= it < maxit:
+            ## Scale the residual by 2^-e to avoid under- and overflow in double precision.
+            e = _mpc_vec_max_exp(r,n)
+            if e==LONG_MIN:
+                res = 0
+                break
+            for i from 0 <= i < n:
+                mpfr_mul_2si(tr,r[i].re,-e,self._rnd_re)
+                xr = mpfr_get_d(tr,self._rnd_re)
+                mpfr_mul_2si(tr,r[i].im,-e,self._rnd_re)
+                rd[i] = xr+1j*mpfr_get_d(tr,self._rnd_re)
+            dd = Ainv.dot(rd)
+            dmax = np.abs(dd).max()
+            if dmax==0:
+                res = 0
+                break
+            for i from 0 <= i < n:
+                mpc_set_d_d(t,dd[i].real,dd[i].imag,self._rnd)
+                mpc_mul_2si(t,t,e,self._rnd)
+                mpc_add(x[i],x[i],t,self._rnd)
+            ## The size of the correction (log_2)
+            corr = log(dmax)/log(2.0)+e
+            ex = _mpc_vec_max_exp(x,n)
+            if corr < ex-self._prec:
+                res = 0
+                break
+            if it>0 and corr > corr_old-1:
+                if self._verbose>0:
+                    print "Iterative refinement stagnates at step {0}".format(it)
+                break
+            corr_old = corr
+            ## r = b - A*x
+            for i from 0 <= i < n:
+                mpc_set(r[i],b[i],self._rnd)
+                for j from 0 <= j < n:
+                    mpc_mul(t,self._matrix[i][j],x[j],self._rnd)
+                    mpc_sub(r[i],r[i],t,self._rnd)
+        if self._verbose>0:
+            print "Iterative refinement: {0} steps".format(it+1)
+        for i from 0 <= i < n:
+            mpc_clear(r[i])
+        sage_free(r)
+        mpc_clear(t)
+        mpfr_clear(tr)
+        return res
+
     cpdef list eigenvalues(self,int check=0,int sorted=0,int overwrite=0,int num_threads=1,int schedule=0):
         r"""
         Compute the eigenvalues of self.
@@ -1816,10 +2077,20 @@ cdef class Matrix_complex_dense(Matrix_dense):
                  =-1   -- use automatic number of threads
         schedule = 0 => dynamic scheduling
                  = 1 => static scheduling
-        NOTE: num_threads >1 is not implemented
+        If num_threads<>1 we use a multishift QR-algorithm with aggressive
+        early deflation where the Givens rotations are applied in parallel.
+
+        EXAMPLES::
+
+            sage: from psage.matrix.matrix_complex_dense import RandomComplexMatrix
+            sage: A = RandomComplexMatrix(20,103)
+            sage: ev1 = A.eigenvalues()
+            sage: ev2 = A.eigenvalues(num_threads=2)
+            sage: max([abs(ev1[j]-ev2[j]) for j in range(20)]) < 2.0**-80
+            True
+
         """
         from sage.all import deepcopy
-        if num_threads>1: raise NotImplementedError,"Parallel linear algebra is not implemented!"
         cdef mpc_t* evs
         cdef list res
         cdef int i
@@ -1844,8 +2115,8 @@ cdef class Matrix_complex_dense(Matrix_dense):
             if num_threads==1:
                 _eigenvalues(evs,A,self._nrows,self._prec,self._rnd,self._rnd_re,self._verbose)
             else:
-                raise NotImplementedError,"Parallel linear algebra is not implemented!"
-                #_eigenvalues_par(evs,A,self._nrows,self._prec,num_threads,schedule,self._verbose,self._rnd,self._rnd_re)
+                if _eigenvalues_par(evs,A,self._nrows,self._prec,num_threads,schedule,self._verbose,self._rnd,self._rnd_re)<>0:
+                    raise ArithmeticError,"The parallel QR-algorithm failed!"
             #for i in range(self._nrows):
             #    print "evs[",i,"]=",print_mpc(evs[i])
             sage_free(A)
@@ -1853,9 +2124,8 @@ cdef class Matrix_complex_dense(Matrix_dense):
             if num_threads==1:
                 _eigenvalues(evs,self._matrix,self._nrows,self._prec,self._rnd,self._rnd_re,self._verbose)
             else:
-                raise NotImplementedError,"Parallel linear algebra is not implemented!"
-                #_eigenvalues_par(evs,self._matrix,self._nrows,self._prec,num_threads,schedule,self._verbose,self._rnd,self._rnd_re)
-                #_eigenvalues_par(evs,A,self._nrows,self._prec,self._rnd,self._rnd_re,nthreads)
+                if _eigenvalues_par(evs,self._matrix,self._nrows,self._prec,num_threads,schedule,self._verbose,self._rnd,self._rnd_re)<>0:
+                    raise ArithmeticError,"The parallel QR-algorithm failed!"
         z=self._base_ring(1)
         res  = list()
         for i from 0 <= i < self._nrows:
@@ -2345,6 +2615,23 @@ cpdef my_abscmp2(a,b,reverse=0):
 
 
 
+cdef long _mpc_vec_max_exp(mpc_t* v,int n):
+    r"""
+    Return the largest (binary) exponent of the real and imaginary parts of
+    the entries of v, or LONG_MIN if v is zero.
+    """
+    cdef int i
+    cdef long e,emax
+    emax = LONG_MIN
+    for i from 0 <= i < n:
+        if not mpfr_zero_p(v[i].re):
+            e = mpfr_get_exp(v[i].re)
+            if e>emax: emax=e
+        if not mpfr_zero_p(v[i].im):
+            e = mpfr_get_exp(v[i].im)
+            if e>emax: emax=e
+    return emax
+
 cdef _norm_vector(mpfr_t* norm, mpc_t* v,int n,mpfr_rnd_t rnd_re):
     cdef int i
     cdef mpfr_t x
@@ -2588,6 +2875,119 @@ cdef _multiply_classical(mpc_t* AB, mpc_t* A,mpc_t* B,int m, int n,int l,int pre
                     mpc_add(AB[ii],AB[ii],z,rnd)
         mpc_clear(z)
 
+cdef void _mul_row_block(mpc_t** A,mpc_t** B,mpc_t* C,mpfr_t* Asum,mpfr_t* Bsum,int i0,int i1,int nc,int snc,int bs,int prec,int use_3m,mpc_rnd_t rnd) nogil:
+    r"""
+    Compute rows i0,...,i1-1 of C=A*B where A is (at least) i1 x snc, B is snc x nc
+    and C is given as a vector of length nrows*nc. The loops are blocked
+    in blocks of size bs and the innermost loop runs along the rows of B and C.
+    If use_3m=1 then Asum and Bsum contain the sums of the real and imaginary parts
+    of A (as a vector of length nrows*snc) and B and the complex multiplication
+    uses 3 real multiplications.
+    """
+    cdef int i,j,k,jj,kk,j1,k1
+    cdef mpc_t z
+    cdef mpfr_t t1,t2,t3
+    cdef mpfr_rnd_t rnd_re = MPFR_RNDN
+    mpc_init2(z,prec)
+    mpfr_init2(t1,prec); mpfr_init2(t2,prec); mpfr_init2(t3,prec)
+    for i from i0 <= i < i1:
+        for j from 0 <= j < nc:
+            mpc_set_ui(C[i*nc+j],0,rnd)
+    kk = 0
+    while kk < snc:
+        k1 = kk+bs
+        if k1 > snc: k1 = snc
+        jj = 0
+        while jj < nc:
+            j1 = jj+bs
+            if j1 > nc: j1 = nc
+            for i from i0 <= i < i1:
+                for k from kk <= k < k1:
+                    if use_3m==1:
+                        for j from jj <= j < j1:
+                            mpfr_mul(t1,A[i][k].re,B[k][j].re,rnd_re)
+                            mpfr_mul(t2,A[i][k].im,B[k][j].im,rnd_re)
+                            mpfr_mul(t3,Asum[i*snc+k],Bsum[k*nc+j],rnd_re)
+                            mpfr_sub(t3,t3,t1,rnd_re)
+                            mpfr_sub(t3,t3,t2,rnd_re)
+                            mpfr_sub(t1,t1,t2,rnd_re)
+                            mpfr_add(C[i*nc+j].re,C[i*nc+j].re,t1,rnd_re)
+                            mpfr_add(C[i*nc+j].im,C[i*nc+j].im,t3,rnd_re)
+                    else:
+                        for j from jj <= j < j1:
+                            mpc_mul(z,A[i][k],B[k][j],rnd)
+                            mpc_add(C[i*nc+j],C[i*nc+j],z,rnd)
+            jj = j1
+        kk = k1
+    mpc_clear(z)
+    mpfr_clear(t1); mpfr_clear(t2); mpfr_clear(t3)
+
+def benchmark_multiplication(sizes=[50,100,200,500,1000,2000],precs=[53,103,212],num_threads=[1,2,4],use_3m=[0,1],verbose=1):
+    r"""
+    Compare the timings of the blocked and threaded matrix multiplication
+    with the previous (single threaded, unblocked) algorithm.
+
+    OUTPUT:
+
+    - dictionary with keys (size,prec,algorithm) and values the wall time in seconds.
+      Here algorithm is 'naive' or a tuple (num_threads,use_3m).
+
+    EXAMPLES::
+
+        sage: from psage.matrix.matrix_complex_dense import benchmark_multiplication
+        sage: res = benchmark_multiplication(sizes=[10],precs=[53],num_threads=[1],use_3m=[0],verbose=0)
+        sage: sorted(res.keys())
+        [(10, 53, 'naive'), (10, 53, (1, 0))]
+
+    """
+    from sage.all import walltime
+    cdef Matrix_complex_dense A,B
+    res = {}
+    for prec in precs:
+        for sz in sizes:
+            A = RandomComplexMatrix(sz,prec)
+            B = RandomComplexMatrix(sz,prec)
+            t0 = walltime()
+            _multiply_naive(A,B)
+            res[(sz,prec,'naive')] = walltime(t0)
+            for nt in num_threads:
+                for m in use_3m:
+                    t0 = walltime()
+                    A._multiply_classical(B,num_threads=nt,use_3m=m)
+                    res[(sz,prec,(nt,m))] = walltime(t0)
+            if verbose>0:
+                s = "n={0:5d} prec={1:4d} naive: {2:8.3f}".format(sz,prec,res[(sz,prec,'naive')])
+                for nt in num_threads:
+                    for m in use_3m:
+                        s+=" | threads={0} 3m={1}: {2:8.3f}".format(nt,m,res[(sz,prec,(nt,m))])
+                print s
+    return res
+
+cdef _multiply_naive(Matrix_complex_dense A,Matrix_complex_dense B):
+    r"""
+    The unblocked triple loop (used as reference in benchmark_multiplication).
+    """
+    cdef int i,j,k,n,m,l
+    cdef mpc_t s,z
+    cdef mpc_t *AB
+    m = A._nrows; n = A._ncols; l = B._ncols
+    AB = <mpc_t*>sage_malloc(sizeof(mpc_t)*m*l)
+    if AB==NULL: raise MemoryError
+    mpc_init2(s,A._prec)
+    mpc_init2(z,A._prec)
+    for i from 0 <= i < m:
+        for j from 0 <= j < l:
+            mpc_init2(AB[i*l+j],A._prec)
+            mpc_set_si(s,0,A._rnd)
+            for k from 0 <= k < n:
+                mpc_mul(z,A._matrix[i][k],B._matrix[k][j],A._rnd)
+                mpc_add(s,s,z,A._rnd)
+            mpc_set(AB[i*l+j],s,A._rnd)
+    for i from 0 <= i < m*l:
+        mpc_clear(AB[i])
+    sage_free(AB)
+    mpc_clear(s); mpc_clear(z)
+
 cdef Gershgorin_disks(mpc_t* B, int n, int prec,mpfr_rnd_t rnd_re):
         r"""
         Compute the G.-disks forcontain  self.
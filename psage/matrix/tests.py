@@ -39,6 +39,51 @@ def test_eigenvalues(prec=100,nmax=10,dimmax=10):
 	test = max([abs(ev[j]-l[j]) for j in range(len(ev))])
 	assert test < A.eps()*100
 
+def test_solve_refined(prec=200,nmax=5,dimmax=10):
+    r"""
+    Test that the mixed precision solver agrees with the QR-solver.
+    """
+    F = MPComplexField(prec)
+    for n in range(nmax):
+        dim = ZZ.random_element(2,dimmax)
+        A,U,l=random_matrix_eigenvalues(F,dim)
+        b = A.column(0)
+        x1 = A.solve(b)
+        x2 = A.solve_refined(b)
+        test = max([abs(x1[j]-x2[j]) for j in range(dim)])
+        assert test < A.eps()*1000
+
+def test_eigenvalues_multishift(prec=103,nmax=3,dim=40):
+    r"""
+    Test the parallel multishift QR-algorithm against the known eigenvalues.
+    """
+    F = MPComplexField(prec)
+    for n in range(nmax):
+        A,U,l=random_matrix_eigenvalues(F,dim)
+        ev = A.eigenvalues(num_threads=2)
+        ev.sort(cmp=my_abscmp); l.sort(cmp=my_abscmp)
+        test = max([abs(ev[j]-l[j]) for j in range(len(ev))])
+        assert test < A.eps()*1000
+
+def test_multiply_classical(prec=103,sizes=[(1,1,1),(3,5,2),(33,17,40),(45,70,31)],num_threads=[1,2,3]):
+    r"""
+    Test the blocked matrix multiplication against the naive triple loop
+    for non-square sizes which are not multiples of the block size,
+    with one and several threads and with and without the 3M method.
+    """
+    F = MPComplexField(prec)
+    for m,n,l in sizes:
+        A = Matrix_complex_dense(MatrixSpace(F,m,n),[F.random_element() for i in range(m*n)])
+        B = Matrix_complex_dense(MatrixSpace(F,n,l),[F.random_element() for i in range(n*l)])
+        C = [[sum([A[i,k]*B[k,j] for k in range(n)]) for j in range(l)] for i in range(m)]
+        for nt in num_threads:
+            for use_3m in [0,1]:
+                for bs in [0,7]:
+                    AB = A._multiply_classical(B,num_threads=nt,use_3m=use_3m,block_size=bs)
+                    assert AB.nrows()==m and AB.ncols()==l
+                    test = max([abs(AB[i,j]-C[i][j]) for i in range(m) for j in range(l)])
+                    assert test < A.eps()*n*100
+
 ##
 ## Helper functions
 ##
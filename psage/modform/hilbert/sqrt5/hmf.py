@@ -31,12 +31,19 @@ from psage.number_fields.sqrt5 import primes_of_bounded_norm
 
 
 from sqrt5_fast import IcosiansModP1ModN
-from sage.rings.all import Integer, prime_divisors, QQ, next_prime, ZZ
+from sage.rings.all import Integer, prime_divisors, QQ, next_prime, ZZ, GF, previous_prime
+from sage.misc.all import prod
 from sage.rings.ideal import is_Ideal
+from sage.rings.arith import CRT_vectors
 from tables import ideals_of_norm
 from sage.matrix.all import matrix
+from sage.matrix.berlekamp_massey import berlekamp_massey
+from sage.modules.all import vector
 from sage.structure.all import Sequence
 
+# Sparse matrices over GF(p) are only implemented for p less than this.
+MAX_SPARSE_MODULUS = 46341
+
 def ideal(X):
     if not is_Ideal(X):
         return O_F.ideal(X)
@@ -69,6 +76,39 @@ def next_prime_not_dividing(P, I):
         else:
             P = Q # try again
 
+def wiedemann_minpoly(T, ntries=2):
+    """
+    Return the minimal polynomial of the square matrix T over a finite
+    field, computed by the Wiedemann algorithm, which only multiplies
+    vectors by T, so T can be a big sparse matrix.
+
+    The algorithm is probabilistic: the output always divides the
+    minimal polynomial, and is equal to it with high probability.  It
+    is the lcm of the minimal polynomials of ntries random sequences
+    u*T^i*w.
+
+    EXAMPLES::
+
+        sage: from psage.modform.hilbert.sqrt5.hmf import wiedemann_minpoly, F, HilbertModularForms
+        sage: T = HilbertModularForms(F.prime_above(389)).T(2).change_ring(GF(46337))
+        sage: wiedemann_minpoly(T) == T.minpoly()
+        True
+    """
+    k = T.base_ring()
+    n = T.nrows()
+    V = k**n
+    f = None
+    for _ in range(ntries):
+        u = V.random_element()
+        w = V.random_element()
+        seq = []
+        for i in range(2*n):
+            seq.append(u.dot_product(w))
+            w = w*T
+        g = berlekamp_massey(seq)
+        f = g if f is None else f.lcm(g)
+    return f
+
 class Space(object):
     def __cmp__(self, right):
         if not isinstance(right, Space):
@@ -279,23 +319,242 @@ class HilbertModularForms(Space):
     def subspace(self, V):
         return HilbertModularFormsSubspace(self, V)
     
-    def elliptic_curve_factors(self):
-        D = [X for X in self.new_decomposition() if X.dimension() == 1]
-        # Have to get rid of the Eisenstein factor
-        p = next_prime_of_characteristic_coprime_to(F.ideal(1), self.level())
-        while True:
-            q = p.residue_field().cardinality() + 1
-            E = [A for A in D if A.hecke_matrix(p)[0,0] == q]
-            if len(E) == 0:
-                break
-            elif len(E) == 1:
-                D = [A for A in D if A != E[0]]
-                break
-            else:
-                p = next_prime_of_characteristic_coprime_to(p, self.level())
+    def elliptic_curve_factors(self, algorithm='dense'):
+        """
+        Return the subspaces of the new subspace that (conjecturally)
+        correspond to isogeny classes of elliptic curves.
+
+        INPUT:
+            - ``algorithm`` -- 'dense' (default) or 'sparse'; if
+              'dense', compute the full new_decomposition; if
+              'sparse', use rational_new_eigenvectors, which only
+              works with sparse matrices modulo small primes, and is
+              much faster and uses much less memory at big levels.
+              If that fails to find and lift all rational eigenvectors,
+              the 'dense' algorithm is used instead.
+
+        EXAMPLES::
+
+            sage: from psage.modform.hilbert.sqrt5.hmf import HilbertModularForms, F
+            sage: H = HilbertModularForms(F.primes_above(71)[1])
+            sage: [A.aplist(30) for A in H.elliptic_curve_factors(algorithm='sparse')] == [A.aplist(30) for A in H.elliptic_curve_factors()]
+            True
+        """
+        if algorithm == 'sparse':
+            try:
+                vectors, skipped = self._rational_new_eigenvectors()
+            except RuntimeError:
+                skipped = True
+            if skipped:
+                return self.elliptic_curve_factors(algorithm='dense')
+            D = [self.subspace(self.vector_space().span([v])) for v in vectors]
+            D.sort()
+        elif algorithm == 'dense':
+            D = [X for X in self.new_decomposition() if X.dimension() == 1]
+            # Have to get rid of the Eisenstein factor
+            p = next_prime_of_characteristic_coprime_to(F.ideal(1), self.level())
+            while True:
+                q = p.residue_field().cardinality() + 1
+                E = [A for A in D if A.hecke_matrix(p)[0,0] == q]
+                if len(E) == 0:
+                    break
+                elif len(E) == 1:
+                    D = [A for A in D if A != E[0]]
+                    break
+                else:
+                    p = next_prime_of_characteristic_coprime_to(p, self.level())
+        else:
+            raise ValueError, "unknown algorithm '%s'"%algorithm
         return Sequence([EllipticCurveFactor(X, number) for number, X in enumerate(D)],
                         immutable=True, cr=True, universe=int, check=False)
 
+    def rational_new_eigenvectors(self, B=None, verbose=False):
+        """
+        Return the eigenvectors v (with v*T_P = a_P*v for all P) in
+        the new subspace of self whose eigenvalues a_P are all integers,
+        except the Eisenstein series, up to scaling.
+
+        No dense matrix over QQ is ever computed.  The eigenvalues are
+        found modulo a prime p < MAX_SPARSE_MODULUS = 46341 (the bound
+        for sparse matrices over GF(p)) using sparse matrices: the
+        first Hecke operator is handled with the Wiedemann algorithm,
+        and the following ones on the (small) common eigenspaces
+        modulo p.
+        Only integers a_P with `|a_P| \leq 2\sqrt{N(P)}` are considered,
+        which excludes the Eisenstein series.  Each eigenvector is then
+        lifted to QQ from its reductions modulo several primes by
+        CRT and rational reconstruction, and checked exactly.
+        Eigenvectors which cannot be lifted (because the eigenspace
+        modulo p is bigger than in characteristic 0) are skipped, with
+        a message if verbose is True.
+
+        INPUT:
+            - B -- Integer or None; use Hecke operators T_P with
+              norm(P) <= B.  If None, use the same heuristic bound as
+              EllipticCurveFactor.dual_eigenspace.
+            - ``verbose`` -- bool (default: False)
+
+        OUTPUT:
+            - list of vectors over QQ, each with first nonzero entry 1
+
+        EXAMPLES::
+
+            sage: from psage.modform.hilbert.sqrt5.hmf import HilbertModularForms, F
+            sage: H = HilbertModularForms(F.prime_above(31))
+            sage: v = H.rational_new_eigenvectors(); v
+            [(1, -1)]
+            sage: v[0] * H.T(2) == -3*v[0]
+            True
+        """
+        return self._rational_new_eigenvectors(B, verbose)[0]
+
+    def _rational_new_eigenvectors(self, B=None, verbose=False):
+        """
+        Return the list rational_new_eigenvectors(B) and the list of
+        the eigenvalues of the eigenvectors which could not be lifted.
+        """
+        N = self.level()
+        if B is None:
+            from sage.modular.all import Gamma0
+            B = Gamma0(N.norm()).index()//6 + 1
+        primes = [P for P in [Q.sage_ideal() for Q in primes_of_bounded_norm(B+1)] if not P.divides(N)]
+
+        p = MAX_SPARSE_MODULUS
+        for attempt in range(5):
+            p = previous_prime(p)
+            try:
+                spaces = self._rational_new_eigenspaces_mod(p, primes, verbose)
+            except ArithmeticError:
+                # p divides some resultant, so the reduction mod p is misleading
+                continue
+            if len([W for W, _ in spaces if W.nrows() > 1]) > 0:
+                raise RuntimeError, "unable to isolate eigenvectors using Hecke operators of norm at most %s"%B
+            vectors = []; skipped = []
+            for W, a in spaces:
+                v = self._lift_new_eigenvector(primes[:len(a)], a, p, W.row(0), verbose)
+                if v is None:
+                    if verbose: print "unable to lift eigenvector with eigenvalues %s, skipping it"%a
+                    skipped.append(a)
+                else:
+                    vectors.append(v)
+            return vectors, skipped
+        raise RuntimeError, "unable to find a good prime"
+
+    def _rational_new_eigenspaces_mod(self, p, primes, verbose=False):
+        """
+        Return list of pairs (W, a), where W is the basis matrix over
+        GF(p) of the common eigenspace in the new subspace of the
+        operators T_P for the first len(a) primes P in the list primes,
+        with eigenvalues a (a list of integers), and W has 1 row unless
+        all the primes were used.  Raise an ArithmeticError if p turns
+        out to be bad, in particular if the dimension of an eigenspace
+        differs from the multiplicity of the eigenvalue as a root of
+        the characteristic polynomial (resp. if it is a multiple root
+        of the minimal polynomial), i.e., T_P is not semisimple mod p.
+        """
+        k = GF(p)
+        D = self.degeneracy_matrix().change_ring(k)
+        spaces = None
+        for P in primes:
+            if spaces is not None and len([W for W, _ in spaces if W.nrows() > 1]) == 0:
+                break
+            T = self.hecke_matrix(P).change_ring(k)
+            r = 2*ZZ(P.norm()).isqrt()   # |a_P| <= 2*sqrt(N(P))
+            if verbose: print "norm(P) = %s, spaces = %s"%(P.norm(), None if spaces is None else len(spaces))
+            new = []
+            if spaces is None:
+                # whole new subspace -- only use products with T
+                f = wiedemann_minpoly(T)
+                for a in range(-r, r+1):
+                    if f(a) == 0:
+                        if f.derivative()(a) == 0:
+                            raise ArithmeticError, "T_P is not semisimple modulo %s"%p
+                        K = (T - a).augment(D).kernel()
+                        if K.dimension() > 0:
+                            new.append((K.basis_matrix().dense_matrix(), [a]))
+            else:
+                for W, eigs in spaces:
+                    if W.nrows() == 1:
+                        new.append((W, eigs))
+                        continue
+                    # matrix of T restricted to the row space of W
+                    C = W*T
+                    A = C.matrix_from_columns(W.pivots())
+                    if A*W != C:
+                        raise ArithmeticError, "space not invariant modulo %s"%p
+                    f = A.charpoly()
+                    x = f.parent().gen()
+                    for a in range(-r, r+1):
+                        m = 0
+                        while f(a) == 0:
+                            f = f // (x - a)
+                            m += 1
+                        if m > 0:
+                            K = (A - a).kernel()
+                            if K.dimension() != m:
+                                raise ArithmeticError, "T_P is not semisimple modulo %s"%p
+                            new.append(((K.basis_matrix()*W).echelon_form(), eigs + [a]))
+            spaces = new
+        if spaces is None:
+            raise ValueError, "there must be at least one prime P"
+        return spaces
+
+    def _new_eigenvector_mod(self, p, primes, a):
+        """
+        Return the vector w over GF(p) with first nonzero entry 1 that
+        spans the intersection of the new subspace with the kernels of
+        T_P - a_P, for the primes P in primes, or None if that space
+        isn't one-dimensional.
+        """
+        k = GF(p)
+        M = self.degeneracy_matrix().change_ring(k)
+        for P, ap in zip(primes, a):
+            M = (self.hecke_matrix(P).change_ring(k) - ap).augment(M)
+        K = M.kernel()
+        if K.dimension() != 1:
+            return None
+        return K.basis_matrix().row(0)
+
+    def _lift_new_eigenvector(self, primes, a, p, w, verbose=False, max_primes=100):
+        """
+        Return the vector v over QQ with first nonzero entry 1 that is
+        in the new subspace and satisfies v*T_P = a_P*v for the primes
+        in primes, given its reduction w modulo p, or None if no such
+        vector is found using at most max_primes primes.
+        """
+        i = w.nonzero_positions()[0]
+        residues = [[ZZ(c) for c in w]]
+        moduli = [p]
+        while len(moduli) < max_primes:
+            M = prod(moduli)
+            x = CRT_vectors(residues, moduli)
+            try:
+                v = vector(QQ, [ZZ(c).rational_reconstruction(M) for c in x])
+            except (ValueError, ArithmeticError):
+                v = None
+            if v is not None and self._is_new_eigenvector(v, primes, a):
+                return v
+            p = previous_prime(p)
+            w = self._new_eigenvector_mod(p, primes, a)
+            if w is None or w.nonzero_positions()[0] != i:
+                if verbose: print "skipping p = %s"%p
+                continue
+            residues.append([ZZ(c) for c in w])
+            moduli.append(p)
+        return None
+
+    def _is_new_eigenvector(self, v, primes, a):
+        """
+        Return True if v is in the new subspace and v*T_P = a_P*v for
+        the primes in primes.
+        """
+        if not (v*self.degeneracy_matrix()).is_zero():
+            return False
+        for P, ap in zip(primes, a):
+            if v*self.hecke_matrix(P) != ap*v:
+                return False
+        return True
+
 class HilbertModularFormsSubspace(Space):
     def __init__(self, H, V):
         assert H.dimension() == V.degree()
@@ -1120,11 +1120,22 @@ except OSError, e:
     
 @disk_cached_function(path, memory_cache=True)
 def hecke_elements(P):
+    T = _hecke_element_table
+    if T is not None and P in T:
+        return [~a for a in T.elements(P)]
+    return [~a for a in hecke_alphas(P)]
+
+def hecke_alphas(P):
+    """
+    Return the elements alpha of the icosian ring of reduced norm a
+    totally positive generator of P, one for each element of
+    P^1(O_F/P), whose inverses are the hecke_elements(P).
+    """
     if P.norm() == 4:
         # hardcode this special case.
-        return [~a for a in hecke_elements_2()]
+        return hecke_elements_2()
     else:
-        return [~a for a in AlphaZ(P).all_alpha()]
+        return AlphaZ(P).all_alpha()
 
 
 # Dumb code to get this special case.  The answer turns out to be:
@@ -1163,6 +1174,192 @@ def hecke_elements_2():
                 return [x for _, x in ans.iteritems()]
     raise RuntimeError
 
+################################################################
+# Persistent tables of Hecke elements
+################################################################
+
+import itertools
+import numpy as np
+import tempfile
+
+## Increase this if the layout of the stored data is changed.
+HECKE_TABLE_VERSION = 1
+
+class HeckeElementTable(object):
+    """
+    A table of the Hecke elements for all primes P of norm at most
+    a given bound, stored on disk.
+
+    The Hecke elements don't depend on the level, so the table can be
+    used for all levels.  For each P we store the elements alpha of
+    hecke_alphas(P) (so hecke_elements(P) are their inverses), with
+    alpha = sum_m (x_m + y_m*a)*g_m, where g_0,...,g_3 are the
+    icosian_ring_gens(), as the row (x_0,y_0,...,x_3,y_3) of 64-bit
+    integers.  The rows of all primes are in one .npy file, in the
+    order of primes_of_bounded_norm(bound), and a second .npy file
+    holds the offsets of the rows of each prime.  Both are
+    memory-mapped when read.
+
+    EXAMPLES::
+
+        sage: from psage.modform.hilbert.sqrt5.sqrt5 import HeckeElementTable, hecke_alphas, F
+        sage: T = HeckeElementTable(tmp_dir(), 50); T
+        Table of Hecke elements for the 14 primes of norm at most 50
+        sage: P = F.prime_above(11); P in T, F.prime_above(53) in T
+        (True, False)
+        sage: T.coordinates(P).shape
+        (12, 8)
+        sage: T.elements(P) == hecke_alphas(P)
+        True
+    """
+    def __init__(self, directory, bound, build=True, ncpus=1):
+        """
+        INPUT:
+            - ``directory`` -- string
+            - ``bound`` -- integer
+            - ``build`` -- bool (default: True); if True, compute and
+              store the table if it isn't in directory, otherwise
+              raise an IOError
+            - ``ncpus`` -- integer (default: 1); number of processes
+              used to compute the table
+        """
+        self._dir = directory
+        self._bound = int(bound)
+        self._primes = primes_of_bounded_norm(self._bound)
+        self._index = dict([(P, i) for i, P in enumerate(self._primes)])
+        base = os.path.join(directory, 'hecke-elements-v%s-%s'%(HECKE_TABLE_VERSION, self._bound))
+        self._files = (base + '-coords.npy', base + '-offsets.npy')
+        # The offsets are written last, so they decide if the table exists.
+        if not os.path.exists(self._files[1]):
+            if not build:
+                raise IOError, "no table of Hecke elements in %s"%directory
+            self._build(ncpus)
+        self._coords = np.load(self._files[0], mmap_mode='r')
+        self._offsets = np.load(self._files[1], mmap_mode='r')
+        if len(self._offsets) != len(self._primes) + 1 or self._offsets[-1] != len(self._coords):
+            raise ValueError, "table of Hecke elements in %s is corrupt"%directory
+
+    def __repr__(self):
+        return "Table of Hecke elements for the %s primes of norm at most %s"%(
+            len(self._primes), self._bound)
+
+    def bound(self):
+        return self._bound
+
+    def __contains__(self, P):
+        return P in self._index
+
+    def coordinates(self, P):
+        """
+        Return read-only int64 array, whose rows are the coordinates
+        of the elements of hecke_alphas(P).
+        """
+        i = self._index[P]
+        return self._coords[self._offsets[i]:self._offsets[i+1]]
+
+    def elements(self, P):
+        """
+        Return the list hecke_alphas(P), computed from the table.
+        """
+        G = icosian_ring_gens()
+        a = F.gen()
+        return [sum([(int(c[2*m]) + int(c[2*m+1])*a)*G[m] for m in range(4)])
+                for c in self.coordinates(P)]
+
+    def _build(self, ncpus):
+        rows = {}
+        if ncpus > 1:
+            from sage.parallel.decorate import parallel
+            for X in parallel(ncpus)(hecke_alpha_coordinates)(self._primes):
+                if not isinstance(X[1], list):
+                    raise RuntimeError, "computation of the Hecke elements for %s failed"%(X[0][0][0],)
+                rows[X[0][0][0]] = X[1]
+        else:
+            for P in self._primes:
+                rows[P] = hecke_alpha_coordinates(P)
+        v = [rows[P] for P in self._primes]
+        offsets = np.cumsum([0] + [len(r) for r in v]).astype(np.int64)
+        coords = np.array(list(itertools.chain.from_iterable(v)), dtype=np.int64).reshape(-1, 8)
+        for name, arr in [(self._files[0], coords), (self._files[1], offsets)]:
+            # Write to a temporary file and rename it, so that other
+            # processes never see a partially written table.
+            fd, tmp = tempfile.mkstemp(dir=self._dir, prefix='.tmp-')
+            f = os.fdopen(fd, 'wb')
+            try:
+                np.save(f, arr)
+            finally:
+                f.close()
+            os.rename(tmp, name)
+
+def hecke_alpha_coordinates(P):
+    """
+    Return the coordinates of the elements of hecke_alphas(P), as
+    stored in a HeckeElementTable.
+
+    EXAMPLES::
+
+        sage: from psage.modform.hilbert.sqrt5.sqrt5 import hecke_alpha_coordinates, F
+        sage: len(hecke_alpha_coordinates(F.prime_above(2)))
+        5
+    """
+    from sqrt5_fast import quaternion_in_terms_of_icosian_basis
+    G = icosian_ring_gens()
+    ans = []
+    for alpha in hecke_alphas(P):
+        v = quaternion_in_terms_of_icosian_basis(alpha)
+        if sum([v[m]*G[m] for m in range(4)]) != alpha:
+            raise RuntimeError, "bug -- %s is not in the icosian ring"%alpha
+        ans.append(sum([[int(c) for c in x.list()] for x in v], []))
+    return ans
+
+_hecke_element_table = None
+
+def hecke_element_table():
+    """
+    Return the HeckeElementTable used by hecke_elements and by the
+    Hecke operators in sqrt5_fast, or None.
+    """
+    return _hecke_element_table
+
+def set_hecke_element_table(bound=1000, directory=path, build=True, ncpus=1):
+    """
+    Set the table of Hecke elements to be used to the one for primes
+    of norm at most bound in directory, computing it if necessary (if
+    build is True).  If bound is None, stop using a table.
+
+    EXAMPLES::
+
+        sage: from psage.modform.hilbert.sqrt5.sqrt5 import set_hecke_element_table
+        sage: set_hecke_element_table(100, tmp_dir())
+        Table of Hecke elements for the 24 primes of norm at most 100
+        sage: set_hecke_element_table(None)
+    """
+    global _hecke_element_table
+    if bound is None:
+        _hecke_element_table = None
+    else:
+        _hecke_element_table = HeckeElementTable(directory, bound, build=build, ncpus=ncpus)
+    return _hecke_element_table
+
+def _load_hecke_element_table(directory=path):
+    # Use the table with the largest bound that was stored in
+    # directory by an earlier session, if there is one.
+    import glob
+    prefix = os.path.join(directory, 'hecke-elements-v%s-'%HECKE_TABLE_VERSION)
+    bounds = []
+    for name in glob.glob(prefix + '*-offsets.npy'):
+        try:
+            bounds.append(int(name[len(prefix):-len('-offsets.npy')]))
+        except ValueError:
+            pass
+    for bound in reversed(sorted(bounds)):
+        try:
+            return set_hecke_element_table(bound, directory, build=False)
+        except (IOError, ValueError):
+            pass
+
+_load_hecke_element_table()
+
 class HMF:
     def __init__(self, N):
         from sage.all import QuadraticField, QuaternionAlgebra
@@ -21,6 +21,7 @@ cdef class ResidueRing_abstract(CommutativeRing):
     cdef ResidueRingElement new_element(self)
     cdef int coefficients(self, long* v0, long* v1, NumberFieldElement_quadratic x) except -1    
     cdef int coerce_from_nf(self, residue_element r, NumberFieldElement_quadratic x) except -1
+    cdef int coerce_from_coefficients(self, residue_element r, long v0, long v1) except -1
     cdef bint element_is_1(self, residue_element op)
     cdef bint element_is_0(self, residue_element op)
     cdef void set_element_to_1(self, residue_element op)
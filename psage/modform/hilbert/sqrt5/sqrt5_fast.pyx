@@ -31,10 +31,16 @@ include 'python.pxi'
 
 from sage.rings.all import Integers, ZZ, QQ
 from sage.rings.ideal import is_Ideal
-from sage.matrix.all import MatrixSpace, zero_matrix
+from sage.matrix.all import MatrixSpace, zero_matrix, matrix
+from sage.parallel.decorate import parallel
+import sage.parallel.ncpus
 
 from sage.rings.integer cimport Integer
 
+import numpy as np
+cimport numpy as cnp
+cnp.import_array()
+
 from sqrt5 import F
 
 cdef Integer temp1 = Integer(0)
@@ -239,6 +245,10 @@ cdef class ResidueRing_abstract(CommutativeRing):
     cdef int coerce_from_nf(self, residue_element r, NumberFieldElement_quadratic x) except -1:
         raise NotImplementedError
 
+    cdef int coerce_from_coefficients(self, residue_element r, long v0, long v1) except -1:
+        # Set r to the reduction of the algebraic integer v0 + v1*(1+sqrt(5))/2.
+        raise NotImplementedError
+
     def __repr__(self):
         return "Residue class ring of %s^%s of characteristic %s"%(
             self.P._repr_short(), self.e, self.p)
@@ -401,9 +411,13 @@ cdef class ResidueRing_split(ResidueRing_abstract):
                 raise RuntimeError, "bug -- maybe F is misdefined to have wrong gen"
 
     cdef int coerce_from_nf(self, residue_element r, NumberFieldElement_quadratic x) except -1:
-        r[1] = 0
         cdef long v0, v1
         self.coefficients(&v0, &v1, x)
+        return self.coerce_from_coefficients(r, v0, v1)
+
+    cdef int coerce_from_coefficients(self, residue_element r, long v0, long v1) except -1:
+        v0 %= self.n0; v1 %= self.n0
+        r[1] = 0
         r[0] = v0 + (self.im_gen0*v1)%self.n0
         if r[0] >= self.n0:
             r[0] -= self.n0
@@ -511,6 +525,11 @@ cdef class ResidueRing_nonsplit(ResidueRing_abstract):
         # reduced mod self.n0 and self.n1.
         self.coefficients(&r[0], &r[1], x)
 
+    cdef int coerce_from_coefficients(self, residue_element r, long v0, long v1) except -1:
+        r[0] = v0 % self.n0
+        r[1] = v1 % self.n1
+        return 0 # success
+
     def __reduce__(self):
         return ResidueRing_nonsplit, (self.P, self.p, self.e)
         
@@ -880,6 +899,10 @@ cdef class ResidueRing_ramified_odd(ResidueRing_abstract):
         #    cdef class ResidueRingElement_ramified_odd(ResidueRingElement)
         cdef long v0, v1
         self.coefficients(&v0, &v1, x)
+        return self.coerce_from_coefficients(r, v0, v1)
+
+    cdef int coerce_from_coefficients(self, residue_element r, long v0, long v1) except -1:
+        v0 %= self.n0; v1 %= self.n0
         if v0 == 0 and v1 == 0:
             r[0] = 0; r[1] = 0
         elif v1 == 0:
@@ -1522,6 +1545,16 @@ cdef class ResidueRingModN:
             R.coerce_from_nf(rop[i], op)
         return 0 # success
 
+    cdef int coerce_from_coefficients(self, modn_element rop, long v0, long v1) except -1:
+        # Set rop to the reduction of the algebraic integer v0 + v1*(1+sqrt(5))/2
+        # modulo N.  Unlike coerce_from_nf, this involves no Python objects.
+        cdef int i
+        cdef ResidueRing_abstract R
+        for i in range(self.r):
+            R = self.residue_rings[i]
+            R.coerce_from_coefficients(rop[i], v0, v1)
+        return 0 # success
+
     cdef void set_element(self, modn_element rop, modn_element op):
         cdef int i
         for i in range(self.r):
@@ -2083,6 +2116,8 @@ cdef class ModN_Reduction:
     cdef ResidueRingModN S
     cdef modn_matrix G[4]
     cdef bint is_odd
+    cdef modn_matrix basis_images[4]
+    cdef bint have_basis_images
     def __init__(self, N, bint init=True):
         cdef int i
 
@@ -2246,6 +2281,38 @@ cdef class ModN_Reduction:
                     R.add(M[i][0], M[i][0], t2)
             
 
+    cdef int compute_basis_images(self) except -1:
+        # Compute the images of the generators of the icosian ring
+        # over O_F, which are used by icosian_coordinates_to_modn_matrix.
+        from sqrt5 import icosian_ring_gens
+        cdef int m
+        for m, g in enumerate(icosian_ring_gens()):
+            self.quatalg_to_modn_matrix(self.basis_images[m], g)
+        self.have_basis_images = True
+        return 0
+
+    cdef int icosian_coordinates_to_modn_matrix(self, modn_matrix M, long* c) except -1:
+        # Given the coordinates c[0],...,c[7] of an element
+        #     alpha = sum (c[2*m] + c[2*m+1]*a) * g_m
+        # of the icosian ring, where g_0,...,g_3 are the
+        # icosian_ring_gens(), find its image M as a modn_matrix.
+        # This gives the same M as quatalg_to_modn_matrix (which is
+        # O_F-linear), but without touching any Python objects.
+        cdef modn_element t, X
+        cdef int i, m
+        cdef ResidueRingModN S = self.S
+        if not self.have_basis_images:
+            self.compute_basis_images()
+        S.coerce_from_coefficients(X, c[0], c[1])
+        for i in range(4):
+            S.mul(M[i], self.basis_images[0][i], X)
+        for m in range(1, 4):
+            S.coerce_from_coefficients(X, c[2*m], c[2*m+1])
+            for i in range(4):
+                S.mul(t, self.basis_images[m][i], X)
+                S.add(M[i], M[i], t)
+        return 0
+
     def __call__(self, alpha):
         """
         A sort of joke for now.  Reduce alpha using this map, then return
@@ -2529,24 +2596,238 @@ cdef class IcosiansModP1ModN:
             sage: t*s == s*t
             True
         """
-        if ZZ(self.level().norm()).gcd(ZZ(P.norm())) != 1:
-            return self._hecke_matrix_badnorm(P, sparse=sparse)
-        cdef modn_matrix M
+        return self._counts_to_matrix(self.hecke_counts(P), sparse)
+
+    def hecke_matrices(self, primes, sparse=True, ncpus=1):
+        """
+        Return the list of matrices of the Hecke operators T_P for
+        the primes P in the given list, as output by hecke_matrix.
+
+        Only the nonzero entries of each matrix are computed, as int32
+        arrays (see hecke_counts), and converted to a Sage matrix at
+        the end.  If ncpus is bigger than 1, the primes are split among
+        that many worker processes, which return these arrays.
+
+        INPUT:
+            - ``primes`` -- list of prime ideals
+            - ``sparse`` -- bool (default: True) if True, then sparse
+              matrices are returned, otherwise dense ones
+            - ``ncpus`` -- integer (default: 1) or None; number of
+              processes to use (None means use all cpus)
+
+        OUTPUT:
+            - list of dense or sparse matrices over the rational numbers
+
+        EXAMPLES::
+
+            sage: from psage.modform.hilbert.sqrt5.sqrt5_fast import F, IcosiansModP1ModN
+            sage: I = IcosiansModP1ModN(F.prime_above(389))
+            sage: v = [F.prime_above(2), F.prime_above(3), F.prime_above(5)] + F.primes_above(11)
+            sage: T = I.hecke_matrices(v); T[0]
+            [0 3 0 1 1 0 0]
+            [3 0 0 0 1 0 1]
+            [0 0 2 1 0 1 1]
+            [1 0 1 0 1 0 2]
+            [1 1 0 1 0 1 1]
+            [0 0 2 0 2 1 0]
+            [0 1 1 2 1 0 0]
+            sage: T == [I.hecke_matrix(P) for P in v]
+            True
+            sage: I.hecke_matrices(v, sparse=False, ncpus=2) == T
+            True
+            sage: I.hecke_matrices([])
+            []
+        """
+        primes = list(primes)
+        if ncpus is None:
+            ncpus = sage.parallel.ncpus.ncpus()
+        if ncpus <= 1 or len(primes) <= 1:
+            return [self._counts_to_matrix(self.hecke_counts(P), sparse) for P in primes]
+
+        # Each worker gets every ncpus-th prime, which evens out the
+        # work, since the cost grows with the norm of P.
+        chunks = [range(k, len(primes), ncpus) for k in range(min(ncpus, len(primes)))]
+        counts = [None]*len(primes)
+        for X in parallel(ncpus)(_hecke_counts_worker)([(self, primes, I) for I in chunks]):
+            if not isinstance(X[1], list):
+                raise RuntimeError, "computation of Hecke matrices failed"
+            for k, c in X[1]:
+                counts[k] = c
+        return [self._counts_to_matrix(c, sparse) for c in counts]
+
+    def hecke_counts(self, P):
+        """
+        Return the nonzero entries of the matrix of T_P (as in
+        hecke_matrix) in compressed sparse row form, i.e., as a triple
+        (indptr, indices, data) of int32 arrays such that the nonzero
+        entries of row i are data[indptr[i]:indptr[i+1]], in the
+        columns indices[indptr[i]:indptr[i+1]].  Each row has at most
+        N(P)+1 nonzero entries.
+
+        INPUT:
+            - P -- prime ideal
+
+        EXAMPLES::
+
+            sage: from psage.modform.hilbert.sqrt5.sqrt5_fast import F, IcosiansModP1ModN
+            sage: I = IcosiansModP1ModN(F.primes_above(31)[0])
+            sage: indptr, indices, data = I.hecke_counts(F.prime_above(2))
+            sage: indptr.tolist()
+            [0, 1, 3]
+            sage: sorted(zip(indices.tolist(), data.tolist()))
+            [(0, 3), (1, 2), (1, 5)]
+            sage: data.dtype
+            dtype('int32')
+        """
+        return self._hecke_count_csr(P, ZZ(self.level().norm()).gcd(ZZ(P.norm())) != 1)
+
+    def _hecke_count_csr(self, P, bint inverse):
+        """
+        Return hecke_counts(P), computed using the inverses of the
+        Hecke elements if inverse is True (see _hecke_matrix_badnorm).
+
+        The matrices of the Hecke elements modulo the level are
+        computed once, and then the entries of T_P are counted row by
+        row straight into the output arrays, so only O(n + N(P))
+        memory is used besides the output, where n is the cardinality
+        of self.
+        """
+        cdef long i, j, k, m, n = self._cardinality
+        cdef long nnz = 0, size
+        cdef modn_matrix* Ms = NULL
+        cdef long* cols = NULL
+        cdef long* cnt = NULL
         cdef p1_element Mx
-        from sqrt5 import hecke_elements
+        cdef cnp.ndarray indptr, indices, data
+        cdef cnp.int32_t* ip
+        cdef cnp.int32_t* ind
+        cdef cnp.int32_t* dat
 
-        T = zero_matrix(QQ, self._cardinality, sparse=sparse)
-        cdef long i, j
+        if inverse and P.divides(self.level()):
+            raise NotImplementedError, "computation of T_P for P dividing the level is not implemented"
+
+        from sqrt5 import hecke_elements, hecke_element_table
+        table = hecke_element_table()
+        if table is not None and P in table:
+            alphas = None
+            A = np.ascontiguousarray(table.coordinates(P), dtype=np.int_)
+            m = A.shape[0]
+        else:
+            alphas = hecke_elements(P)
+            m = len(alphas)
+
+        Ms = <modn_matrix*> sage_malloc(sizeof(modn_matrix) * max(m, 1))
+        cols = <long*> sage_malloc(sizeof(long) * max(m, 1))
+        cnt = <long*> sage_malloc(sizeof(long) * max(n, 1))
+        try:
+            if Ms == NULL or cols == NULL or cnt == NULL:
+                raise MemoryError
+            if alphas is None:
+                m = self._hecke_action_matrices_from_table(A, Ms, inverse)
+            else:
+                m = self._hecke_action_matrices(alphas, Ms, inverse)
+            for j in range(n):
+                cnt[j] = 0
+            # Start with room for a few entries per row; a row has at
+            # most min(m, n) nonzero entries.
+            size = max(n, 1) * min(max(m, 1), 8)
+            indptr = np.zeros(n+1, dtype=np.int32)
+            indices = np.empty(size, dtype=np.int32)
+            data = np.empty(size, dtype=np.int32)
+            ip = <cnp.int32_t*> indptr.data
+            ind = <cnp.int32_t*> indices.data
+            dat = <cnp.int32_t*> data.data
+            for i in range(n):
+                if nnz + min(m, n) > size:
+                    size = max(2*size, nnz + min(m, n))
+                    indices = np.resize(indices, size)
+                    data = np.resize(data, size)
+                    ind = <cnp.int32_t*> indices.data
+                    dat = <cnp.int32_t*> data.data
+                for k in range(m):
+                    self.P1.matrix_action(Mx, Ms[k], self.orbit_reps_p1elt[i])
+                    self.P1.reduce_element(Mx, Mx)
+                    j = self.std_to_rep_table[self.P1.standard_index(Mx)]
+                    cols[k] = j
+                    cnt[j] += 1
+                for k in range(m):
+                    j = cols[k]
+                    if cnt[j]:
+                        ind[nnz] = j
+                        dat[nnz] = cnt[j]
+                        nnz += 1
+                        cnt[j] = 0
+                ip[i+1] = nnz
+            return indptr, indices[:nnz].copy(), data[:nnz].copy()
+        finally:
+            sage_free(Ms)
+            sage_free(cols)
+            sage_free(cnt)
+
+    cdef long _hecke_action_matrices(self, alphas, modn_matrix* Ms, bint inverse) except -1:
+        """
+        Set Ms[0], Ms[1], ... to the matrices modulo the level of the
+        Hecke elements alphas, or of their inverses if inverse is True
+        (skipping those that aren't invertible modulo the level), and
+        return the number of matrices.  Ms must have room for
+        len(alphas) matrices.
+        """
+        cdef modn_matrix M0
+        cdef long m = 0
+        for alpha in alphas:
+            if not inverse:
+                self.f.quatalg_to_modn_matrix(Ms[m], alpha)
+            else:
+                self.f.quatalg_to_modn_matrix(M0, alpha**(-1))
+                if not self.P1.S.matrix_is_invertible(M0):
+                    continue
+                self.P1.S.matrix_inv(Ms[m], M0)
+            m += 1
+        return m
+
+    cdef long _hecke_action_matrices_from_table(self, cnp.ndarray A, modn_matrix* Ms, bint inverse) except -1:
+        """
+        Same as _hecke_action_matrices, but using the coordinates (the
+        rows of the contiguous array A of C longs) of the elements of
+        hecke_alphas(P) from a HeckeElementTable.
+        """
+        cdef long* c = <long*> A.data
+        cdef long k, m = 0
+        cdef modn_matrix M0
+        cdef ResidueRingModN S = self.P1.S
+
+        for k in range(A.shape[0]):
+            # M0 = image of the element alpha with ~alpha in hecke_elements(P)
+            self.f.icosian_coordinates_to_modn_matrix(M0, c + 8*k)
+            if inverse:
+                if not S.matrix_is_invertible(M0):
+                    continue
+                S.matrix_inv(Ms[m], M0)
+            else:
+                # ~alpha = conj(alpha)/pi, and pi is a unit modulo the
+                # level, so on P^1 it acts like the adjugate of M0.
+                S.set_element(Ms[m][0], M0[3])
+                S.neg(Ms[m][1], M0[1])
+                S.neg(Ms[m][2], M0[2])
+                S.set_element(Ms[m][3], M0[0])
+            m += 1
+        return m
+
+    def _counts_to_matrix(self, counts, sparse):
+        """
+        Return the square matrix over QQ with the given nonzero
+        entries, as output by hecke_counts.
+        """
+        indptr, indices, data = counts
+        n = self._cardinality
+        rows = np.repeat(np.arange(n), np.diff(indptr))
+        if sparse:
+            entries = dict(zip(zip(rows.tolist(), indices.tolist()), data.tolist()))
+            return matrix(QQ, n, n, entries, sparse=True)
+        a = np.zeros((n, n), dtype=np.int64)
+        a[rows, indices] = data
+        return matrix(QQ, n, n, a.ravel().tolist(), sparse=False)
 
-        for alpha in hecke_elements(P):
-            self.f.quatalg_to_modn_matrix(M, alpha)
-            for i in range(self._cardinality):
-                self.P1.matrix_action(Mx, M, self.orbit_reps_p1elt[i])
-                self.P1.reduce_element(Mx, Mx)
-                j = self.std_to_rep_table[self.P1.standard_index(Mx)]
-                T[i,j] += 1
-        return T
-        
 
     def _hecke_matrix_badnorm(self, P, sparse=True):
         """
@@ -2564,27 +2845,7 @@ cdef class IcosiansModP1ModN:
             sage: I._hecke_matrix_badnorm(v[1]).fcp()
             (x - 72) * (x - 6)
         """
-        cdef modn_matrix M, M0
-        cdef p1_element Mx
-        from sqrt5 import hecke_elements
-
-        T = zero_matrix(QQ, self._cardinality, sparse=sparse)
-        cdef long i, j
-
-        if P.divides(self.level()):
-            raise NotImplementedError, "computation of T_P for P dividing the level is not implemented"
-
-        for beta in hecke_elements(P):
-            alpha = beta**(-1)
-            self.f.quatalg_to_modn_matrix(M0, alpha)
-            if self.P1.S.matrix_is_invertible(M0):
-                self.P1.S.matrix_inv(M, M0)
-                for i in range(self._cardinality):
-                    self.P1.matrix_action(Mx, M, self.orbit_reps_p1elt[i])
-                    self.P1.reduce_element(Mx, Mx)
-                    j = self.std_to_rep_table[self.P1.standard_index(Mx)]
-                    T[i,j] += 1
-        return T
+        return self._counts_to_matrix(self._hecke_count_csr(P, True), sparse)
 
     def hecke_operator_on_basis_element(self, P, long i):
         """
@@ -2707,6 +2968,15 @@ cdef class IcosiansModP1ModN:
             
         return D
 
+def _hecke_counts_worker(IcosiansModP1ModN I, primes, indices):
+    """
+    Return list of pairs (k, I.hecke_counts(primes[k])) for k in
+    indices, i.e., the nonzero entries of the Hecke matrices as
+    int32 arrays.  This is run by the worker processes of
+    IcosiansModP1ModN.hecke_matrices.
+    """
+    return [(k, I.hecke_counts(primes[k])) for k in indices]
+
 def unpickle_IcosiansModP1ModN_v1(x):
     import sqrt5
     return IcosiansModP1ModN(sqrt5.F.ideal(x))
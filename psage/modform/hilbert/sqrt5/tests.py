@@ -226,6 +226,38 @@ def test_hecke_commutes(Bmin=2, Bmax=50):
         assert T_p*T_q == T_q*T_p, "Hecke operators T_{%s} and T_{%s} at level %s (of norm %s) don't commute"%(p, q, N, N.norm())
     
 
+def test_hecke_matrices(Bmin=2, Bmax=100):
+    from tables import ideals_of_bounded_norm, primes_of_bounded_norm
+    primes = primes_of_bounded_norm(50)
+    for N in ideals_of_bounded_norm(Bmax):
+        if N.norm() < Bmin: continue
+        I = IcosiansModP1ModN(N)
+        v = [P for P in primes if not P.divides(N)]
+        T = I.hecke_matrices(v, ncpus=2)
+        for P, t in zip(v, T):
+            for i in range(len(I)):
+                assert t.row(i) == I.hecke_operator_on_basis_element(P, i), \
+                       "batched T_{%s} at level %s is wrong"%(P, N)
+
+def test_hecke_element_table(Bmin=2, Bmax=100):
+    import sqrt5
+    from sage.all import tmp_dir
+    from tables import ideals_of_bounded_norm, primes_of_bounded_norm
+    primes = primes_of_bounded_norm(50)
+    table = HeckeElementTable(tmp_dir(), 50)
+    old = hecke_element_table()
+    try:
+        for N in ideals_of_bounded_norm(Bmax):
+            if N.norm() < Bmin: continue
+            v = [P for P in primes if not P.divides(N)]
+            sqrt5._hecke_element_table = None
+            T0 = IcosiansModP1ModN(N).hecke_matrices(v)
+            sqrt5._hecke_element_table = table
+            T1 = IcosiansModP1ModN(N).hecke_matrices(v)
+            assert T0 == T1, "Hecke matrices at level %s computed from the table are wrong"%N
+    finally:
+        sqrt5._hecke_element_table = old
+
 
 
 ################################################################
@@ -260,3 +292,19 @@ def test_hecke_invariance_of_new_subspace(Bmin=2, Bmax=300):
         T_q = NS.T(q)
         assert T_p*T_q == T_q*T_p, "Hecke operators T_{%s} and T_{%s} at level %s (of norm %s) don't commute"%(p, q, N, N.norm())
  
+
+
+################################################################
+# Rational eigenvectors
+################################################################
+
+def test_sparse_elliptic_curve_factors(Bmin=2, Bmax=200):
+    from tables import ideals_of_bounded_norm
+    from hmf import HilbertModularForms
+    for N in ideals_of_bounded_norm(Bmax):
+        if N.norm() < Bmin: continue
+        print N.norm()
+        H = HilbertModularForms(N)
+        D0 = H.elliptic_curve_factors()
+        D1 = H.elliptic_curve_factors(algorithm='sparse')
+        assert [A._S for A in D0] == [A._S for A in D1], "sparse elliptic curve factors at level %s (of norm %s) are wrong"%(N, N.norm())
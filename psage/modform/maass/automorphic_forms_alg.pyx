@@ -4093,7 +4093,7 @@ cpdef setup_and_solve_for_harmonic_Maass_waveforms(H,Y_in,int M,int Q,principal_
     C = solve_system_for_harmonic_weak_Maass_waveforms_mp(N,V1,RHS1) 
     return C
     
-cpdef solve_system_for_harmonic_weak_Maass_waveforms_mp(dict N, Matrix_complex_dense V1,Matrix_complex_dense RHS1,gr=0):
+cpdef solve_system_for_harmonic_weak_Maass_waveforms_mp(dict N, Matrix_complex_dense V1,Matrix_complex_dense RHS1,gr=0,int mixed_prec=1):
     r"""
     Solve the linear system to obtain the Fourier coefficients of Maass forms
 
@@ -4110,6 +4110,10 @@ cpdef solve_system_for_harmonic_weak_Maass_waveforms_mp(dict N, Matrix_complex_d
         - ``N['SetCs']``   -- Which coefficients are set and their values
         - ``N['comp_dim']``-- How large is the assumed dimension of the solution space
         - ``N['num_set']`` -- Number of coefficients which are set
+    - ``mixed_prec`` -- integer (default 1). If 1 we first try to solve the system
+                        using a double precision factorization and iterative refinement
+                        (see Matrix_complex_dense.mat_solve_refined) and only use
+                        the full multiprecision QR-decomposition if this fails.
         
 
     OUTPUT:
@@ -4301,11 +4305,20 @@ cpdef solve_system_for_harmonic_weak_Maass_waveforms_mp(dict N, Matrix_complex_d
             mpc_set(LHS._matrix[r-roffs][k-coffs],V1._matrix[r][k],rnd)
     if gr==1:
         return LHS,RHS
-    smin=smallest_inf_norm(LHS)
-    if verbose>0:
-        print "sminfn=",smin
+    cdef Matrix_complex_dense XR=None
+    if mixed_prec==1:
+        try:
+            XR = LHS.mat_solve_refined(RHS,fallback=0)
+        except ArithmeticError as e:
+            if verbose>0:
+                print "Could not use iterative refinement: ",e
+            XR = None
+    done = XR is not None
+    if not done:
+        smin=smallest_inf_norm(LHS)
+        if verbose>0:
+            print "sminfn=",smin
     dps0=CF.prec()
-    done=False
     i=1
     while (not done and i<=maxit):
         try:
@@ -4331,7 +4344,10 @@ cpdef solve_system_for_harmonic_weak_Maass_waveforms_mp(dict N, Matrix_complex_d
             print "len(B)=",len(v)
             #print "RHS=",v
         #b = mpmath_ctx.L_solve(A, RHS.column(fn_j), p)
-        TMP = LHS.solve(v) #mpmath_ctx.U_solve(A, b)
+        if XR is not None:
+            TMP = XR.column(fn_j)
+        else:
+            TMP = LHS.solve(v) #mpmath_ctx.U_solve(A, b)
         roffs=0
         res = (LHS*TMP-v).norm()
         if verbose>0:
@@ -1,2 +1,10 @@
 
 cdef int besselk_dp_c(double *kbes,double R,double x,double prec,int pref) nogil
+cdef int besselk_dp_vec_c(double R,double *x,double *kbes,int n,double prec,int pref,int threads) nogil
+
+cdef class KBesselTable(object):
+    cdef double _R0,_h,_prec,_err
+    cdef int _deg,_nx
+    cdef double *_x
+    cdef double *_coeffs
+    cdef int eval_c(self,double R,double x,double *kbes) nogil
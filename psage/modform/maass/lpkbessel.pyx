@@ -27,6 +27,9 @@ cdef mpfr_rnd_t rnd
 rnd = GMP_RNDN
 
 import cython
+from cython.parallel cimport prange
+cimport numpy as cnp
+import numpy as np
 
 r"""
 Low-precision (fast) algorithms for the K-Bessel function.
@@ -175,6 +178,114 @@ cpdef besselk_dp(double R,double x,double prec=1e-14,int pref=0):
     else:
         raise ValueError,'The K-bessel routine failed (unknown error)   for x,R={0},{1}, value={2}'.format(x,RR,kbes)
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def besselk_dp_array(double R,x,out=None,double prec=1e-14,int pref=0,int threads=1):
+    r"""
+    Modified K-Bessel function in double precision evaluated at a vector of arguments.
+
+    The same algorithm as in besselk_dp is chosen for each element but the
+    computation is done without the GIL and can be split over several threads.
+
+    INPUT:
+
+        - `R` -- parameter (double)
+
+        - `x` -- one-dimensional array of arguments (converted to a contiguous float64 NumPy array)
+
+        - `out` -- (optional) contiguous float64 NumPy array of the same length as x where the result is stored.
+
+        - `prec` -- precision (default 1E-14, double)
+
+        - `pref` -- use prefactor (integer, default 0), see besselk_dp.
+
+        - `threads` -- number of threads (default 1)
+
+    OUTPUT:
+
+     - NumPy array with out[i] = besselk_dp(R,x[i],prec,pref)
+
+    EXAMPLES::
+
+
+        sage: besselk_dp_array(10.0,[3.0,5.0])[1]==besselk_dp(10.0,5.0)
+        True
+        sage: besselk_dp_array(10.0,[3.0,5.0],pref=1,threads=2)[0]==besselk_dp(10.0,3.0,pref=1)
+        True
+    """
+    cdef cnp.ndarray[cnp.float64_t,ndim=1,mode="c"] xv
+    cdef cnp.ndarray[cnp.float64_t,ndim=1,mode="c"] res
+    cdef int n,i,err=0
+    xv = np.ascontiguousarray(x,dtype=np.float64)
+    if xv.ndim<>1:
+        raise ValueError,"Need a one-dimensional array of arguments!"
+    n = xv.shape[0]
+    if out is None:
+        out = np.empty(n,dtype=np.float64)
+    if not isinstance(out,np.ndarray) or out.dtype<>np.float64 or not out.flags['C_CONTIGUOUS'] or out.ndim<>1 or out.shape[0]<>n:
+        raise ValueError,"out must be a contiguous float64 array of length {0}".format(n)
+    res = out
+    if n==0:
+        return out
+    if xv.min()<=0:
+        raise ValueError," Need x>0! Got x=%s" % xv.min()
+    if pref==-1:
+        for i in range(n):
+            res[i]=besselk_real_rec_dp(R,xv[i],prec)
+        return out
+    if threads<1:
+        threads=1
+    with nogil:
+        err = besselk_dp_vec_c(R,<double*>xv.data,<double*>res.data,n,prec,pref,threads)
+    if err<>0:
+        raise ValueError,'The K-bessel routine failed for {0} of the arguments x with R={1}'.format(err,R)
+    return out
+
+@cython.cdivision(True)
+cdef int besselk_dp_vec_c(double R,double *x,double *kbes,int n,double prec,int pref,int threads) nogil:
+    r"""
+    Set kbes[i] = K_iR(x[i]) (with the prefactor as in besselk_dp) for i=0,...,n-1.
+    If threads>1 the arguments are split over threads.
+
+    Returns the number of arguments for which the computation failed.
+    """
+    cdef int i,err=0
+    if threads>1:
+        for i in prange(n,num_threads=threads,schedule='dynamic'):
+            if besselk_dp_elt(R,x[i],&kbes[i],prec,pref)<>0:
+                err+=1
+    else:
+        for i in range(n):
+            if besselk_dp_elt(R,x[i],&kbes[i],prec,pref)<>0:
+                err+=1
+    return err
+
+@cython.cdivision(True)
+cdef int besselk_dp_elt(double R,double x,double *kbes,double prec,int pref) nogil:
+    r"""
+    The nogil version of besselk_dp (without the real parameter case pref=-1).
+    Returns 0 if successful.
+    """
+    cdef double RR,xc,xcral,S
+    cdef int res
+    if x<=0:
+        kbes[0]=0.0
+        return -1
+    RR = fabs(R)
+    xc = pow((x+R)*(x-R),d_half)
+    S=R/x
+    xcral=xc+R*2.0*atan(S/(1.0+(xc/x)))
+    if (R*pihalf-xcral < -125.0):
+        kbes[0]=0.0
+        return 0
+    if x<R*0.7:
+        res=besselk_dp_pow(RR,x,kbes,prec,pref)
+        if res <> 0:
+            res=besselk_dp_rec(RR,x,kbes,prec,pref)
+    else:
+        res=besselk_dp_rec(RR,x,kbes,prec,pref)
+    return res
+
 cdef int besselk_dp_c(double *kbes,double R,double x,double prec,int pref) nogil: #double prec=1e-14,int pref=0):  
     r"""
     Modified K-Bessel function in double precision. Chooses the most appropriate algorithm.
@@ -817,3 +928,147 @@ cpdef besselk_real_rec_dp(double r,double x,double eps=0,int verbose=0):
         if verbose>2:
             printf("r[%d]=%d",k,rk1)
     return s*cppi/two
+
+
+cdef class KBesselTable(object):
+    r"""
+    A table of the K-Bessel function K_iR(x)*exp(pi*R/2) for a fixed grid of arguments x,
+    interpolated in R by Chebyshev polynomials on an interval [R0-h,R0+h].
+
+    When we search for eigenvalues we set up the same system (with the same Y and
+    the same pullback points) for many values of R close to each other.
+    The arguments 2*pi*|n|*Y_pb of the K-Bessel functions then stay the same and
+    instead of recomputing every K-Bessel function we tabulate them once at the
+    Chebyshev nodes in R and interpolate.
+
+    INPUT:
+
+    - ``R0`` -- double (center of the interval)
+    - ``h`` -- double (half-width of the interval)
+    - ``xs`` -- list of doubles (the arguments)
+    - ``degree`` -- integer (default 12) number of Chebyshev nodes.
+    - ``prec`` -- double (default 1E-14) precision of the K-Bessel function at the nodes.
+
+    EXAMPLES::
+
+        sage: T = KBesselTable(10.0,0.05,[3.0,5.0])
+        sage: T.covers(10.01)
+        True
+        sage: abs(T(10.01,3.0)-besselk_dp(10.01,3.0,pref=1))<1E-12
+        True
+        sage: T.covers(10.1)
+        False
+
+    """
+    def __cinit__(self,double R0,double h,xs,int degree=12,double prec=1E-14):
+        self._x=NULL
+        self._coeffs=NULL
+        self._nx=0
+
+    def __init__(self,double R0,double h,xs,int degree=12,double prec=1E-14):
+        cdef int i,k,m,res
+        cdef double Rk,tmp,s
+        cdef double *fvals=NULL
+        if h<=0 or R0-h<=0:
+            raise ValueError,"Need 0 < h < R0! Got R0={0}, h={1}".format(R0,h)
+        if degree<2:
+            raise ValueError,"Need degree >=2! Got {0}".format(degree)
+        xl = sorted(set([float(x) for x in xs]))
+        if len(xl)>0 and xl[0]<=0:
+            raise ValueError," Need x>0! Got x={0}".format(xl[0])
+        self._R0=R0; self._h=h; self._deg=degree; self._prec=prec
+        self._nx=len(xl)
+        self._x=<double*>sage_malloc(sizeof(double)*max(self._nx,1))
+        if self._x==NULL: raise MemoryError
+        self._coeffs=<double*>sage_malloc(sizeof(double)*max(self._nx,1)*degree)
+        if self._coeffs==NULL: raise MemoryError
+        fvals=<double*>sage_malloc(sizeof(double)*degree)
+        if fvals==NULL: raise MemoryError
+        self._err=0.0
+        for i in range(self._nx):
+            self._x[i]=xl[i]
+        sig_on()
+        for i in range(self._nx):
+            for k in range(degree):
+                Rk = R0+h*cos(cppi*(<double>k+d_half)/<double>degree)
+                res = besselk_dp_c(&fvals[k],Rk,self._x[i],prec,1)
+                if res<>0:
+                    sig_off()
+                    sage_free(fvals)
+                    raise ValueError,'The K-bessel routine failed for x,R={0},{1}'.format(self._x[i],Rk)
+            for m in range(degree):
+                s=0.0
+                for k in range(degree):
+                    s+=fvals[k]*cos(cppi*<double>m*(<double>k+d_half)/<double>degree)
+                s=s*d_two/<double>degree
+                if m==0:
+                    s=s*d_half
+                self._coeffs[i*degree+m]=s
+            tmp = fabs(self._coeffs[i*degree+degree-1])+fabs(self._coeffs[i*degree+degree-2])
+            if tmp>self._err:
+                self._err=tmp
+        sig_off()
+        sage_free(fvals)
+
+    def __dealloc__(self):
+        if self._x<>NULL:
+            sage_free(self._x)
+        if self._coeffs<>NULL:
+            sage_free(self._coeffs)
+
+    def __repr__(self):
+        return "Table of {0} K-Bessel functions for R in [{1},{2}]".format(self._nx,self._R0-self._h,self._R0+self._h)
+
+    def __len__(self):
+        return self._nx
+
+    def covers(self,double R):
+        r"""
+        Return True if R is in the interval of interpolation.
+        """
+        return fabs(R-self._R0)<=self._h
+
+    def error_estimate(self):
+        r"""
+        Estimate of the interpolation error given by the size of the last Chebyshev coefficients.
+        """
+        return self._err
+
+    def __call__(self,double R,double x):
+        r"""
+        Return K_iR(x)*exp(pi*R/2) interpolated from the table.
+        """
+        cdef double kbes
+        if self.eval_c(R,x,&kbes)<>0:
+            raise ValueError,"The table does not contain (R,x)=({0},{1})".format(R,x)
+        return kbes
+
+    @cython.cdivision(True)
+    cdef int eval_c(self,double R,double x,double *kbes) nogil:
+        r"""
+        Set kbes[0] = K_iR(x)*exp(pi*R/2) using the table.
+        Returns 0 if successful and -1 if R or x is not contained in the table.
+        """
+        cdef int lo,hi,mid,m
+        cdef double t,b0,b1,b2
+        cdef double *c
+        if fabs(R-self._R0)>self._h or self._nx==0:
+            return -1
+        lo=0; hi=self._nx-1
+        while lo<hi:
+            mid=(lo+hi)/2
+            if self._x[mid]<x:
+                lo=mid+1
+            else:
+                hi=mid
+        if self._x[lo]<>x:
+            return -1
+        c = self._coeffs+lo*self._deg
+        t = (R-self._R0)/self._h
+        b1=0.0; b2=0.0
+        for m from self._deg-1 >= m >= 1:
+            b0 = d_two*t*b1-b2+c[m]
+            b2 = b1
+            b1 = b0
+        kbes[0] = c[0]+t*b1-b2
+        return 0
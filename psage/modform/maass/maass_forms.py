@@ -122,6 +122,7 @@ class MaassWaveForms (AutomorphicFormSpace):
         self._smallest_M0=0
         self._is_maass_waveform_space=True
         self._exceptional = kwds.get('exceptional',False)
+        self._kbessel_tables = {}
         
     def _check_consistent_symmetrization(self):
         r"""
@@ -381,6 +382,22 @@ class MaassWaveForms (AutomorphicFormSpace):
         return self._group.generalised_level()
 
     def get_element(self,R,Mset=None,Yset=None,dim=1,ndigs=12,set_c=[],**kwds):
+        r"""
+        Compute a Maass waveform in self with spectral parameter R.
+
+        INPUT:
+
+        - ``R`` -- real (spectral parameter)
+        - ``Mset``, ``Yset`` -- integer and real (truncation point and height of the horocycle)
+        - ``dim`` -- integer (dimension of the space of functions to compute)
+        - ``ndigs`` -- integer (desired number of digits)
+        - ``set_c`` -- list (set coefficients)
+        - ``threads`` -- integer (default 0) if >0 set up the matrix using this many OpenMP threads.
+        - ``do_par``, ``ncpus`` -- use the (older) column-chunked parallel set up.
+        - ``kbes_cache`` -- bool (default False) if True interpolate the K-Bessel functions from tables
+                            which are kept in self and reused for nearby R (useful when searching for eigenvalues).
+
+        """
         #if sym_type==None:
         #    sym_type=self._sym_type
         eps = 10**(1-ndigs)
@@ -393,6 +410,10 @@ class MaassWaveForms (AutomorphicFormSpace):
         norm = kwds.get('norm')
         do_par = kwds.get('do_par',0)
         ncpus= kwds.get('ncpus',1)
+        threads = kwds.get('threads',0)
+        kbes_cache = None
+        if kwds.get('kbes_cache',False):
+            kbes_cache = self._kbessel_tables
         #exceptional = kwds.get('exceptional',0)
         try: 
             if RR(R).is_infinity() or RR(R).is_NaN() or R<0.0:
@@ -429,7 +450,7 @@ class MaassWaveForms (AutomorphicFormSpace):
             #    if self._verbose>0:
             #        print "Using routine without symmetry!"
             #        print "R,Y0,M=",R,Y0,M
-            C = get_coeff_fast_cplx_dp(self,R,Y,M,0,NN,gr=gr,do_par=do_par,ncpus=ncpus)
+            C = get_coeff_fast_cplx_dp(self,R,Y,M,0,NN,gr=gr,do_par=do_par,ncpus=ncpus,threads=threads,kbes_cache=kbes_cache)
             if gr<>0:
                 return C
             if self._verbose>0:
@@ -121,19 +121,18 @@ from psage.matrix.matrix_complex_dense cimport Matrix_complex_dense
 from sage.functions.all import ceil as pceil
 from sage.matrix.all import MatrixSpace
 from sage.modular.arithgroup.congroup_sl2z import SL2Z
-from lpkbessel import besselk_dp
-#from lpkbessel cimport besselk_dp_c
+from lpkbessel import besselk_dp,besselk_dp_array
 #from sage.modular.maass.all import MySubgroup,besselk_dp
 from mysubgroup import MySubgroup
 from pullback_algorithms cimport pullback_pts_mpc_new_c,pullback_pts_cplx_dp,pullback_pts_real_dp
-from lpkbessel cimport besselk_dp_c
+from lpkbessel cimport besselk_dp_c,KBesselTable
 
 from mysubgroups_alg import normalize_point_to_cusp_mpfr,pullback_to_Gamma0N_mpfr,apply_sl2z_map_mpfr,normalize_point_to_cusp_dp,apply_sl2z_map_dp
 #from mysubgroups_alg cimport _apply_sl2z_map_mpfr
 
 from pullback_algorithms import pullback_pts_dp,pullback_pts_mpc,pullback_pts_mpc_new
 
-from maass_forms_parallel_alg cimport compute_V_cplx_dp_sym_par,SMAT_cplx_par_dp
+from maass_forms_parallel_alg cimport compute_V_cplx_dp_sym_par,compute_V_cplx_dp_rows_par,SMAT_cplx_par_dp
 
 cpdef eval_maass_lp(F,double x,double y,int version = 1,int fi=0,int use_pb=1,int verbose=0):
     r"""
@@ -185,15 +184,17 @@ cpdef eval_maass_lp(F,double x,double y,int version = 1,int fi=0,int use_pb=1,in
             fun=sin
         arx=twopi*x3
         ary=twopi*y3
+        kbvec = besselk_dp_array(R,float(ary)*np.arange(1,F._M0),pref=1)
         for n in range(1,F._M0):
-            term=besselk_dp(R,ary*n,pref=1)*fun(arx*n)
+            term=kbvec[n-1]*fun(arx*n)
             res=res+F._coeffs[fi][cj][n]*term
         res = res*sqrt(y3)
     else:
         arx=twopi*x3
         ary=twopi*y3
+        kbvec = besselk_dp_array(R,float(ary)*np.arange(1,F._M0),pref=1)
         for n in range(1,F._M0):
-            term=besselk_dp(R,ary*n,pref=1)
+            term=kbvec[n-1]
             if verbose>0:
                 print "term0 =",term
                 print "term2 =",(cexpi(arx*n)*F._coeffs[fi][cj][n]+cexpi(-arx*n)*F._coeffs[fi][cj][-n])
@@ -213,14 +214,12 @@ cpdef eval_maass_lp_vec(C,double R,int M0,int sym_type,double y,double x0,double
     cdef double h
     twopi=2.0*M_PI
     h = float(x1-x0)/float(nx-1)
-    cdef double* kbvec, *coeffs
-    kbvec = <double*>sage_malloc(nx*sizeof(double))
-    kbvec[0] = 0
-    coeffs = <double*>sage_malloc(nx*sizeof(double))
+    cdef cnp.ndarray[DTYPE_t,ndim=1] kbvec
     ary=twopi*yy
-    arx=twopi*xx
-    for n in range(1,M0):
-        kbvec[n]=sqrt(y)*besselk_dp(R,ary*n)
+    kbvec = np.zeros(max(M0,1),dtype=np.float64)
+    if M0>1:
+        besselk_dp_array(R,ary*np.arange(1,M0),out=kbvec[1:])
+        kbvec = sqrt(y)*kbvec
     cdef double tmp = 0
     cdef list res
     res = []
@@ -535,7 +534,7 @@ cdef int compute_V_cplx_wt_dp(double complex **V,double R,double Y,double weight
 
 
 @cython.boundscheck(False)
-cdef int compute_V_cplx_dp(double complex **V,double R,double Y,int** Mv,int** Qv,int nc, int cuspidal,int sym_type, int verbose,double *alphas, double *Xm,double ***Xpb,double ***Ypb, double complex ***Cvec,int is_exceptional=0):
+cdef int compute_V_cplx_dp(double complex **V,double R,double Y,int** Mv,int** Qv,int nc, int cuspidal,int sym_type, int verbose,double *alphas, double *Xm,double ***Xpb,double ***Ypb, double complex ***Cvec,int is_exceptional=0,KBesselTable kbtable=None):
     r"""
     Set up the matrix for the system of equations giving the Fourier coefficients of the Maass waveforms.
     INPUT:
@@ -553,6 +552,7 @@ cdef int compute_V_cplx_dp(double complex **V,double R,double Y,int** Mv,int** Q
     - `` cuspidal`` -- int (set to 1 if we compute cuspidal functions, otherwise zero)
     - `` sym_type`` -- int (set to 0/1 if we compute even/odd functions, otherwise -1)
     - ``verbose`` -- int (verbosity of output)
+    - ``kbtable`` -- KBesselTable (optional) table of K-Bessel functions to use if it covers R.
 
     """
     cdef int l,j,icusp,jcusp,n,ni,lj,Ml,Ql,s,Qs,Qf,Mf,Ms
@@ -667,7 +667,8 @@ cdef int compute_V_cplx_dp(double complex **V,double R,double Y,int** Mv,int** Q
                         besarg=abs(lr)*Ypb[icusp][jcusp][j]
                         if lr<>0.0: 
                             if is_exceptional == 0:
-                                besselk_dp_c(&tmpr,R,besarg,besprec,1)
+                                if kbtable is None or kbtable.eval_c(R,besarg,&tmpr)<>0:
+                                    besselk_dp_c(&tmpr,R,besarg,besprec,1)
                             else:
                                 tmpr = scipy.special.kv(R,besarg)
                             #print "Ypb=",Ypb[icusp][jcusp][j],type(Ypb[icusp][jcusp][j])
@@ -751,7 +752,9 @@ cdef int compute_V_cplx_dp(double complex **V,double R,double Y,int** Mv,int** Q
                 kbes=<double>1.0
             else:
                 if is_exceptional == 0:
-                    kbes=sqrtY*besselk_dp(R,nrY2pi,pref=1)
+                    if kbtable is None or kbtable.eval_c(R,nrY2pi,&kbes)<>0:
+                        kbes=besselk_dp(R,nrY2pi,pref=1)
+                    kbes=sqrtY*kbes
                 else:
                     kbes = sqrtY*scipy.special.kv(R,nrY2pi)
             #if nrY2pi==0.0:
@@ -1146,7 +1149,8 @@ cdef int compute_V_cplx_dp_sym(double complex **V,
                            double R,double Y,
                            int nc, int ncols,
                            int cuspidal,
-                           int verbose):
+                           int verbose,
+                           KBesselTable kbtable=None):
 
 
     r"""
@@ -1166,6 +1170,7 @@ cdef int compute_V_cplx_dp_sym(double complex **V,
     - `` cuspidal`` -- int (set to 1 if we compute cuspidal functions, otherwise zero)
     - `` sym_type`` -- int (set to 0/1 if we compute even/odd functions, otherwise -1)
     - ``verbose`` -- int (verbosity of output)
+    - ``kbtable`` -- KBesselTable (optional) table of K-Bessel functions to use if it covers R.
 
     """
     cdef int l,j,icusp,jcusp,n,ni,lj,Ml,Ql,s,Qs,Qf,Mf,Ms
@@ -1179,6 +1184,8 @@ cdef int compute_V_cplx_dp_sym(double complex **V,
         set_pref = -1
     else:
         set_pref = 1
+    if set_pref<>1 or (kbtable is not None and not kbtable.covers(R)):
+        kbtable = None
     pi=M_PI 
     sqrtY=sqrt(Y)
     two=<double>(2)
@@ -1312,7 +1319,8 @@ cdef int compute_V_cplx_dp_sym(double complex **V,
                     Mf = Mv[icusp][1]
                     besarg=fabs(lr)*Ypb[icusp][jcusp][j]
                     if lr<>0.0:
-                        besselk_dp_c(&tmpr,R,besarg,besprec,pref=set_pref)
+                        if kbtable is None or kbtable.eval_c(R,besarg,&tmpr)<>0:
+                            besselk_dp_c(&tmpr,R,besarg,besprec,pref=set_pref)
                         kbesvec[icusp][l][j]=sqrt(Ypb[icusp][jcusp][j])*tmpr
                     else:
                         kbesvec[icusp][l][j]=<double>1.0
@@ -1401,7 +1409,8 @@ cdef int compute_V_cplx_dp_sym(double complex **V,
             else:
                 #mpIR=mpmath.fp.mpc(0,R)
                 #                kbes=float(mpmath.fp.besselk(mpIR,nrY2pi).real*exp(mpmath.fp.pi*R*0.5))
-                besselk_dp_c(&kbes,R,nrY2pi,besprec,pref=set_pref)
+                if kbtable is None or kbtable.eval_c(R,nrY2pi,&kbes)<>0:
+                    besselk_dp_c(&kbes,R,nrY2pi,besprec,pref=set_pref)
                 kbes=sqrtY*kbes # besselk_dp(R,nrY2pi,pref=1)
             if ni>N1:
                 raise ArithmeticError,"Index outside!"
@@ -1818,25 +1827,106 @@ cdef normalize_matrix_cplx_sym_dp(double complex **V,double complex **V1,int Ml,
         sage_free(tmp)
 
 
-cpdef get_coeff_fast_cplx_dp(S,double R,double Y,int M,int Q,dict Norm={},int gr=0,int norm_c=1,dict cusp_ev={},double eps=1e-12,int do_par=0,int ncpus=1):
+cdef list kbessel_arguments_dp(int **Mv,int **Qv,double *alphas,double ***Ypb,double Y,int nc):
+    r"""
+    Return the arguments 2*pi*|n+alpha|*Y and 2*pi*|n+alpha|*Y_pb of all K-Bessel
+    functions needed in compute_V_cplx_dp and compute_V_cplx_dp_sym.
+
+    The values are computed in exactly the same way as in these routines
+    since they are used as keys in a KBesselTable.
+    """
+    cdef int icusp,jcusp,l,j
+    cdef double pi,two,twopi,Y2pi,nr,lr
+    cdef list res=[]
+    pi=M_PI
+    two=<double>(2)
+    Y2pi=Y*pi*two
+    twopi=two*pi
+    for jcusp in range(nc):
+        for l in range(Mv[jcusp][2]):
+            nr=<double>(l+Mv[jcusp][0])+alphas[jcusp]
+            if nr==0.0:
+                continue
+            res.append(fabs(nr)*Y2pi)
+            lr=nr*twopi
+            for icusp in range(nc):
+                for j in range(Qv[jcusp][2]):
+                    if Ypb[icusp][jcusp][j]<>0:
+                        res.append(fabs(lr)*Ypb[icusp][jcusp][j])
+    return res
+
+cdef KBesselTable get_kbessel_table_dp(dict kbes_cache,double R,double Y,int M,int Q,int **Mv,int **Qv,double *alphas,double ***Ypb,int nc,int verbose=0,double eps=1E-12):
+    r"""
+    Return a table of K-Bessel functions covering R for the system given by (Y,M,Q).
+    The table is taken from kbes_cache if possible, otherwise a new table
+    centered at R is computed and stored in kbes_cache.
+
+    A new table is only accepted if its error estimate is at most eps.
+    Otherwise the interval is halved (at most three times) and if this does
+    not help None is returned, i.e. the K-Bessel functions are computed directly.
+    The failure is recorded in kbes_cache as the interval (R-h,R+h) with the
+    initial h, so that no new tables are attempted for R in this interval.
+
+    Note: the table uses 12 nodes in R so it is only worth it when
+    we set up many systems for R in a small interval, e.g. in an eigenvalue search.
+    """
+    cdef KBesselTable T
+    cdef double h,h0
+    cdef int i
+    if R<=0:
+        return None
+    key = (Y,M,Q)
+    v = kbes_cache.get(key)
+    if isinstance(v,KBesselTable):
+        T = v
+        if T.covers(R):
+            return T
+    elif v is not None and v[0]<R and R<v[1]:
+        return None
+    h = min(0.05,0.5*R)
+    h0 = h
+    if len(kbes_cache)>8:
+        kbes_cache.clear()
+    xs = kbessel_arguments_dp(Mv,Qv,alphas,Ypb,Y,nc)
+    for i in range(4):
+        T = KBesselTable(R,h,xs)
+        if verbose>0:
+            print "Computed new K-Bessel table:",T
+            print "Error estimate:",T.error_estimate()
+        if T.error_estimate()<=eps:
+            kbes_cache[key]=T
+            return T
+        h = 0.5*h
+    kbes_cache[key]=(R-h0,R+h0)
+    return None
+
+cpdef get_coeff_fast_cplx_dp(S,double R,double Y,int M,int Q,dict Norm={},int gr=0,int norm_c=1,dict cusp_ev={},double eps=1e-12,int do_par=0,int ncpus=1,int threads=0,dict kbes_cache=None):
         r"""
         Pick the correct method...
+
+        If threads>0 the matrix V is set up in parallel (OpenMP) with the rows
+        distributed over the given number of threads.
+        If kbes_cache is a dict the K-Bessel functions are interpolated from
+        tables (KBesselTable) stored in kbes_cache and reused for nearby R.
         """
         if cusp_ev == {}:
             cusp_ev = Norm.get('cusp_ev',{})
         if cusp_ev=={} or not S.group().is_Gamma0() or S.weight()<>0: 
-            res = get_coeff_fast_cplx_dp_nosym(S,R,Y,M,Q,Norm,gr,norm_c,do_par=do_par,ncpus=ncpus)
+            res = get_coeff_fast_cplx_dp_nosym(S,R,Y,M,Q,Norm,gr,norm_c,do_par=do_par,ncpus=ncpus,threads=threads,kbes_cache=kbes_cache)
         else:
-            res = get_coeff_fast_cplx_dp_sym(S,R,Y,M,Q,Norm,gr,norm_c,cusp_ev=cusp_ev,eps=1e-12,do_par=do_par,ncpus=ncpus)
+            res = get_coeff_fast_cplx_dp_sym(S,R,Y,M,Q,Norm,gr,norm_c,cusp_ev=cusp_ev,eps=1e-12,do_par=do_par,ncpus=ncpus,threads=threads,kbes_cache=kbes_cache)
         return res
             
 
-cpdef get_coeff_fast_cplx_dp_sym(S,double R,double Y,int M,int Q,dict Norm={},int gr=0,int norm_c=1,dict cusp_ev={},double eps=1e-12,int do_par=0,int ncpus=1):
+cpdef get_coeff_fast_cplx_dp_sym(S,double R,double Y,int M,int Q,dict Norm={},int gr=0,int norm_c=1,dict cusp_ev={},double eps=1e-12,int do_par=0,int ncpus=1,int threads=0,dict kbes_cache=None):
     r"""
 
     An efficient method to get coefficients in the double complex case.
     Trying to use as much symmetries as possible.
 
+    If threads>0 the matrix is set up by compute_V_cplx_dp_rows_par using this many threads.
+    If kbes_cache is a dict then K-Bessel tables from (and for) this dict are used, see get_kbessel_table_dp.
+
     """
     import mpmath
     cdef double complex **V=NULL
@@ -1867,6 +1957,7 @@ cpdef get_coeff_fast_cplx_dp_sym(S,double R,double Y,int M,int Q,dict Norm={},in
     cdef int cuspidal=1
     cdef int q
     cdef double complex *sqch=NULL
+    cdef KBesselTable kbtable=None
     tmpr = <double>S._group.minimal_height()
     if Y<= 0 or Y >= tmpr:
         Y = 0.5 * tmpr
@@ -2015,16 +2106,23 @@ cpdef get_coeff_fast_cplx_dp_sym(S,double R,double Y,int M,int Q,dict Norm={},in
         if verbose>0:
             print "alphas[",j,"]=",alphas[j],type(alphas[j])
 #    sig_on()
-    if do_par==1 and ncpus>=1:
+    if threads>0:
+        compute_V_cplx_dp_rows_par(V1,N1,Xm,Xpb,Ypb,Cvec,
+                                   cusp_evs,alphas,Mv,Qv,Qfak,
+                                   symmetric_cusps,
+                                   R,Y,nc,cuspidal,verbose,threads)
+    elif do_par==1 and ncpus>=1:
         compute_V_cplx_dp_sym_par(V1,N1,Xm,Xpb,Ypb,Cvec,
                               cusp_evs,alphas,Mv,Qv,Qfak,
                               symmetric_cusps,
                               R,Y,nc,ncols,cuspidal,verbose,ncpus)
     else:
+        if kbes_cache is not None:
+            kbtable = get_kbessel_table_dp(kbes_cache,R,Y,M,Q,Mv,Qv,alphas,Ypb,nc,verbose)
         compute_V_cplx_dp_sym(V1,N1,Xm,Xpb,Ypb,Cvec,
                               cusp_evs,alphas,Mv,Qv,Qfak,
                               symmetric_cusps,
-                              R,Y,nc,ncols,cuspidal,verbose)
+                              R,Y,nc,ncols,cuspidal,verbose,kbtable)
 #    sig_off()
     cdef Matrix_complex_dense VV
     #Vtmp = load("A.sobj")
@@ -2171,9 +2269,13 @@ cpdef get_coeff_fast_cplx_dp_sym(S,double R,double Y,int M,int Q,dict Norm={},in
     #    return res[0]
     return res
 
-cpdef get_coeff_fast_cplx_dp_nosym(S,double R,double Y,int M,int Q,dict Norm={},int gr=0,int norm_c=1,int do_par=0,int ncpus=1):
+cpdef get_coeff_fast_cplx_dp_nosym(S,double R,double Y,int M,int Q,dict Norm={},int gr=0,int norm_c=1,int do_par=0,int ncpus=1,int threads=0,dict kbes_cache=None):
     r"""
     An efficient method to get coefficients in the double complex case.
+
+    If threads>0 (and the weight is zero) the matrix is set up by
+    compute_V_cplx_dp_rows_par using this many threads.
+    If kbes_cache is a dict then K-Bessel tables from (and for) this dict are used, see get_kbessel_table_dp.
     """
     import mpmath
     cdef double complex **V=NULL
@@ -2191,6 +2293,7 @@ cpdef get_coeff_fast_cplx_dp_nosym(S,double R,double Y,int M,int Q,dict Norm={},
     cdef double *Qfak
     cdef int verbose=S._verbose
     cdef int  is_exceptional = S._exceptional
+    cdef KBesselTable kbtable=None
     weight = <double>RealField(53)(S.weight())
     if Q<M:
         Q=M+20
@@ -2294,10 +2397,20 @@ cpdef get_coeff_fast_cplx_dp_nosym(S,double R,double Y,int M,int Q,dict Norm={},
     cusp_evs=<double complex*>sage_malloc(sizeof(double complex)*nc)
     for i in range(nc):
         cusp_evs[i]=0
-        symmetric_cusps[i]=-1
-    if do_par==0:
+        if threads>0 and (sym_type==0 or sym_type==1):
+            symmetric_cusps[i]=sym_type
+        else:
+            symmetric_cusps[i]=-1
+    if threads>0 and weight==0.0 and is_exceptional==0:
+        compute_V_cplx_dp_rows_par(V,N,Xm,Xpb,Ypb,Cvec,
+                                   cusp_evs,alphas,Mv,Qv,Qfak,
+                                   symmetric_cusps,
+                                   R,Y,nc,cuspidal,verbose,threads)
+    elif do_par==0:
         if weight==0.0:
-            compute_V_cplx_dp(V,R,Y,Mv,Qv,nc,cuspidal,sym_type,verbose,alphas,Xm,Xpb,Ypb,Cvec,is_exceptional=is_exceptional)
+            if kbes_cache is not None and is_exceptional==0:
+                kbtable = get_kbessel_table_dp(kbes_cache,R,Y,M,Q,Mv,Qv,alphas,Ypb,nc,verbose)
+            compute_V_cplx_dp(V,R,Y,Mv,Qv,nc,cuspidal,sym_type,verbose,alphas,Xm,Xpb,Ypb,Cvec,is_exceptional=is_exceptional,kbtable=kbtable)
         else:
             compute_V_cplx_wt_dp(V,R,Y,weight,Mv,Qv,nc,cuspidal,sym_type,verbose,alphas,Xm,Xpb,Ypb,Cvec)
     else:
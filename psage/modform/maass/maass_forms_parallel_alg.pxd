@@ -35,4 +35,19 @@ cdef int compute_V_cplx_dp_sym_par(double complex **V,
                            int verbose,
                            int ncpus=?,
                            int is_trivial=?)
+cdef int compute_V_cplx_dp_rows_par(double complex **V,
+                                    int N1,
+                                    double *Xm,
+                                    double ***Xpb,
+                                    double ***Ypb,
+                                    double complex ***Cvec,
+                                    double complex *cusp_evs,
+                                    double *alphas,
+                                    int **Mv,int **Qv,double *Qfak,
+                                    int *symmetric_cusps,
+                                    double R,double Y,
+                                    int nc,
+                                    int cuspidal,
+                                    int verbose,
+                                    int ncpus=?)
 cdef int SMAT_cplx_par_dp(double complex** U,int N,int num_rhs,int num_set,double complex **C,double complex** values,int* setc,int ncpus)
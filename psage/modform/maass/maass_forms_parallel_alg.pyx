@@ -816,6 +816,269 @@ cdef int setV_nosym(double complex **V,
     return 0
 
 
+@cython.boundscheck(False)
+@cython.cdivision(True)
+cdef int compute_V_cplx_dp_rows_par(double complex **V,
+                                    int N1,
+                                    double *Xm,
+                                    double ***Xpb,
+                                    double ***Ypb,
+                                    double complex ***Cvec,
+                                    double complex *cusp_evs,
+                                    double *alphas,
+                                    int **Mv,int **Qv,double *Qfak,
+                                    int *symmetric_cusps,
+                                    double R,double Y,
+                                    int nc,
+                                    int cuspidal,
+                                    int verbose,
+                                    int ncpus=1):
+    r"""
+    Set up the matrix for the system of equations giving the Fourier coefficients of the Maass waveforms.
+    The rows of V, i.e. the pairs (cusp,coefficient), are distributed over ncpus threads
+    and each row is written by exactly one thread.
+
+    INPUT: as for compute_V_cplx_dp_sym_par. To set up the matrix without
+    any symmetries take all cusp_evs[i]=0 and symmetric_cusps[i] = sym_type.
+    """
+    cdef int l,i,j,icusp,jcusp,n,ni,k,Ml,Ql,set_pref
+    cdef double sqrtY,Y2pi,argm
+    if not cuspidal in [0,1]:
+        raise ValueError," parameter cuspidal must be 0 or 1"
+    if ncpus<1:
+        ncpus=1
+    cdef int* cusp_offsets=NULL
+    cdef int* row_cusp=NULL
+    cdef int* row_n=NULL
+    cdef double **nvec=NULL
+    cdef double complex ***ef2_c=NULL
+    cdef double complex ****ckbes=NULL
+    if R < 0:
+        ## Use the real parameter K-Bessel function (lambda in [0,1/4])
+        R = -R
+        set_pref = -1
+    else:
+        set_pref = 1
+    sqrtY=sqrt(Y)
+    Y2pi=Y*M_PI*<double>(2)
+    Ml=0; Ql=0
+    for i in range(nc):
+        if Mv[i][2]>Ml:
+            Ml=Mv[i][2]
+        if Qv[i][2]>Ql:
+            Ql=Qv[i][2]
+    if verbose>0:
+        printf("in compute_V_cplx_dp_rows_par with %d threads \n",ncpus)
+        printf("N1=%d Ml=%d Ql=%d \n",N1,Ml,Ql)
+    ## Allocate arrays
+    cusp_offsets=<int*>sage_malloc(sizeof(int)*nc)
+    if cusp_offsets==NULL: raise MemoryError
+    row_cusp=<int*>sage_malloc(sizeof(int)*N1)
+    if row_cusp==NULL: raise MemoryError
+    row_n=<int*>sage_malloc(sizeof(int)*N1)
+    if row_n==NULL: raise MemoryError
+    nvec = <double**>sage_malloc(sizeof(double*)*nc)
+    if not nvec: raise MemoryError
+    for icusp in range(nc):
+        nvec[icusp] = <double*>sage_malloc(sizeof(double)*Ml)
+        if nvec[icusp]==NULL: raise MemoryError
+    ef2_c = <double complex***>sage_malloc(sizeof(double complex**)*nc)
+    if not ef2_c: raise MemoryError
+    for icusp in range(nc):
+        ef2_c[icusp] = <double complex**>sage_malloc(sizeof(double complex*)*Mv[icusp][2])
+        if ef2_c[icusp]==NULL: raise MemoryError
+        for n in range(Mv[icusp][2]):
+            ef2_c[icusp][n] = <double complex*>sage_malloc(sizeof(double complex)*Qv[icusp][2])
+            if ef2_c[icusp][n]==NULL: raise MemoryError
+    ## ckbes[icusp][jcusp][l][j] = sqrt(Ypb)*K(2pi|l|Ypb)*e(l*Xpb)*Cvec
+    ckbes = <double complex****>sage_malloc(sizeof(double complex***)*nc)
+    if ckbes==NULL: raise MemoryError
+    for icusp in range(nc):
+        ckbes[icusp] = <double complex***>sage_malloc(sizeof(double complex**)*nc)
+        if ckbes[icusp]==NULL: raise MemoryError
+        for jcusp in range(nc):
+            ckbes[icusp][jcusp] = <double complex**>sage_malloc(sizeof(double complex*)*Mv[jcusp][2])
+            if ckbes[icusp][jcusp]==NULL: raise MemoryError
+            for l in range(Mv[jcusp][2]):
+                ckbes[icusp][jcusp][l] = <double complex*>sage_malloc(sizeof(double complex)*Qv[jcusp][2])
+                if ckbes[icusp][jcusp][l]==NULL: raise MemoryError
+    ## Assigning values to arrays
+    for jcusp in range(nc):
+        cusp_offsets[jcusp]=0
+        for icusp in range(jcusp):
+            if icusp==0 or cusp_evs[icusp]==0:
+                cusp_offsets[jcusp]+=Mv[icusp][2]
+    ni=0
+    for icusp in range(nc):
+        if icusp>0 and cusp_evs[icusp]<>0:
+            continue
+        for n in range(Mv[icusp][2]):
+            if ni>=N1:
+                raise ArithmeticError,"Index outside!"
+            row_cusp[ni]=icusp; row_n[ni]=n
+            ni+=1
+    for jcusp in range(nc):
+        for n in range(Ml):
+            nvec[jcusp][n]=<double>(n+Mv[jcusp][0])+alphas[jcusp]
+    for jcusp in range(nc):
+        for n in range(Mv[jcusp][2]):
+            for j in range(Qv[jcusp][2]):
+                argm=nvec[jcusp][n]*Xm[j]
+                if symmetric_cusps[jcusp]==0:
+                    ef2_c[jcusp][n][j]=cos(argm)
+                elif symmetric_cusps[jcusp]==1:
+                    ef2_c[jcusp][n][j]=_Complex_I*sin(-argm)
+                else:
+                    ef2_c[jcusp][n][j]=cexp(-argm*_Complex_I)
+    ## The K-Bessel functions at the pullback points are the most expensive part
+    ## so they are also computed in parallel, one (icusp,jcusp,l) per iteration.
+    for k in prange(nc*nc*Ml, nogil=True, num_threads=ncpus, schedule='dynamic'):
+        setV_kbes_row(ckbes,nvec,Xpb,Ypb,Cvec,cusp_evs,Mv,Qv,symmetric_cusps,
+                      R,set_pref,k/(nc*Ml),(k/Ml)%nc,k%Ml)
+    for ni in prange(N1, nogil=True, num_threads=ncpus, schedule='static'):
+        setV_row(V,ckbes,ef2_c,nvec,Mv,Qv,cusp_offsets,cusp_evs,Ypb,Qfak,
+                 R,Y2pi,sqrtY,set_pref,nc,cuspidal,ni,row_cusp[ni],row_n[ni])
+    ###
+    ### Deallocate arrays
+    ###
+    if ckbes<>NULL:
+        for icusp in range(nc):
+            if ckbes[icusp]<>NULL:
+                for jcusp in range(nc):
+                    if ckbes[icusp][jcusp]<>NULL:
+                        for l in range(Mv[jcusp][2]):
+                            if ckbes[icusp][jcusp][l]<>NULL:
+                                sage_free(ckbes[icusp][jcusp][l])
+                        sage_free(ckbes[icusp][jcusp])
+                sage_free(ckbes[icusp])
+        sage_free(ckbes)
+    if ef2_c<>NULL:
+        for icusp in range(nc):
+            if ef2_c[icusp]<>NULL:
+                for n in range(Mv[icusp][2]):
+                    if ef2_c[icusp][n]<>NULL:
+                        sage_free(ef2_c[icusp][n])
+                sage_free(ef2_c[icusp])
+        sage_free(ef2_c)
+    if nvec<>NULL:
+        for icusp in range(nc):
+            if nvec[icusp]<>NULL:
+                sage_free(nvec[icusp])
+        sage_free(nvec)
+    if row_cusp<>NULL:
+        sage_free(row_cusp)
+    if row_n<>NULL:
+        sage_free(row_n)
+    if cusp_offsets<>NULL:
+        sage_free(cusp_offsets)
+    return 0
+
+@cython.cdivision(True)
+@cython.boundscheck(False)
+cdef int setV_kbes_row(double complex ****ckbes,
+                       double **nvec,
+                       double ***Xpb,
+                       double ***Ypb,
+                       double complex ***Cvec,
+                       double complex *cusp_evs,
+                       int **Mv,
+                       int **Qv,
+                       int *symmetric_cusps,
+                       double R,
+                       int pref,
+                       int icusp, int jcusp, int l) nogil:
+    r"""
+    Compute sqrt(Ypb)*K_iR(2pi|l|Ypb)*e(l*Xpb)*Cvec for all pullback points
+    from cusp jcusp to cusp icusp.
+    """
+    cdef int j
+    cdef double lr,besarg,tmpr,argpb,y
+    cdef double complex ef1
+    cdef double besprec=1.0E-14
+    if icusp>0 and cusp_evs[icusp]<>0:
+        return 0
+    if l>=Mv[jcusp][2]:
+        return 0
+    lr=nvec[jcusp][l]*<double>6.2831853071795864769252867666
+    for j in range(Qv[jcusp][2]):
+        y = Ypb[icusp][jcusp][j]
+        if y==0:
+            ckbes[icusp][jcusp][l][j]=0
+            continue
+        argpb=nvec[jcusp][l]*Xpb[icusp][jcusp][j]
+        if symmetric_cusps[jcusp]==0:
+            ef1=cos(argpb)
+        elif symmetric_cusps[jcusp]==1:
+            ef1=_Complex_I*sin(argpb)
+        else:
+            ef1=cexp(argpb*_Complex_I)
+        if lr<>0.0:
+            besarg=fabs(lr)*y
+            besselk_dp_c(&tmpr,R,besarg,besprec,pref)
+            tmpr=sqrt(y)*tmpr
+        else:
+            tmpr=<double>1.0
+        ckbes[icusp][jcusp][l][j]=tmpr*ef1*Cvec[icusp][jcusp][j]
+    return 0
+
+@cython.cdivision(True)
+@cython.boundscheck(False)
+cdef int setV_row(double complex **V,
+                  double complex ****ckbes,
+                  double complex ***ef2_c,
+                  double **nvec,
+                  int **Mv,
+                  int **Qv,
+                  int *cusp_offsets,
+                  double complex *cusp_evs,
+                  double ***Ypb,
+                  double *Qfak,
+                  double R,
+                  double Y2pi,
+                  double sqrtY,
+                  int pref,
+                  int nc,
+                  int cuspidal,
+                  int ni, int icusp, int n) nogil:
+    r"""
+    Set the row ni, corresponding to the coefficient n at cusp icusp, of the matrix V.
+    """
+    cdef int jcusp,l,lj,j,offset
+    cdef double kbes,nr
+    cdef double besprec=1.0E-14
+    cdef double complex s,cuspev
+    nr=fabs(nvec[icusp][n])
+    if nr==0.0 and cuspidal==1:
+        return 0
+    for jcusp in range(nc):
+        if jcusp>0 and cusp_evs[jcusp]<>0:
+            offset=0; cuspev=cusp_evs[jcusp]
+        else:
+            offset=cusp_offsets[jcusp]; cuspev=1.0
+        for l in range(Mv[jcusp][2]):
+            if nvec[jcusp][l]==0 and cuspidal==1:
+                continue
+            s=0
+            for j in range(Qv[jcusp][2]):
+                if Ypb[icusp][jcusp][j]==0:
+                    continue
+                s=s+ckbes[icusp][jcusp][l][j]*ef2_c[icusp][n][j]
+            lj=offset+l
+            V[ni][lj]=V[ni][lj]+s*cuspev
+    for jcusp in range(nc):
+        if jcusp>0 and cusp_evs[jcusp]<>0:
+            continue
+        for l in range(Mv[jcusp][2]):
+            lj=cusp_offsets[jcusp]+l
+            V[ni][lj]=V[ni][lj]/<double complex>Qfak[jcusp]
+    if nr==0.0:
+        kbes=<double>1.0
+    else:
+        besselk_dp_c(&kbes,R,nr*Y2pi,besprec,pref)
+        kbes=sqrtY*kbes
+    V[ni][ni]=V[ni][ni] - kbes
+    return 0
+
 @cython.cdivision(True)
 cdef int SMAT_cplx_par_dp(double complex** U,int N,int num_rhs,int num_set,double complex **C,double complex** values,int* setc,int ncpus):
     r"""
@@ -3952,6 +3952,18 @@ class HeckeTriangleGroup(SageObject):
 
     def __repr__(self):
         return 'Hecke Triangle group G_{0}'.format(self._q)
+
+    def _get_uid(self):
+        r"""
+        Return a unique identifier (string) for the group.
+
+        EXAMPLES::
+
+            sage: G=HeckeTriangleGroup(5)
+            sage: G._get_uid()
+            'HeckeTriangleGroup-5-53'
+        """
+        return 'HeckeTriangleGroup-{0}-{1}'.format(self._q,self._prec)
         
     def closest_cusp(self,x,y,vertex=0):
         if vertex==1:
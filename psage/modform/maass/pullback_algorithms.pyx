@@ -69,6 +69,195 @@ from psage.modules.vector_real_mpfr_dense cimport Vector_real_mpfr_dense
 from mysubgroups_alg cimport pullback_to_Gamma0N_mpfr_c,normalize_point_to_cusp_mpfr_c,_normalize_point_to_cusp_dp,_normalize_point_to_cusp_real_dp,SL2Z_elt,_normalize_point_to_cusp_mpfr,closest_vertex_dp_c
 
 import mpmath
+import os
+import numpy as np
+cimport numpy as cnp
+from libc.string cimport memcpy,memset
+from pullback_cache import PullbackCache
+
+cdef extern from "mpfr.h":
+    int mpfr_set_z_2exp(mpfr_t rop, mpz_t op, long e, mpfr_rnd_t rnd)
+
+## A persistent cache of pullback points (None means that no cache is used).
+## By default the directory given by the environment variable PSAGE_PULLBACK_CACHE is used.
+_pullback_cache = None
+if os.environ.get('PSAGE_PULLBACK_CACHE'):
+    try:
+        _pullback_cache = PullbackCache(os.environ['PSAGE_PULLBACK_CACHE'])
+    except OSError:
+        _pullback_cache = None
+
+def set_pullback_cache(directory=None):
+    r"""
+    Set the directory used to cache pullback points on disk.
+
+    INPUT:
+
+    - ``directory`` -- string or None (None disables the cache)
+
+    OUTPUT:
+
+    - the PullbackCache object or None
+
+    EXAMPLES::
+
+        sage: from psage.modform.maass.pullback_algorithms import set_pullback_cache,get_pullback_cache
+        sage: C = set_pullback_cache(tmp_dir())
+        sage: get_pullback_cache() is C
+        True
+        sage: set_pullback_cache(None)
+
+    """
+    global _pullback_cache
+    if directory is None:
+        _pullback_cache = None
+    elif isinstance(directory,PullbackCache):
+        _pullback_cache = directory
+    else:
+        _pullback_cache = PullbackCache(directory)
+    return _pullback_cache
+
+def get_pullback_cache():
+    r"""
+    Return the current cache of pullback points (or None).
+    """
+    return _pullback_cache
+
+## Binary format for multiprecision pullback data:
+## header: 'PSAGEPB1' followed by prec, nc and Ql as 32-bit integers
+## and then one record of 9+(prec+7)/8 bytes for each real number:
+## a flag (0: zero, 1: positive, 2: negative, 3: nan/inf), the 64-bit exponent
+## and the mantissa as little-endian bytes (see mpfr_get_z_exp).
+_PB_MAGIC = 'PSAGEPB1'
+
+cdef char* _mpfr_to_buf(char* p,mpfr_t x,int nbytes,mpz_t z):
+    cdef long long e = 0
+    cdef size_t cnt = 0
+    memset(p,0,9+nbytes)
+    if mpfr_zero_p(x):
+        p[0]=0
+    elif not mpfr_number_p(x):
+        p[0]=3
+    else:
+        e = mpfr_get_z_exp(z,x)
+        if mpz_sgn(z)<0:
+            p[0]=2
+            mpz_neg(z,z)
+        else:
+            p[0]=1
+        if (mpz_sizeinbase(z,2)+7)/8>nbytes:
+            return NULL
+        mpz_export(p+9,&cnt,-1,1,0,0,z)
+    memcpy(p+1,&e,8)
+    return p+9+nbytes
+
+cdef char* _buf_to_mpfr(char* p,mpfr_t x,int nbytes,mpz_t z):
+    cdef long long e = 0
+    memcpy(&e,p+1,8)
+    if p[0]==0:
+        mpfr_set_ui(x,0,rnd_re)
+    elif p[0]==3:
+        mpfr_set_nan(x)
+    else:
+        mpz_import(z,nbytes,-1,1,0,0,p+9)
+        if p[0]==2:
+            mpz_neg(z,z)
+        mpfr_set_z_2exp(x,z,<long>e,rnd_re)
+    return p+9+nbytes
+
+cdef _pack_pullback_mpc(int prec,int nc,int Ql,mpfr_t* Xm,mpfr_t*** Xpb,mpfr_t*** Ypb,mpc_t ***Cvec):
+    r"""
+    Pack multiprecision pullback data into a string. Returns None if some number
+    has a larger precision than prec.
+    """
+    import struct
+    cdef int nbytes = (prec+7)/8
+    cdef int nrec = Ql+4*nc*nc*Ql
+    cdef int i,j,n
+    cdef char* buf
+    cdef char* p
+    cdef mpz_t z
+    buf = <char*>sage_malloc(sizeof(char)*(9+nbytes)*nrec)
+    if buf==NULL: raise MemoryError
+    mpz_init(z)
+    p = buf
+    for n from 0<=n<Ql:
+        if p<>NULL: p = _mpfr_to_buf(p,Xm[n],nbytes,z)
+    for i from 0<=i<nc:
+        for j from 0<=j<nc:
+            for n from 0<=n<Ql:
+                if p<>NULL: p = _mpfr_to_buf(p,Xpb[i][j][n],nbytes,z)
+                if p<>NULL: p = _mpfr_to_buf(p,Ypb[i][j][n],nbytes,z)
+                if p<>NULL: p = _mpfr_to_buf(p,mpc_realref(Cvec[i][j][n]),nbytes,z)
+                if p<>NULL: p = _mpfr_to_buf(p,mpc_imagref(Cvec[i][j][n]),nbytes,z)
+    mpz_clear(z)
+    if p==NULL:
+        sage_free(buf)
+        return None
+    res = _PB_MAGIC + struct.pack('<iii',prec,nc,Ql) + buf[:(9+nbytes)*nrec]
+    sage_free(buf)
+    return res
+
+cdef int _unpack_pullback_mpc(data,int prec,int nc,int Ql,mpfr_t* Xm,mpfr_t*** Xpb,mpfr_t*** Ypb,mpc_t ***Cvec) except -1:
+    r"""
+    Unpack data written by _pack_pullback_mpc. Returns 0 if ok and 1 if the data
+    does not have the expected format.
+    """
+    import struct
+    cdef int nbytes = (prec+7)/8
+    cdef int nrec = Ql+4*nc*nc*Ql
+    cdef int hl = len(_PB_MAGIC)+12
+    cdef int i,j,n
+    cdef char* p
+    cdef mpz_t z
+    if len(data)<>hl+(9+nbytes)*nrec or data[:len(_PB_MAGIC)]<>_PB_MAGIC:
+        return 1
+    if struct.unpack('<iii',data[len(_PB_MAGIC):hl])<>(prec,nc,Ql):
+        return 1
+    p = data
+    p = p + hl
+    mpz_init(z)
+    for n from 0<=n<Ql:
+        p = _buf_to_mpfr(p,Xm[n],nbytes,z)
+    for i from 0<=i<nc:
+        for j from 0<=j<nc:
+            for n from 0<=n<Ql:
+                p = _buf_to_mpfr(p,Xpb[i][j][n],nbytes,z)
+                p = _buf_to_mpfr(p,Ypb[i][j][n],nbytes,z)
+                p = _buf_to_mpfr(p,mpc_realref(Cvec[i][j][n]),nbytes,z)
+                p = _buf_to_mpfr(p,mpc_imagref(Cvec[i][j][n]),nbytes,z)
+    mpz_clear(z)
+    return 0
+
+cdef _pullback_cache_key_mpfr(S,int Qs,int Qf,mpfr_t Y,kind):
+    cdef int prec = mpfr_get_prec(Y)
+    cdef RealNumber y = RealField(prec)(0)
+    mpfr_set(y.value,Y,rnd_re)
+    return _pullback_cache.key(S,Qs,Qf,y.exact_rational(),prec,kind)
+
+cdef _pullback_cache_load_mpc(S,int Qs,int Qf,mpfr_t Y,kind,mpfr_t* Xm,mpfr_t*** Xpb,mpfr_t*** Ypb,mpc_t ***Cvec):
+    r"""
+    Returns the cache key and 0 if the data was read from the cache and 1 otherwise.
+    """
+    cdef int prec = mpfr_get_prec(Y)
+    cdef int nc = S.group().ncusps()
+    key = _pullback_cache_key_mpfr(S,Qs,Qf,Y,kind)
+    data = _pullback_cache.load_mp(key)
+    if data is None:
+        return key,1
+    return key,_unpack_pullback_mpc(data,prec,nc,Qf-Qs+1,Xm,Xpb,Ypb,Cvec)
+
+cdef _pullback_cache_store_mpc(S,int Qs,int Qf,mpfr_t Y,key,mpfr_t* Xm,mpfr_t*** Xpb,mpfr_t*** Ypb,mpc_t ***Cvec):
+    cdef int nc = S.group().ncusps()
+    data = _pack_pullback_mpc(mpfr_get_prec(Y),nc,Qf-Qs+1,Xm,Xpb,Ypb,Cvec)
+    if data is None:
+        return
+    try:
+        _pullback_cache.store_mp(key,data)
+    except (IOError,OSError) as e:
+        ## The cache is only an optimization so we don't fail here.
+        if S._verbose>0:
+            print "Could not store pullback points: ",e
 
 
 cpdef pullback_pts_dp(S,int Qs,int Qf,double Y,double weight=0,holo=False):
@@ -154,8 +343,58 @@ cpdef pullback_pts_dp(S,int Qs,int Qf,double Y,double weight=0,holo=False):
                 sage_free(Cvec_t[i])
         sage_free(Cvec_t)
     return pb
+cdef int pullback_pts_cplx_dp(S,int Qs,int Qf,double Y,double *Xm,double *** Xpb,double*** Ypb,double complex ***Cvec) except -1:
+    r"""
+    Computes a whole array of pullbacked points using double precision.
+    If a pullback cache is set (see set_pullback_cache) the points are
+    read from, or stored in, the cache. See _pullback_pts_cplx_dp_nocache
+    for the description of the parameters.
+    """
+    if _pullback_cache is None:
+        return _pullback_pts_cplx_dp_nocache(S,Qs,Qf,Y,Xm,Xpb,Ypb,Cvec)
+    cdef int i,j,n,res
+    cdef int Ql = Qf-Qs+1
+    cdef int nc = S.group().ncusps()
+    cdef cnp.ndarray[cnp.float64_t,ndim=1] xm_a
+    cdef cnp.ndarray[cnp.float64_t,ndim=3] xpb_a,ypb_a
+    cdef cnp.ndarray[cnp.complex128_t,ndim=3] cvec_a
+    key = _pullback_cache.key(S,Qs,Qf,float(Y).hex(),53,'cplx_dp')
+    data = _pullback_cache.load_dp(key)
+    if data is not None and data['xm'].shape==(Ql,) and data['cvec'].shape==(nc,nc,Ql):
+        xm_a = data['xm']; xpb_a = data['xpb']; ypb_a = data['ypb']; cvec_a = data['cvec']
+        for n from 0<=n<Ql:
+            Xm[n]=xm_a[n]
+        for i from 0<=i<nc:
+            for j from 0<=j<nc:
+                for n from 0<=n<Ql:
+                    Xpb[i][j][n]=xpb_a[i,j,n]
+                    Ypb[i][j][n]=ypb_a[i,j,n]
+                    Cvec[i][j][n]=cvec_a[i,j,n]
+        return 0
+    res = _pullback_pts_cplx_dp_nocache(S,Qs,Qf,Y,Xm,Xpb,Ypb,Cvec)
+    if res<>0:
+        return res
+    xm_a = np.empty(Ql,dtype=np.float64)
+    xpb_a = np.empty((nc,nc,Ql),dtype=np.float64)
+    ypb_a = np.empty((nc,nc,Ql),dtype=np.float64)
+    cvec_a = np.empty((nc,nc,Ql),dtype=np.complex128)
+    for n from 0<=n<Ql:
+        xm_a[n]=Xm[n]
+    for i from 0<=i<nc:
+        for j from 0<=j<nc:
+            for n from 0<=n<Ql:
+                xpb_a[i,j,n]=Xpb[i][j][n]
+                ypb_a[i,j,n]=Ypb[i][j][n]
+                cvec_a[i,j,n]=Cvec[i][j][n]
+    try:
+        _pullback_cache.store_dp(key,xm_a,xpb_a,ypb_a,cvec_a)
+    except (IOError,OSError) as e:
+        if S._verbose>0:
+            print "Could not store pullback points: ",e
+    return res
+
 @cython.cdivision(True)
-cdef int pullback_pts_cplx_dp(S,int Qs,int Qf,double Y,double *Xm,double *** Xpb,double*** Ypb,double complex ***Cvec):
+cdef int _pullback_pts_cplx_dp_nocache(S,int Qs,int Qf,double Y,double *Xm,double *** Xpb,double*** Ypb,double complex ***Cvec):
     r""" Computes a whole array of pullbacked points using double precision
 
     INPUT:
@@ -1747,8 +1986,26 @@ cpdef pullback_pts_mp(S,int Qs,int Qf,RealNumber Y,int holo=0):
         sage_free(CSvec_t)
     return pb
 
+cdef int pullback_pts_mpc_new_c(S,int Qs,int Qf,mpfr_t Y, mpfr_t* Xm,mpfr_t*** Xpb, mpfr_t*** Ypb,mpc_t ***Cvec) except -1:
+    r"""
+    Computes a whole array of pullbacked points using MPFR/MPC types.
+    If a pullback cache is set (see set_pullback_cache) the points are
+    read from, or stored in, the cache. See _pullback_pts_mpc_new_c_nocache
+    for the description of the parameters.
+    """
+    if _pullback_cache is None:
+        return _pullback_pts_mpc_new_c_nocache(S,Qs,Qf,Y,Xm,Xpb,Ypb,Cvec)
+    cdef int res
+    key,res = _pullback_cache_load_mpc(S,Qs,Qf,Y,'mpc',Xm,Xpb,Ypb,Cvec)
+    if res==0:
+        return 0
+    res = _pullback_pts_mpc_new_c_nocache(S,Qs,Qf,Y,Xm,Xpb,Ypb,Cvec)
+    if res==0:
+        _pullback_cache_store_mpc(S,Qs,Qf,Y,key,Xm,Xpb,Ypb,Cvec)
+    return res
+
 @cython.cdivision(True)
-cdef int pullback_pts_mpc_new_c(S,int Qs,int Qf,mpfr_t Y, mpfr_t* Xm,mpfr_t*** Xpb, mpfr_t*** Ypb,mpc_t ***Cvec):
+cdef int _pullback_pts_mpc_new_c_nocache(S,int Qs,int Qf,mpfr_t Y, mpfr_t* Xm,mpfr_t*** Xpb, mpfr_t*** Ypb,mpc_t ***Cvec):
 
     r""" Computes a whole array of pullbacked points-
          using MPFR/MPC types.
@@ -2541,8 +2798,25 @@ cdef int pullback_pts_mpc_new_c_sym(S,int Qs,int Qf,mpfr_t Y, mpfr_t* Xm,mpfr_t*
     mpfr_clear(YY)
     return 0
 
+cdef int pullback_pts_hecke_triangle_mpc_new_c(S,int Qs,int Qf,RealNumber Y, mpfr_t* Xm,mpfr_t*** Xpb, mpfr_t*** Ypb,mpc_t ***Cvec) except -1:
+    r"""
+    Computes a whole array of pullbacked points using MPFR/MPC types for
+    Hecke triangle groups, using the pullback cache if it is set.
+    See _pullback_pts_hecke_triangle_mpc_new_c_nocache.
+    """
+    if _pullback_cache is None:
+        return _pullback_pts_hecke_triangle_mpc_new_c_nocache(S,Qs,Qf,Y,Xm,Xpb,Ypb,Cvec)
+    cdef int res
+    key,res = _pullback_cache_load_mpc(S,Qs,Qf,Y.value,'hecke_triangle_mpc',Xm,Xpb,Ypb,Cvec)
+    if res==0:
+        return 0
+    res = _pullback_pts_hecke_triangle_mpc_new_c_nocache(S,Qs,Qf,Y,Xm,Xpb,Ypb,Cvec)
+    if res==0:
+        _pullback_cache_store_mpc(S,Qs,Qf,Y.value,key,Xm,Xpb,Ypb,Cvec)
+    return res
+
 @cython.cdivision(True)
-cdef int pullback_pts_hecke_triangle_mpc_new_c(S,int Qs,int Qf,RealNumber Y, mpfr_t* Xm,mpfr_t*** Xpb, mpfr_t*** Ypb,mpc_t ***Cvec):
+cdef int _pullback_pts_hecke_triangle_mpc_new_c_nocache(S,int Qs,int Qf,RealNumber Y, mpfr_t* Xm,mpfr_t*** Xpb, mpfr_t*** Ypb,mpc_t ***Cvec):
 
     r""" Computes a whole array of pullbacked points-
          using MPFR/MPC types. For Hecke triangle groups
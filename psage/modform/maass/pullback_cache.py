@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+#*****************************************************************************
+#  Copyright (C) 2010 Fredrik Strömberg <stroemberg@mathematik.tu-darmstadt.de>,
+#
+#  Distributed under the terms of the GNU General Public License (GPL)
+#
+#    This code is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    General Public License for more details.
+#
+#  The full text of the GPL is available at:
+#
+#                  http://www.gnu.org/licenses/
+#*****************************************************************************
+r"""
+A persistent on-disk cache of pullback points.
+
+The pullback of the horocycle at height Y only depends on the group, the sampling
+points (Qs,Qf), Y, the working precision and (through the multiplier factors Cvec)
+the weight and multiplier system of the space. The data is stored under a
+content-addressed name, i.e. the SHA1 hash of all these parameters, so that
+several processes can share the same directory.
+
+Double precision data is stored as NumPy .npy files which are memory-mapped
+when read. Multiprecision (MPFR) data is stored in a compact binary format,
+see pullback_algorithms.pyx, with the mantissa of each number as raw limbs.
+
+All files are first written to a temporary file and then renamed so that
+a reader never sees a partially written file.
+
+EXAMPLES::
+
+    sage: from psage.modform.maass.pullback_algorithms import set_pullback_cache,pullback_pts_dp
+    sage: C = set_pullback_cache(tmp_dir())
+    sage: M = MaassWaveForms(Gamma0(5))
+    sage: pb = pullback_pts_dp(M,-9,10,0.1)   # computed and stored
+    sage: pb = pullback_pts_dp(M,-9,10,0.1)   # read from disk
+    sage: C.stats()['hits']
+    1
+
+"""
+
+import os
+import hashlib
+import tempfile
+import numpy as np
+
+## Increase this if the layout of the stored data is changed.
+PULLBACK_CACHE_VERSION = 1
+
+
+class PullbackCache(object):
+    r"""
+    A directory of cached pullback points.
+    """
+    def __init__(self, directory):
+        r"""
+        INPUT:
+
+        - ``directory`` -- string (the directory is created if it does not exist)
+        """
+        directory = os.path.abspath(os.path.expanduser(directory))
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                ## Could have been created by another process in the meantime.
+                if not os.path.isdir(directory):
+                    raise
+        self._dir = directory
+        self._hits = 0
+        self._misses = 0
+
+    def __repr__(self):
+        return "Cache of pullback points in {0}".format(self._dir)
+
+    def directory(self):
+        return self._dir
+
+    def stats(self):
+        r"""
+        Return a dictionary with the number of hits and misses.
+        """
+        return {'hits': self._hits, 'misses': self._misses}
+
+    def key(self, S, Qs, Qf, Y, prec, kind):
+        r"""
+        Return the key (a hex string) of the pullback points of the space S.
+
+        INPUT:
+
+        - ``S`` -- space of automorphic forms
+        - ``Qs``, ``Qf`` -- integers
+        - ``Y`` -- string (an exact representation of the height Y)
+        - ``prec`` -- integer (bits of precision)
+        - ``kind`` -- string (which algorithm produced the data)
+        """
+        G = S.group()
+        data = (PULLBACK_CACHE_VERSION, kind, type(S).__name__, G._get_uid(),
+                int(Qs), int(Qf), str(Y), int(prec),
+                str(S.weight()), str(S.multiplier()), bool(S.is_holomorphic()))
+        return hashlib.sha1(repr(data)).hexdigest()
+
+    def _path(self, key, name):
+        return os.path.join(self._dir, "{0}-{1}".format(key, name))
+
+    def _write_atomic(self, path, writer):
+        fd, tmp = tempfile.mkstemp(dir=self._dir, prefix=".tmp-")
+        try:
+            f = os.fdopen(fd, 'wb')
+            try:
+                writer(f)
+            finally:
+                f.close()
+            os.rename(tmp, path)
+        except:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def load_dp(self, key):
+        r"""
+        Return a dictionary with (memory-mapped) arrays 'xm', 'xpb', 'ypb' and 'cvec'
+        or None if the key is not in the cache.
+        """
+        res = {}
+        for name in ['xm', 'xpb', 'ypb', 'cvec']:
+            path = self._path(key, name + ".npy")
+            if not os.path.exists(path):
+                self._misses += 1
+                return None
+            try:
+                res[name] = np.load(path, mmap_mode='r')
+            except (IOError, ValueError):
+                ## A corrupt file is treated as a miss (it is rewritten later).
+                self._misses += 1
+                return None
+        self._hits += 1
+        return res
+
+    def store_dp(self, key, xm, xpb, ypb, cvec):
+        r"""
+        Store double precision pullback data. The 'xm' array is written last
+        and is used by load_dp to decide if the entry exists.
+        """
+        data = [('cvec', np.asarray(cvec, dtype=np.complex128)),
+                ('xpb', np.asarray(xpb, dtype=np.float64)),
+                ('ypb', np.asarray(ypb, dtype=np.float64)),
+                ('xm', np.asarray(xm, dtype=np.float64))]
+        for name, arr in data:
+            self._write_atomic(self._path(key, name + ".npy"),
+                               lambda f: np.save(f, arr))
+
+    def load_mp(self, key):
+        r"""
+        Return the binary multiprecision data or None if the key is not in the cache.
+        """
+        path = self._path(key, "mp.bin")
+        if not os.path.exists(path):
+            self._misses += 1
+            return None
+        f = open(path, 'rb')
+        try:
+            data = f.read()
+        finally:
+            f.close()
+        self._hits += 1
+        return data
+
+    def store_mp(self, key, data):
+        r"""
+        Store binary multiprecision data.
+        """
+        self._write_atomic(self._path(key, "mp.bin"), lambda f: f.write(data))
+
+    def clear(self):
+        r"""
+        Remove all cached files.
+        """
+        for fn in os.listdir(self._dir):
+            if fn.endswith(".npy") or fn.endswith("mp.bin"):
+                os.unlink(os.path.join(self._dir, fn))
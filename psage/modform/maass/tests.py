@@ -35,6 +35,44 @@ def test_construction_of_space(N=1):
     M = MaassWaveForms(N)
     M.get_element_in_range(9,10)
 
+def test_threaded_V(N=1):
+    r"""
+    Check that the matrix V set up in parallel (OpenMP) agrees with the
+    one set up by a single thread.
+    """
+    from psage.modform.maass.maass_forms_alg import get_coeff_fast_cplx_dp
+    M = MaassWaveForms(N)
+    NN = M.set_norm(1)
+    R = 9.53369526135
+    V0 = get_coeff_fast_cplx_dp(M,R,0.5,10,0,NN,gr=1,threads=0)
+    V1 = get_coeff_fast_cplx_dp(M,R,0.5,10,0,NN,gr=1,threads=4)
+    assert V0.nrows()==V1.nrows() and V0.ncols()==V1.ncols()
+    assert max([abs(V0[i,j]-V1[i,j]) for i in range(V0.nrows()) for j in range(V0.ncols())])<1E-12
+
+def test_kbessel_table(N=1):
+    r"""
+    Check the interpolated K-Bessel functions against besselk_dp, both
+    directly and through the matrix V set up with a table.
+    """
+    from psage.modform.maass.lpkbessel import KBesselTable,besselk_dp
+    from psage.modform.maass.maass_forms_alg import get_coeff_fast_cplx_dp
+    R0 = 9.53369526135
+    xs = [0.1*k for k in range(1,80)]
+    T = KBesselTable(R0,0.05,xs)
+    assert T.error_estimate()<1E-12
+    for R in [R0-0.05,R0-0.02,R0,R0+0.01,R0+0.05]:
+        for x in xs:
+            assert abs(T(R,x)-besselk_dp(R,x,pref=1))<1E-12
+    M = MaassWaveForms(N)
+    NN = M.set_norm(1)
+    kbes_cache = {}
+    for R in [R0,R0+0.01]:
+        V0 = get_coeff_fast_cplx_dp(M,R,0.5,10,0,NN,gr=1)
+        V1 = get_coeff_fast_cplx_dp(M,R,0.5,10,0,NN,gr=1,kbes_cache=kbes_cache)
+        assert len(kbes_cache)==1
+        assert max([abs(V0[i,j]-V1[i,j]) for i in range(V0.nrows()) for j in range(V0.ncols())])<1E-10
+
+
 def test_group_list():
     l=get_list_of_valid_signatures(6)
     list_all_admissable_pairs(l[0],verbose=2)
@@ -77,11 +77,12 @@ class VectorValuedModularForms(SageObject):
         if (2*k+s)%4 != 0:
             raise NotImplementedError("2k has to be congruent to -signature mod 4")
         if self._alpha3 == None:
-            M2=self._M.kernel_subgroup(2).as_ambient()[0]
-            self._alpha3  = sum([(1-a)*m for a,m in M2.values().iteritems() if a != 0])
-            self._alpha3 += sum([(1-a)*m for a,m in self._M.values().iteritems() if a != 0])
+            vals = self._M.values()
+            vals2 = self._M.two_torsion_values()
+            self._alpha3  = sum([(1-a)*m for a,m in vals2.iteritems() if a != 0])
+            self._alpha3 += sum([(1-a)*m for a,m in vals.iteritems() if a != 0])
             self._alpha3 = self._alpha3 / Integer(2)
-            self._alpha4 = 1/Integer(2)*(self._M.values()[0]+M2.values()[0]) # the codimension of SkL in MkL
+            self._alpha4 = 1/Integer(2)*(vals.get(0,0)+vals2.get(0,0)) # the codimension of SkL in MkL
         d=self._d
         m=self._m
         alpha3 = self._alpha3
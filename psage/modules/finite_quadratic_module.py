@@ -100,6 +100,8 @@ from sage.structure.all                   import Sequence
 from sage.all                             import copy,cached_method,is_even,is_odd,Sequence,prod,uniq,valuation,randrange,is_fundamental_discriminant,xmrange,QuadraticField,xgcd,CartesianProduct
 from sage.graphs.graph import DiGraph
 from sage.rings.number_field.number_field_element import NumberFieldElement
+import numpy as np
+import itertools
 
 ###################################
 ## CLASS QUAD_MODULE
@@ -1007,17 +1009,22 @@ class FiniteQuadraticModule_ambient (AbelianGroup):
     def kernel_subgroup(self,c):
         r"""
         Return the subgroup D_c={ x in D | cx=0}
-        
+
+        EXAMPLES::
+
+            sage: A = FiniteQuadraticModule('2^2.4_1.3')
+            sage: A.kernel_subgroup(2) == A.subgroup([x for x in A if 2*x == A(0)])
+            True
+            sage: A.kernel_subgroup(6) == A.subgroup([x for x in A if 6*x == A(0)])
+            True
         """
         if not c in ZZ:
             raise ValueError("c has to be an integer.")
         if gcd(c,self.order())==1:
             return self.subgroup([])
-        l=[]
-        for x in self:
-            y = c*x
-            if y==self(0):
-                l.append(x)
+        ## If f has order e then D_c is generated by the (e/gcd(e,c))*f,
+        ## where f runs through the fundamental generators.
+        l = [ f*(e//gcd(e,c)) for e,f in zip(self.elementary_divisors(),self.fgens()) ]
         return self.subgroup(l)
 
     def power_subgroup(self,c):
@@ -1025,12 +1032,9 @@ class FiniteQuadraticModule_ambient (AbelianGroup):
         Compute the subgroup D^c={c*x | x in D}
         
         """
-        l=[]
-        for x in self:
-            y = c*x
-            if y not in l:
-                l.append(y)
-        return self.subgroup(l)
+        if not c in ZZ:
+            raise ValueError("c has to be an integer.")
+        return self.subgroup([ c*f for f in self.fgens() ])
 
     def power_subset_star(self,c):
         r"""    
@@ -1270,10 +1274,21 @@ class FiniteQuadraticModule_ambient (AbelianGroup):
 ##             sage: A.values()[7/12]
 ##             2
 
-        TODO
-            Replace the code by theoretical formulas
-            using the Jordan decomposition.
-            DONE: See the values function in the class JordanDecomposition  
+        NOTE
+            For a nondegenerate module the values are computed by the closed
+            formulas of the Jordan decomposition, see JordanDecomposition.values().
+            Only degenerate modules are enumerated.
+        """
+        if self.is_nondegenerate():
+            return self.jordan_decomposition().values()
+        return self._values_naive()
+
+
+    def _values_naive( self):
+        r"""
+        Return the values of $Q(x)$ ($x \in M$) as a dictionary, computed by running
+        through all elements of self.
+        NOTE: This is slow and should only be used for degenerate modules or for testing purposes.
         """
         valueDict = {}
         
@@ -1285,15 +1300,54 @@ class FiniteQuadraticModule_ambient (AbelianGroup):
                 valueDict[v] = 1
                 
         return valueDict
+
+
+    def two_torsion_values( self):
+        r"""
+        Return the values of $Q(x)$ for $x$ in the 2-torsion subgroup $M[2]$
+        as a dictionary, see values().
+
+        EXAMPLES NONE
+        """
+        if self.is_nondegenerate():
+            return self.jordan_decomposition().two_torsion_values()
+        return self.kernel_subgroup(2).as_ambient()[0].values()
+
+
+    def gauss_sum( self, s):
+        r"""
+        If this is $(M,Q)$, return the Gauss sum
+        $$\sum_{x\in M} \exp(2\pi i s Q(x))$$
+        and $\sqrt{|M|}$, i.e. the same as naive_Gauss_sum(self,s).
+        The sum is computed from the value distribution values() and
+        is an element of the cyclotomic field of level $N$ = self.level().
+
+        EXAMPLES NONE
+        """
+        if not s in ZZ:
+            raise ValueError("s has to be an integer.")
+        N = self.level()
+        z = CyclotomicField(N).gens()[0]
+        res = 0
+        for v,m in self.values().iteritems():
+            res += m*z**(ZZ(s*v*N) % N)
+        return res,ZZ(self.order()).sqrt()
     
 
-    def subgroups( self, d = None  ):
+    def subgroups( self, d = None, isotropic = False, automorphisms = None):
         r"""
         Return a list of all subgroups of $M$ of order $d$, where $M$
         is the underlying group of self, or of all subgroups if d is not set.
 
         INPUT
             d -- integer
+            isotropic -- boolean (default False). If True, return only
+                         isotropic subgroups. Non-isotropic branches are
+                         pruned during the search (see _enumerate_subgroup_matrices()).
+            automorphisms -- list of automorphisms of self (homomorphisms or
+                         functions mapping elements of self to elements of self).
+                         If given, return only one representative of each orbit
+                         under the group generated by these automorphisms.
 
         OUTPUT
             generator for a list of FiniteQuadraticModule_subgroup of order d
@@ -1340,16 +1394,18 @@ class FiniteQuadraticModule_ambient (AbelianGroup):
             the underlying abelian group of this module
             (and whose determinants equal $self.order()/d$).
 
-        TODO
-            Find a more effective implementation.
+            If isotropic or automorphisms is set, the matrices are enumerated column by column
+            and branches are pruned as soon as possible, see _enumerate_subgroup_matrices().
+            The subgroups are then returned in a different order.
 
+        TODO
             Introduce optional arguments which allow to iterate in addition effectively
-            over all subgroups contained in or containig a certain subgroup, being isotropic etc.
-
-            One can use short cuts using e.g. that $N$ defines
-            an isotropic subgroups if and only if $N^tJN$ is half integral (where $J$ is the Gram matrix
-            w.r.t the fundamental generators of this module.
+            over all subgroups contained in or containig a certain subgroup.
         """
+        if isotropic or automorphisms is not None:
+            for U in self._subgroups_pruned( d, isotropic, automorphisms):
+                yield U
+            return
         elementary_divisors = self.elementary_divisors()
         N = len( elementary_divisors)
 
@@ -1403,6 +1459,115 @@ class FiniteQuadraticModule_ambient (AbelianGroup):
                 else:
                     # d == None means we return every subgroup
                     yield f
+
+
+    def isotropic_subgroups( self, d = None, automorphisms = None):
+        r"""
+        Return a generator over all isotropic subgroups of self (of order $d$ if d is set),
+        see subgroups().
+
+        EXAMPLES
+             sage: B.<a> = FiniteQuadraticModule( '25^-1')
+             sage: list(B.isotropic_subgroups())
+             [< 5*a >, < 0 >]
+        """
+        return self.subgroups( d, isotropic = True, automorphisms = automorphisms)
+
+
+    def _subgroups_pruned( self, d = None, isotropic = False, automorphisms = None):
+        r"""
+        Return a generator over the subgroups given by _enumerate_subgroup_matrices().
+        If automorphisms is given, only the first subgroup of each orbit is returned.
+
+        NOTE: The keys of all subgroups in the orbits of the returned subgroups are kept in memory.
+        """
+        seen = set()
+        for H in self._enumerate_subgroup_matrices( d, isotropic):
+            U = FiniteQuadraticModule_subgroup( [FiniteQuadraticModuleElement( self, x, can_coords = False) for x in H])
+            if automorphisms is None:
+                yield U
+                continue
+            key = tuple( matrix(U).list())
+            if key in seen:
+                continue
+            seen.add( key)
+            orbit = [U]
+            while len(orbit) > 0:
+                V = orbit.pop()
+                for f in automorphisms:
+                    W = FiniteQuadraticModule_subgroup( [ f(x) for x in V.gens()])
+                    k = tuple( matrix(W).list())
+                    if k not in seen:
+                        seen.add( k)
+                        orbit.append( W)
+            yield U
+
+
+    def _enumerate_subgroup_matrices( self, d = None, isotropic = False):
+        r"""
+        Return a generator over all matrices $H$ in lower Hermite normal form
+        left dividing self.__E (see subgroups()), given as lists of columns,
+        such that the order of $H\ZZ^n/E\ZZ^n$ is $d$ (if d is set) and such that
+        $H\ZZ^n/E\ZZ^n$ is isotropic (if isotropic is True).
+
+        NOTES
+            The columns are chosen from the last to the first one.
+            Since $H$ is lower triangular, the columns $c,...,n-1$ generate
+            the intersection of the subgroup with the span of $e_c,...,e_{n-1}$.
+            Hence, as soon as column $c$ is chosen we can check
+            that $e_c\cdot E_{cc}$ is in the span of the columns $c,...,n-1$,
+            that the order of the subgroup can still divide $d$ and
+            that $Q(h_c) = 0$ and $B(h_c,h_j) = 0$ for $j>c$,
+            and prune the search otherwise.
+        """
+        ed = [ Integer(e) for e in self.elementary_divisors()]
+        n = len(ed)
+        N = self.level()
+        G = [ [ Integer(t) for t in row] for row in self._integral_gram()]
+        cols = [ None for c in range(n)]
+
+        def gram( x, y):
+            return sum( x[i]*G[i][j]*y[j] for i in range(n) if x[i] != 0 for j in range(n) if y[j] != 0)
+
+        def divides( c):
+            # Solve $H_c x = E_{cc} e_c$, where $H_c$ is the lower right block of $H$.
+            x = [ ed[c]/cols[c][c] ]
+            for r in range(c+1,n):
+                s = sum( cols[c+k][r]*x[k] for k in range(len(x)))
+                if s % cols[r][r] != 0:
+                    return False
+                x.append( -s/cols[r][r])
+            return True
+
+        def is_isotropic( c):
+            h = cols[c]
+            if gram( h, h) % (2*N) != 0:
+                return False
+            for j in range(c+1,n):
+                if gram( h, cols[j]) % N != 0:
+                    return False
+            return True
+
+        def search( c, order):
+            if c < 0:
+                if d is None or order == d:
+                    yield [ list(x) for x in cols ]
+                return
+            for dc in divisors( ed[c]):
+                o = order*(ed[c]/dc)
+                if d is not None and d % o != 0:
+                    continue
+                for t in itertools.product( *[ range( cols[r][r]) for r in range(c+1,n)]):
+                    cols[c] = [0]*c + [dc] + list(t)
+                    if not divides( c):
+                        continue
+                    if isotropic and not is_isotropic( c):
+                        continue
+                    for H in search( c-1, o):
+                        yield H
+            cols[c] = None
+
+        return search( n-1, Integer(1))
         
     
     ###################################
@@ -1523,6 +1688,61 @@ class FiniteQuadraticModule_ambient (AbelianGroup):
         return self._reduce( 2 * c.dot_product( self.__J * d))
 
 
+    @cached_method
+    def _integral_gram( self):
+        r"""
+        Return the matrix $2NJ$ as a NumPy integer array, where $N$ is the level
+        and $J$ is the Gram matrix with respect to the fundamental system, so that
+        $N Q(x) = c^t (2NJ) c / 2$ and $N B(x,y) = c^t (2NJ) d$ modulo $N$.
+
+        EXAMPLES NONE
+        """
+        N = self.level()
+        G = 2*N*self.__J
+        n = G.nrows()
+        return np.array([[int(G[i,j]) for j in range(n)] for i in range(n)],dtype=np.int64).reshape(n,n)
+
+
+    def element_array( self, x = None, orders = None):
+        r"""
+        Return a FiniteQuadraticModuleElementArray, i.e. a batch of elements
+        of self stored as an integer NumPy array of coordinates with respect to
+        the fundamental system.
+
+        INPUT
+            x -- None, a list of elements of self, a one-dimensional
+                 integer array of indices or a two-dimensional integer
+                 array of coordinates w.r.t. the fundamental system.
+                 If x is None we return all elements of self (ordered by index).
+            orders -- the orders used to convert indices to coordinates
+                 (default: self.elementary_divisors()), as in cython_elt
+                 in weil_module_alg.pyx.
+
+        EXAMPLES NONE
+##             sage: A = FiniteQuadraticModule('3^-3.27^2')
+##             sage: X = A.element_array()
+##             sage: X.values() == A.values()
+##             True
+        """
+        if orders is None:
+            orders = self.elementary_divisors()
+        orders = np.array([int(m) for m in orders],dtype=np.int64)
+        if x is None:
+            x = np.arange(int(prod(orders)),dtype=np.int64)
+        if isinstance( x, (list,tuple)):
+            c = np.array([ [int(t) for t in self(y).list()] for y in x ],dtype=np.int64)
+            c = c.reshape(len(x),len(self.elementary_divisors()))
+        else:
+            x = np.asarray(x,dtype=np.int64)
+            if x.ndim == 1:
+                c = FiniteQuadraticModuleElementArray.index_to_coordinates(x,orders)
+            elif x.ndim == 2:
+                c = x
+            else:
+                raise ValueError,"Need a list of elements, an array of indices or an array of coordinates. Got x={0}".format(x)
+        return FiniteQuadraticModuleElementArray(self,c)
+
+
     # TODO: Adapt Shuichi's Jordan decomposition to implement this
     @staticmethod
     def _diagonalize( G, n):
@@ -2556,6 +2776,232 @@ class FiniteQuadraticModuleElement(AdditiveGroupElement):
     
 
 
+###################################
+## CLASS QUAD_MODULE_ELEMENT_ARRAY
+###################################
+
+
+def _gcd_array(a,b):
+    r"""
+    Return the elementwise gcd of two arrays of nonnegative integers.
+    """
+    a = np.array(a,dtype=np.int64); b = np.array(b,dtype=np.int64)
+    while b.any():
+        nz = b != 0
+        r = np.where(nz, a % np.where(nz,b,1), 0)
+        a = np.where(nz, b, a)
+        b = r
+    return a
+
+
+class FiniteQuadraticModuleElementArray(SageObject):
+    r"""
+    A batch of elements of a finite quadratic module $A$ stored as an
+    integer NumPy array of shape (m,n) whose rows are the coordinates
+    w.r.t. the fundamental system of $A$ (see A.fgens()).
+
+    The values of $Q$ and $B$ are returned as integer arrays of numerators
+    with respect to the level $N$ of $A$, i.e. an entry k stands for $k/N$
+    modulo 1. The index of an element is the index used by cython_el_index
+    and cython_elt in weil_module_alg.pyx (the first coordinate varies fastest).
+
+    EXAMPLES NONE
+##         sage: A = FiniteQuadraticModule('2^-2.3^1')
+##         sage: X = A.element_array()
+##         sage: all(X.Q()[i] == A.level()*A.Q(X[i]) for i in range(len(X)))
+##         True
+    """
+
+    def __init__( self, A, coords):
+        r"""
+        INPUT
+            A -- finite quadratic module
+            coords -- integer array of shape (m,n) of coordinates
+                      w.r.t. the fundamental system of A
+        """
+        ed = np.array([int(m) for m in A.elementary_divisors()],dtype=np.int64)
+        coords = np.asarray(coords,dtype=np.int64)
+        if coords.ndim <> 2 or coords.shape[1] <> len(ed):
+            raise ValueError,"Need an array of shape (m,{0}). Got shape {1}".format(len(ed),coords.shape)
+        self._A = A
+        self._ed = ed
+        self._level = int(A.level())
+        self._coords = coords % ed
+
+
+    @staticmethod
+    def index_to_coordinates( ix, orders):
+        r"""
+        Return the array of coordinates of the elements with the indices ix,
+        i.e. a vectorized version of cython_elt.
+        """
+        ix = np.asarray(ix,dtype=np.int64)
+        orders = np.asarray(orders,dtype=np.int64)
+        radix = np.concatenate(([1],np.cumprod(orders)[:-1])).astype(np.int64)
+        return (ix[:,None] // radix[None,:]) % orders[None,:]
+
+
+    @staticmethod
+    def coordinates_to_index( coords, orders):
+        r"""
+        Return the indices of the elements with the given coordinates,
+        i.e. a vectorized version of cython_el_index.
+        """
+        orders = np.asarray(orders,dtype=np.int64)
+        radix = np.concatenate(([1],np.cumprod(orders)[:-1])).astype(np.int64)
+        return (np.asarray(coords,dtype=np.int64) % orders).dot(radix)
+
+
+    ###################################
+    ## Introduce myself ...
+    ###################################
+
+
+    def _repr_( self):
+        return "Array of %d elements of %s" %(len(self),self._A)
+
+
+    def __len__( self):
+        return self._coords.shape[0]
+
+
+    def __getitem__( self, i):
+        r"""
+        Return the i-th element (as FiniteQuadraticModuleElement) if i is
+        an integer and an element array otherwise.
+        """
+        if isinstance( i, (int, long, Integer)):
+            return self._A( [ Integer(t) for t in self._coords[i] ] )
+        return FiniteQuadraticModuleElementArray( self._A, self._coords[i])
+
+
+    def parent( self):
+        return self._A
+
+
+    def coordinates( self):
+        r"""
+        Return a (read-only) view of the coordinates.
+        """
+        c = self._coords.view()
+        c.setflags(write=False)
+        return c
+
+
+    def indices( self, orders = None):
+        r"""
+        Return the indices of the elements, see cython_el_index.
+        """
+        if orders is None:
+            orders = self._ed
+        return FiniteQuadraticModuleElementArray.coordinates_to_index( self._coords, orders)
+
+
+    def list( self):
+        r"""
+        Return the elements as a list of FiniteQuadraticModuleElements.
+        """
+        return [ self[i] for i in range(len(self)) ]
+
+
+    ###################################
+    ## Operations
+    ###################################
+
+
+    def _other_coords( self, other):
+        if isinstance( other, FiniteQuadraticModuleElementArray):
+            if other._A is not self._A:
+                raise ValueError,"The elements have to belong to the same module."
+            return other._coords
+        if isinstance( other, FiniteQuadraticModuleElement) and other.parent() is self._A:
+            return np.array([ int(t) for t in other.list() ],dtype=np.int64)
+        raise TypeError, "cannot combine %s with %s" %(other, self)
+
+
+    def __add__( self, other):
+        return FiniteQuadraticModuleElementArray( self._A, self._coords + self._other_coords(other))
+
+
+    def __sub__( self, other):
+        return FiniteQuadraticModuleElementArray( self._A, self._coords - self._other_coords(other))
+
+
+    def __neg__( self):
+        return FiniteQuadraticModuleElementArray( self._A, -self._coords)
+
+
+    def __rmul__( self, c):
+        if not c in ZZ:
+            raise TypeError, "cannot multiply %s by %s" %(self, c)
+        ## Reduce c modulo the order of each column to avoid overflow.
+        c = np.array([ int(Integer(c) % int(e)) for e in self._ed ],dtype=np.int64)
+        coords = self._coords
+        if len(self._ed) > 0 and int(self._ed.max())**2 >= 2**63:
+            c = c.astype(object); coords = coords.astype(object)
+        return FiniteQuadraticModuleElementArray( self._A, (c * coords) % self._ed)
+
+    __mul__ = __rmul__
+
+
+    def orders( self):
+        r"""
+        Return the array of the orders of the elements.
+        """
+        o = self._ed // _gcd_array(self._coords,self._ed[None,:] + 0*self._coords)
+        res = np.ones(len(self),dtype=np.int64)
+        for j in range(o.shape[1]):
+            res = res // _gcd_array(res,o[:,j]) * o[:,j]
+        return res
+
+
+    def _gram_mod( self, m):
+        r"""
+        Return the matrix $2NJ$ (see A._integral_gram()) reduced modulo m,
+        the coordinates of self and a function converting coordinate arrays,
+        such that sums of products of the coordinates with entries of either
+        matrix (reduced modulo m) cannot overflow. Above the bound for int64
+        arrays the computation is done with Python integers.
+        """
+        G = self._A._integral_gram() % m
+        c = self._coords
+        n = max(len(self._ed),1)
+        e = int(self._ed.max()) if len(self._ed) > 0 else 1
+        if n*int(m)*max(e,int(m)) < 2**62:
+            return G, c, lambda d: d
+        return G.astype(object), c.astype(object), lambda d: d.astype(object)
+
+
+    def Q( self):
+        r"""
+        Return the array of the numerators $N Q(x) \bmod N$.
+        """
+        N = self._level
+        G, c, conv = self._gram_mod(2*N)
+        return ((((c.dot(G) % (2*N)) * c).sum(axis=1) % (2*N)) // 2).astype(np.int64)
+
+
+    def B( self, other = None):
+        r"""
+        Return the matrix of the numerators $N B(x,y) \bmod N$, where
+        $x$ runs through self and $y$ through other (default: self).
+        """
+        N = self._level
+        G, c, conv = self._gram_mod(N)
+        d = self._coords if other is None else self._other_coords(other)
+        d = conv(np.atleast_2d(d))
+        return ((c.dot(G) % N).dot(d.T) % N).astype(np.int64)
+
+
+    def values( self):
+        r"""
+        Return the values of $Q$ on the elements as a dictionary in the format of A.values().
+        """
+        N = self._level
+        cnt = np.bincount(self.Q(),minlength=N)
+        return dict( (Integer(k)/N, Integer(int(cnt[k]))) for k in range(N) if cnt[k] > 0 )
+
+
 ###################################
 ## CLASS QUAD_MODULE_SUBGROUP
 ###################################
@@ -4082,6 +4528,8 @@ def test_one_F(FQ='4_1'):
     for a in range(1,N):
         s0 = FQ.char_invariant(a)
         s1 = naive_Gauss_sum(FQ,a)
+        if FQ.gauss_sum(a) <> s1:
+            return False,a,FQ
         #print s0,s1
         if abs(CC(s0[0])*CC(s0[1])-CC(s1[0])/CC(s1[1]**2))>1e-10:
                 if verbose>0:
@@ -4201,8 +4649,8 @@ def values_test(str):
     
     # print "Position1"
 
-    Avalues = A.values()
-    b1 = valuesdict == Avalues
+    Avalues = A._values_naive()
+    b1 = valuesdict == Avalues and A.values() == Avalues
     print "Test A.values() == J.values():", b1
     
     # print "Position2"
@@ -4212,7 +4660,11 @@ def values_test(str):
     
     # print "Position3"
 
-    Atwotorsionvalues = A.kernel_subgroup(2).as_ambient()[0].values()
+    A2 = A.kernel_subgroup(2)
+    b4 = A2 == A.subgroup([x for x in A if 2*x == A(0)]) \
+         and A.power_subgroup(2) == A.subgroup([2*x for x in A])
+    print "Test kernel_subgroup(2) and power_subgroup(2):", b4
+    Atwotorsionvalues = A2.as_ambient()[0]._values_naive()
     Jtwotorsionvalues = J.two_torsion_values()
 
     b3 = Atwotorsionvalues == Jtwotorsionvalues
@@ -4225,7 +4677,72 @@ def values_test(str):
         print "A:", Atwotorsionvalues
         print "J:", Jtwotorsionvalues
 
-    return b1 and b2 and b3
+    return b1 and b2 and b3 and b4
+
+
+def kernel_subgroup_test(str, clist=[2,3,4,6,12]):
+    r"""
+    testing kernel_subgroup(c) against the subgroup of all x with c*x == 0,
+    in particular for c which are not coprime to the order
+    """
+    A = FiniteQuadraticModule(str)
+    b = True
+    for c in clist:
+        bc = A.kernel_subgroup(c) == A.subgroup([x for x in A if c*x == A(0)])
+        print "Test kernel_subgroup(%s):"%c, bc
+        b = b and bc
+    return b
+
+
+def element_array_test(str):
+    r"""
+    testing if the vectorized operations of FiniteQuadraticModuleElementArray
+    agree with the operations on single elements
+    """
+    A = FiniteQuadraticModule(str)
+    N = A.level()
+    X = A.element_array()
+    L = list(X)
+    Q = X.Q(); B = X.B(); o = X.orders(); Y = -X; Z = X + X[::-1]
+    for i in range(len(L)):
+        x = L[i]
+        if N*A.Q(x) <> Q[i] or x.order() <> o[i] or -x <> Y[i] or x+L[-1-i] <> Z[i]:
+            print "Failed for x=",x
+            return False
+        for j in range(len(L)):
+            if N*A.B(x,L[j]) <> B[i,j]:
+                print "Failed for x,y=",x,L[j]
+                return False
+    ix = X.indices()
+    b = list(ix) == range(len(L)) and X.values() == A._values_naive()
+    print "Test FiniteQuadraticModuleElementArray:", b
+    return b
+
+
+def element_array_large_level_test(str='1099511627791^2', m=20):
+    r"""
+    testing the vectorized operations of FiniteQuadraticModuleElementArray
+    on m random elements of a module whose level is so large that the
+    products of coordinates and Gram matrix entries overflow 64 bits
+    """
+    A = FiniteQuadraticModule(str)
+    N = A.level()
+    X = A.element_array(np.array([[int(ZZ.random_element(e)) for e in A.elementary_divisors()]
+                                  for i in range(m)],dtype=np.int64))
+    L = list(X)
+    c = ZZ.random_element(2**80)
+    Q = X.Q(); B = X.B(); Y = c*X
+    for i in range(len(L)):
+        x = L[i]
+        if N*A.Q(x) <> Q[i] or c*x <> Y[i]:
+            print "Failed for x=",x
+            return False
+        for j in range(len(L)):
+            if N*A.B(x,L[j]) <> B[i,j]:
+                print "Failed for x,y=",x,L[j]
+                return False
+    print "Test FiniteQuadraticModuleElementArray (large level):", True
+    return True
 
     
 def testing_routine(p):
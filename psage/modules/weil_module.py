@@ -47,7 +47,8 @@ from sage.structure.formal_sum import FormalSum
 from psage.modform.maass.mysubgroups_alg import factor_matrix_in_sl2z
 from sage.modules.vector_integer_dense import Vector_integer_dense
 from weil_module_alg import *
-from finite_quadratic_module import FiniteQuadraticModuleElement,FiniteQuadraticModule
+from finite_quadratic_module import FiniteQuadraticModuleElement,FiniteQuadraticModule,FiniteQuadraticModuleElementArray
+from collections import OrderedDict
 
 #_sage_const_3 = Integer(3);
 #_sage_const_2 = Integer(2);
@@ -62,6 +63,37 @@ from finite_quadratic_module import FiniteQuadraticModuleElement,FiniteQuadratic
 ###################################
 
 
+class _LRUCache(object):
+    r"""
+    A dictionary of bounded size which discards the least recently used item.
+    """
+    def __init__(self,maxsize=1000):
+        self._maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self,key,default=None):
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            return default
+        self._data[key] = value
+        return value
+
+    def set(self,key,value):
+        if key in self._data:
+            self._data.pop(key)
+        elif self._maxsize > 0 and len(self._data) >= self._maxsize:
+            self._data.popitem(last=False)
+        self._data[key] = value
+
+    def clear(self):
+        self._data.clear()
+
+
+
 class WeilModule (FormalSums):
     r"""
     Implements the Weil representation of the metaplectic
@@ -151,6 +183,11 @@ class WeilModule (FormalSums):
         self._basis = []
         self._dim_param={}
         self._dim_param_numeric={}
+        ## Tables for the formula and a cache of numerical matrices rho(A)
+        self._tables = None
+        self._norms_c = {}
+        self._norms_c_array = {}
+        self._rho_cache = _LRUCache(kwds.get('rho_cache_size',1000))
         #self._L = list()
         #e=WeilModuleElement(self,self._QM.list()[0])
         #for ii in range(0,self._n):
@@ -279,9 +316,17 @@ class WeilModule (FormalSums):
         """
         prec = kwds.get('prec',0)
         if prec > 0:
-            return  weil_rep_matrix_mpc(self,A[0,0],A[0,1],A[1,0],A[1,1],filter=filter,prec=prec,verbose=self._verbose)
+            if filter<>None:
+                return  weil_rep_matrix_mpc(self,A[0,0],A[0,1],A[1,0],A[1,1],filter=filter,prec=prec,verbose=self._verbose)
+            [a,b,c,d]=_entries(A)
+            key = self._rho_cache_key(a,b,c,d,prec)
+            res = self._rho_cache.get(key)
+            if res is None:
+                res = weil_rep_matrix_mpc(self,a,b,c,d,prec=prec,verbose=self._verbose)
+                self._rho_cache.set(key,res)
+            return [copy(res[0]),res[1]]
         # We only need the diagonal elements of rho(A)
-        n=len(list(self._QM))
+        n=self._n
         # Need a WeilModuleElement to compute the matrix
         e=WeilModuleElement(self._QM.gens()[0 ],self,verbose=self._verbose)
         #print "e=",e
@@ -295,6 +340,126 @@ class WeilModule (FormalSums):
         return [r,fac]
 
 
+    def matrices(self, As, prec=53):
+        r"""
+        Return the matrices rho(A) for all A in the list As.
+
+        INPUT:
+
+        - ``As`` -- list of elements of SL2Z, 2x2 integer matrices or lists [a,b,c,d]
+        - ``prec`` -- integer (default 53)
+
+        OUTPUT:
+
+        If prec=53 a list of (read-only) NumPy complex arrays rho(A), including the factor
+        sqrt(|D^c|/|D|). Otherwise a list of pairs [r,f] as returned by matrix(A,prec=prec).
+
+        The matrices are kept in a cache of the most recently used matrices (see matrix).
+
+        EXAMPLES::
+
+            sage: F = FiniteQuadraticModule('5^1')
+            sage: W = WeilModule(F)
+            sage: l = W.matrices([[1,2,3,7],[1,2,3,7],[0,-1,1,0]])
+            sage: l[0] is l[1]
+            True
+            sage: l[2].shape
+            (5, 5)
+
+        """
+        if prec<>53:
+            return [self.matrix(A,prec=prec) for A in As]
+        res=[]
+        for A in As:
+            [a,b,c,d]=_entries(A)
+            key = ('numpy',)+self._rho_cache_key(a,b,c,d,prec)
+            r = self._rho_cache.get(key)
+            if r is None:
+                r = weil_rep_matrix_np(self,a,b,c,d)
+                r.flags.writeable = False
+                self._rho_cache.set(key,r)
+            res.append(r)
+        return res
+
+    def _rho_cache_key(self,a,b,c,d,prec):
+        r"""
+        Return the key of rho(A) in the cache.
+
+        If the signature is even the Weil representation factors through SL(2,Z/lZ),
+        where l is the level, and we use A mod l. Otherwise we use A itself
+        since the canonical section of Mp(2,Z) does not factor in this way.
+        """
+        if is_even(self.signature()):
+            l = self._level
+            return (prec,a % l,b % l,c % l,d % l)
+        return (prec,a,b,c,d)
+
+    def _formula_tables(self):
+        r"""
+        Return a dictionary of NumPy integer tables used by weil_rep_matrix_np:
+
+        - 'elts' -- coordinates of the elements with respect to the generators
+        - 'orders', 'radix' -- orders of the generators and the weights giving the index of an element
+        - 'neg' -- index of -alpha
+        - 'Q' -- level*Q(alpha) mod level
+        - 'B' -- level*B(alpha,beta) mod level
+        - 'roots' -- e(k/level) for 0<=k<level
+        """
+        if self._tables is not None:
+            return self._tables
+        import numpy as np
+        n = self._n; l = self._level
+        orders = np.array(self._gen_orders,dtype=np.int64)
+        radix = np.ones(len(orders),dtype=np.int64)
+        for j in range(1,len(orders)):
+            radix[j] = radix[j-1]*orders[j-1]
+        T = {'orders':orders,'radix':radix}
+        ix = np.arange(int(n),dtype=np.int64)
+        T['elts'] = FiniteQuadraticModuleElementArray.index_to_coordinates(ix,orders)
+        T['neg'] = ((-T['elts']) % orders).dot(radix)
+        ## The same elements as self._QM(self._elt(i)), i.e. e.Q(i) and e.Bi(i,j).
+        X = self._QM.element_array(ix,orders=self._gen_orders)
+        T['Q'] = X.Q()
+        T['B'] = X.B()
+        T['roots'] = np.exp(2j*np.pi*np.arange(l)/float(l))
+        self._tables = T
+        return T
+
+    def _get_norms_alpha_c(self,c):
+        r"""
+        Return the dictionary of Q_c(alpha_c) for alpha with alpha_c in D^c* (see _get_all_norm_alpha_cs).
+
+        The values only depend on c mod the level and they are stored in a table for each c mod the level.
+        """
+        cc = self._norms_c_key(c)
+        if cc not in self._norms_c:
+            self._norms_c[cc] = self._zero._get_all_norm_alpha_cs(cc)
+        return self._norms_c[cc]
+
+    def _norms_c_key(self,c):
+        r"""
+        Return the representative of c mod the level in 1,...,level, which is
+        the key of the tables of Q_c(alpha_c) (c=0 is the same as c=level).
+        """
+        cc = c % self._level
+        if cc==0:
+            cc = self._level
+        return cc
+
+    def _get_norms_alpha_c_array(self,c):
+        r"""
+        Return the values of level*Q_c(alpha_c) mod level as a NumPy array, with -1 if alpha_c is not in D^c*.
+        """
+        import numpy as np
+        cc = self._norms_c_key(c)
+        if cc not in self._norms_c_array:
+            l = self._level
+            res = -np.ones(self._n,dtype=np.int64)
+            for i,x in self._get_norms_alpha_c(c).iteritems():
+                res[i] = int(x*l) % l
+            self._norms_c_array[cc] = res
+        return self._norms_c_array[cc]
+
     def trace(self, A):
         r"""
         Return the trace of the matrix A in Mp(2,Z) or SL(2,Z)
@@ -306,7 +471,7 @@ class WeilModule (FormalSums):
         A = SL2Z([1,2,1,3])
         """
         # We only need the diagonal elements of rho(A)
-        n=len(list(self._QM))
+        n=self._n
         filter=MatrixSpace(ZZ,n).identity_matrix()
         # Need a WeilModuleElement to compute the matrix
         e=self._zero
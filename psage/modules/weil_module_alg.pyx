@@ -42,6 +42,7 @@ from sage.rings.complex_field import ComplexField
 from sage.rings.complex_mpc cimport MPComplexNumber
 from sage.rings.complex_mpc import MPComplexField
 from sage.rings.real_mpfr cimport RealNumber
+import numpy as np
 
 cpdef cython_el_index(c, gen_orders):
     cdef long ii, jj = 0
@@ -479,7 +480,7 @@ cpdef action_of_SL2Z_formula_mpc(W,int a,int b,int c,int d,filter=None,int prec=
             xi=xi*xis[q].complex_embedding(prec)
         else:
             xi=xi*xis[q]
-    norms_c=W._get_all_norm_alpha_cs(c)
+    norms_c=W._W._get_norms_alpha_c(c)
     #norms_c_old=W._get_all_norm_alpha_cs_old(c)
     if verbose>0:
         print "xi=",xi
@@ -534,6 +535,77 @@ cpdef action_of_SL2Z_formula_mpc(W,int a,int b,int c,int d,filter=None,int prec=
     #print "12"
     return [r,fac]
 
+cpdef weil_rep_matrix_np(W,int a,int b,int c,int d):
+    r"""
+    Compute rho(A) for A=(a b // c d) as a NumPy complex array (double precision).
+
+    This is a vectorized version of action_of_SL2Z_formula_mpc using the integer
+    tables of W (see WeilModule._formula_tables). Note that, unlike the other
+    functions here, the factor sqrt(|D^c|/|D|) is included in the result.
+
+    INPUT:
+
+    - ``W`` -- WeilModule
+    - ``a``, ``b``, ``c``, ``d`` -- integers with ad-bc=1
+
+    EXAMPLES::
+
+        sage: F = FiniteQuadraticModule('5^1')
+        sage: W = WeilModule(F)
+        sage: r = weil_rep_matrix_np(W,1,2,3,7)
+        sage: r2,fac = weil_rep_matrix_mpc(W,1,2,3,7)
+        sage: max([abs(r[i,j]-complex(r2[i,j]*fac)) for i in range(5) for j in range(5)]) < 1e-12
+        True
+
+    """
+    cdef int n,level,sign,i,j
+    if a*d-b*c<>1:
+        raise ValueError,"Need matrix in SL(2,Z)!"
+    n = W._n; level = W._level
+    if c==0 or (abs(c)==1 and a==0):
+        ## The simple cases are computed directly.
+        r,fac = weil_rep_matrix_mpc(W,a,b,c,d,prec=53)
+        res = np.zeros((n,n),dtype=np.complex128)
+        for i in range(n):
+            for j in range(n):
+                res[i,j] = complex(r[i,j])
+        return res*float(fac)
+    if c<0:
+        a=-a; b=-b; c=-c; d=-d
+        sign=-1
+    else:
+        sign=1
+    e = W._zero
+    xi = complex(1)
+    xis = e._get_xis(a,b,c,d)
+    for q in xis.keys():
+        if hasattr(xis[q],"complex_embedding"):
+            xi=xi*complex(xis[q].complex_embedding(53))
+        else:
+            xi=xi*complex(xis[q])
+    if sign==-1:
+        si = complex((W._QM.sigma_invariant()**2).complex_embedding(53))
+        if is_odd(W.signature()):
+            si = si*sigma_Z_A(c,d)
+    else:
+        si = complex(1)
+    T = W._formula_tables()
+    norms = W._get_norms_alpha_c_array(c)
+    if sign==-1:
+        nbm = T['neg']
+    else:
+        nbm = np.arange(n)
+    E = T['elts']
+    ## gi[na,nb] = index of alpha_na - d*alpha_nbm
+    G = (E[:,None,:] - (d % level)*E[nbm][None,:,:]) % T['orders']
+    gi = G.dot(T['radix'])
+    ng = norms[gi]
+    arg = (a % level)*ng + (b % level)*T['B'][gi,nbm[None,:]] - ((b*d) % level)*T['Q'][nbm][None,:]
+    arg = arg % level
+    res = np.where(ng>=0, si*xi*T['roots'][arg], 0)
+    fac = (float(e._get_lenDc(c))/float(n))**0.5
+    return res*fac
+
 cpdef sigma_Z_A(c,d):
     r"""
     Return sigma(Z,A) where Z=(-1 0 // 0 -1) and A=(a b // c d)
@@ -456,26 +456,31 @@ def prime_range(long start, stop=None):
     else:
         bound = stop
     
-    from sage.all import prime_range as prime_range_ZZ
-    
-    for p in prime_range_ZZ(bound, py_ints=True):
+    from sage.all import prime_range as prime_range_ZZ, isqrt
+
+    # Split and ramified primes have norm p, so only the primes in
+    # [start, bound) are needed; this keeps the sieve small when
+    # the interval is a short piece of a large range.
+    for p in prime_range_ZZ(start, bound, py_ints=True):
         t = p % 5
         if t == 1 or t == 4:   # split
-            if p >= start:
-                # Compute a square root of 5 modulo p.
-                sr = Fl_sqrt(5, p)
-                # Find the two values of (1+sqrt(5))/2.
-                r0 = Fl_div(1+sr, 2, p)
-                r1 = p+1-r0
-                # Sort
-                if r0 > r1: r0, r1 = r1, r0
-                # Append each prime to the list
-                P = PY_NEW(Prime); P.p = p; P.r = r0; P.first = True; v.append(P)
-                P = PY_NEW(Prime); P.p = p; P.r = r1; P.first = False; v.append(P)
+            # Compute a square root of 5 modulo p.
+            sr = Fl_sqrt(5, p)
+            # Find the two values of (1+sqrt(5))/2.
+            r0 = Fl_div(1+sr, 2, p)
+            r1 = p+1-r0
+            # Sort
+            if r0 > r1: r0, r1 = r1, r0
+            # Append each prime to the list
+            P = PY_NEW(Prime); P.p = p; P.r = r0; P.first = True; v.append(P)
+            P = PY_NEW(Prime); P.p = p; P.r = r1; P.first = False; v.append(P)
         elif p == 5:   # ramified
-            if p >= start:  
-                v.append(Prime(p, 3, True))
-        else:
+            v.append(Prime(p, 3, True))
+
+    # Inert primes have norm p^2.
+    for p in prime_range_ZZ(isqrt(start), isqrt(bound)+1, py_ints=True):
+        t = p % 5
+        if t == 2 or t == 3:
             p2 = p*p
             if p2 < bound and p2 >= start:
                 v.append(Prime(p, 0, True))
@@ -53,6 +53,9 @@ from psage.modform.maass.maass_forms import scattering_determinant_sl2z,scatteri
 
 from sage.misc.sage_timeit import sage_timeit
 from sage.parallel.decorate import *
+import sage.parallel.ncpus
+import os
+import hashlib
 
 def SelbergZ(q,verbose=0,working_prec=103,digits=5,delta=1e-5,**kwds):
     return SelbergZeta(q,verbose,working_prec,digits,delta,**kwds)
@@ -513,37 +516,88 @@ class SelbergZeta(Parent):
 
         INPUT:
 
-        - 
-        """
+        - `t0`, `t1` -- real numbers. The end points of the range.
+        - `N` -- integer. The number of points.
+        - `M0` -- integer. The rank of the approximation (default: computed).
+        - `prec` -- integer. Set the working precision.
 
-        if prec>0: self.set_prec(prec,None)
-            
+        OUTPUT:
+
+        A list of the values of the rotated zeta function Z(1/2+it)*exp(i*Theta(t)/2)
+        at the points t0+(t1-t0)*i/N for 0<=i<N.
+        """
+        if prec>0: self.set_prec(None,prec)
         CF = ComplexField(self._working_prec)
         RF = CF.base_ring()
         t0 = RF(t0); t1=RF(t1)
         h = (t1-t0)/RF(N)
-        M0 = 0
-        zold = CF(1)
+        ts = [t0+h*i for i in range(N)]
         res=[]
         branch = 0
-        for i in range(N):
-            t = t0+h*i
-            znew,M1 = self.RealZ(t,M0,branch=branch)
-            res.append(znew)
-            if i==0:
-                zold=znew
-                continue
-            # if abs(znew)<0.5*h:
-            #     ## We are close to a zero and keep the current branch
-            #     branch = 0
-            # if abs(zold)<0.5*h:
-            #     ## We might have passed through a zero and if so use same branch
-            # slope = (znew-zold).real()/h
-            
-            # if abs(zold-znew)>h:
-            zold = znew
+        for t,z,err in self.values_on_line(ts,N=M0,prec=prec):
+            th = self.Theta(t,branch)
+            res.append(z*CF(0,0.5*th).exp())
         return res
 
+    def values_on_line(self,ts,sigma=0.5,N=0,Nh=0,get_digits=0,prec=0,verbose=0):
+        r"""
+        Iterate over the values of Z(sigma+it) for t in ts.
+
+        Consecutive points share the s-independent data of the matrix approximations
+        of the transfer operator (see TransferOperator.sym_approximation_data).
+        If get_digits>0 the rank of the approximation and the precision which
+        were needed at one point are used as starting values at the next point.
+
+        INPUT:
+
+        - `ts` -- an iterable of real numbers
+        - `sigma` -- real number (default 1/2)
+        - `N`, `Nh`, `get_digits`, `prec` -- see value
+
+        OUTPUT:
+
+        A generator of tuples (t,z,err) where z=Z(sigma+it) and err is the estimated error.
+
+        EXAMPLES::
+
+            sage: Z = SelbergZeta(3,working_prec=103)
+            sage: l = list(Z.values_on_line([9.5,9.6],N=20))
+            sage: len(l)
+            2
+            sage: abs(l[0][1]-Z.value(MPComplexField(103)(0.5,9.5),N=20)[0]) < 1e-20
+            True
+
+        """
+        M = N
+        pprec = prec
+        for t in ts:
+            self.set_prec(t,pprec)
+            CF = MPComplexField(self._working_prec)
+            s = CF(sigma,t)
+            if get_digits>0:
+                M = max(M,ceil(abs(t)*1.5))
+            res,param = self.value(s,N=M,Nh=Nh,checks=1,get_digits=get_digits,ret_param=1,prec=pprec,verbose=verbose)
+            if get_digits>0:
+                ## Warm start at the next point
+                M,pprec = param
+            yield t,res[0],res[2]
+
+    def values_on_grid(self,ts,sigma=0.5,N=0,get_digits=0,prec=0,ncpus=None,chunk_size=0,checkpoint_dir=None,verbose=0):
+        r"""
+        Compute the values of Z(sigma+it) for t in ts using a pool of worker processes.
+
+        See values_on_grid (the module function) for a description of the arguments.
+
+        EXAMPLES::
+
+            sage: Z = SelbergZeta(3,working_prec=103)
+            sage: l = Z.values_on_grid([9.5,9.6,9.7],N=20,ncpus=2)
+            sage: [x[0] for x in l]
+            [9.5, 9.6, 9.7]
+
+        """
+        return values_on_grid([self],ts,sigma=sigma,N=N,get_digits=get_digits,prec=prec,ncpus=ncpus,chunk_size=chunk_size,checkpoint_dir=checkpoint_dir,verbose=verbose)[0]
+
     def make_table_phi(self,prec=0,N=50,ls=1,lf=10,target_dig=0,get_times=0,outprec=63,verbose=0):
         r"""
         Produce a LaTeX table of values and error estimates of self.
@@ -919,6 +973,9 @@ class TransferOperator(Parent):
         self._setup_transfer_operator()
         self._MAXIT=100000
         self._contraction_factor = 0
+        self._sym_data = {}
+        self._sym_data_max = 8
+        self._det_L = {}
 
     def __repr__(self):
         r""" Return string representation of self.  """
@@ -1571,6 +1628,11 @@ class TransferOperator(Parent):
                 print "sym_dim=",sym_dim                
             MS=MatrixSpace(CF,sym_dim*(M+1))
             A=Matrix_complex_dense(MS,0)
+            if not (alpha_in or rhos_in):
+                ## The s-independent part is cached
+                D = self.sym_approximation_data(M,prec=prec,it=it)
+                D.fill(A,s,eps)
+                return A
             ## The question is now which intervals to use.
             if it==0:
                 alphas=[RF(0) for x in range(self._dim)]
@@ -1605,6 +1667,49 @@ class TransferOperator(Parent):
         return A
 
 
+    def sym_approximation_data(self,M,prec=0,it=1):
+        r"""
+        Return the s-independent data of the symmetrized matrix approximation of size M.
+
+        The data is cached, so that the matrix approximations at a sequence of points s,
+        e.g. along a vertical line, only need to compute the factors depending on s.
+
+        INPUT:
+
+        - `M` -- integer. The size of the finite rank approximation.
+        - `prec` -- integer (default: the precision of self). Bits of precision.
+        - `it` -- integer. The choice of intervals (see matrix_approximation).
+
+        EXAMPLES::
+
+            sage: T = TransferOperator(3)
+            sage: D = T.sym_approximation_data(10,prec=103); D
+            Data for the symmetrized approximation of size 10 of a transfer operator with 103 bits of precision
+            sage: D is T.sym_approximation_data(10,prec=103)
+            True
+
+        """
+        if prec==0:
+            prec = self._prec
+        key = (M,prec,it)
+        if key in self._sym_data:
+            return self._sym_data[key]
+        self._setup_transfer_operator(prec)
+        RF = RealField(prec)
+        if it==0:
+            alphas=[RF(0) for x in range(self._dim)]
+            rhos=[RF(1) for x in range(self._dim)]
+        elif it==1: ## Use discs from the Markov partition
+            alphas,rhos=self.get_markov_partition(itype='float',iformat='ar')
+        else:
+            alphas,rhos=self.get_contracting_discs(iformat='ar')
+        ## Only keep the data for a few sizes at a time.
+        if len(self._sym_data)>=self._sym_data_max:
+            self._sym_data = {}
+        D = SymTransferApproximation(self._Nij,M,self._q,alphas,rhos,self.lambdaq_r(prec),prec)
+        self._sym_data[key] = D
+        return D
+
     def get_eigenvalues(self,s,N=0,h=3,sym=1,delta=1e-7):
         r"""
         Return the 'verified' eigenvalues of the matrix approximation of self.
@@ -2050,25 +2155,33 @@ class TransferOperator(Parent):
         ss = CF(s.real(),s.imag())
         mp1=RF(1);mp2=RF(2);mp4=RF(4)
         twos=mp2*ss
-        llambda=self.lambdaq_r(prec)
-        if self._q==3:
-            L=mp2+self._R
-        elif self._q==4:
-            L=mp2.sqrt()+mp1
-        elif(is_even(self._q)):
-            L=(mp2+llambda)/(mp4-llambda*llambda).sqrt()
+        ## L does not depend on s and is cached for each precision.
+        if prec in self._det_L:
+            L = self._det_L[prec]
         else:
-            L=(mp2+self._R*llambda)/(mp2-llambda)
-        l=dict()
+            llambda=self.lambdaq_r(prec)
+            if self._q==3:
+                L=mp2+self._R
+            elif self._q==4:
+                L=mp2.sqrt()+mp1
+            elif(is_even(self._q)):
+                L=(mp2+llambda)/(mp4-llambda*llambda).sqrt()
+            else:
+                L=(mp2+self._R*llambda)/(mp2-llambda)
+            L = RF(L)
+            self._det_L[prec] = L
+        ## L**(-2s-2n) = L**(-2s-2n+2)*L**(-2)
+        Lm2 = L**-2
+        ln = L**(-twos)
+        ln_old = ln
         K=mp1
         for n in range(self._MAXIT):
-            pow=-twos-mp2*RF(n)
-            #print "pow[",n,"]=",pow
-            l[n]=(L**pow)
-            K=K*(mp1-l[n])
+            if n>0:
+                ln_old = ln
+                ln = ln*Lm2
+            K=K*(mp1-ln)
             if n>1:
-                err=max(abs(l[n]),abs(l[n-1]))*abs(K)
-                #print n,l[n],err
+                err=max(abs(ln),abs(ln_old))*abs(K)
                 if err<eps:
                     break
         if n > self._MAXIT-2:
@@ -2195,3 +2308,151 @@ def my_alg_sort(x,y):
     else:
         yy = y.real()
     return cmp(xx,yy)
+
+
+def values_on_grid(Zs,ts,sigma=0.5,N=0,get_digits=0,prec=0,ncpus=None,chunk_size=0,checkpoint_dir=None,verbose=0):
+    r"""
+    Compute the values of Z(sigma+it) for t in ts for several Selberg zeta functions
+    using a pool of worker processes.
+
+    The points are split into chunks of consecutive values of t and each chunk is
+    computed by one (forked) worker using SelbergZeta.values_on_line, so that the
+    state of the transfer operator is reused within a chunk. The data of the transfer
+    operators which is independent of t is computed before the workers are started.
+
+    If checkpoint_dir is given each value is appended to a file in this directory as soon as
+    it is computed. If the computation is restarted with the same arguments the values
+    already in the files are read and only the remaining points are computed.
+
+    INPUT:
+
+    - `Zs` -- list of SelbergZeta or integers q (Hecke triangle groups G_q)
+    - `ts` -- list of real numbers
+    - `sigma` -- real number (default 1/2)
+    - `N`, `get_digits`, `prec` -- see SelbergZeta.value
+    - `ncpus` -- integer (default: number of cpus)
+    - `chunk_size` -- integer (default: computed). The number of points given to a worker at a time.
+    - `checkpoint_dir` -- string (default: None)
+    - `verbose` -- integer
+
+    OUTPUT:
+
+    A list with one entry for each element of Zs (in the same order), which is
+    a list of tuples (t,z,err), where z=Z(sigma+it) and err is the estimated error.
+    These lists are in the same order as ts.
+    If a value could not be computed the corresponding entry is None.
+
+    Results and checkpoints are kept apart by the index in Zs, so Zs may contain
+    several functions for the same q (e.g. with different working precisions).
+
+    EXAMPLES::
+
+        sage: l = values_on_grid([3,4,SelbergZeta(3,working_prec=103)],[9.5,9.6],N=20,ncpus=2,checkpoint_dir=tmp_dir())
+        sage: len(l), len(l[1])
+        (3, 2)
+        sage: [x[0] for x in l[2]]
+        [9.5, 9.6]
+
+    """
+    Zs = [Z if isinstance(Z,SelbergZeta) else SelbergZeta(Z) for Z in Zs]
+    ts = list(ts)
+    if ncpus is None:
+        ncpus = sage.parallel.ncpus.ncpus()
+    if chunk_size<=0:
+        chunk_size = max(1,int(ceil(len(ts)/float(4*ncpus))))
+    if checkpoint_dir is not None:
+        checkpoint_dir = os.path.abspath(os.path.expanduser(checkpoint_dir))
+        if not os.path.isdir(checkpoint_dir):
+            os.makedirs(checkpoint_dir)
+    results = []
+    tasks = []
+    for j in range(len(Zs)):
+        Z = Zs[j]
+        results.append({})
+        if checkpoint_dir is not None:
+            prefix = _grid_checkpoint_prefix(j,Z,ts,sigma,N,get_digits,prec)
+            results[j] = _read_grid_checkpoint(checkpoint_dir,prefix,Z,prec)
+            if verbose>0:
+                print "q={0}: {1} of {2} values read from checkpoint.".format(Z._q,len(results[j]),len(ts))
+        ## Precompute the data of the transfer operator which is inherited by the workers.
+        wprec = prec if prec>0 else Z._working_prec
+        Z._transfer_operator._setup_transfer_operator(wprec)
+        if N>0:
+            Z._transfer_operator.sym_approximation_data(N,prec=wprec)
+        todo = [(i,ts[i]) for i in range(len(ts)) if i not in results[j]]
+        for c in range(0,len(todo),chunk_size):
+            tasks.append((j,todo[c:c+chunk_size]))
+    if verbose>0:
+        print "Computing {0} chunks with {1} processes.".format(len(tasks),ncpus)
+
+    @parallel(ncpus)
+    def f(j,chunk):
+        Z = Zs[j]
+        fp = None
+        if checkpoint_dir is not None:
+            prefix = _grid_checkpoint_prefix(j,Z,ts,sigma,N,get_digits,prec)
+            fp = open(os.path.join(checkpoint_dir,"{0}-{1}.txt".format(prefix,chunk[0][0])),'a')
+        res = []
+        try:
+            for k,(t,z,err) in enumerate(Z.values_on_line([x[1] for x in chunk],sigma=sigma,N=N,get_digits=get_digits,prec=prec)):
+                i = chunk[k][0]
+                res.append((i,z,float(err)))
+                if fp is not None:
+                    fp.write("{0}\t{1}\t{2}\t{3}\n".format(i,z.real(),z.imag(),float(err)))
+                    fp.flush()
+        finally:
+            if fp is not None:
+                fp.close()
+        return res
+
+    for X in f(tasks):
+        j = X[0][0][0]
+        if not isinstance(X[1],list):
+            print "Warning: a chunk of points for q={0} failed: {1}".format(Zs[j]._q,X[1])
+            continue
+        for i,z,err in X[1]:
+            results[j][i] = (z,err)
+    res = []
+    for j in range(len(Zs)):
+        res.append([])
+        for i in range(len(ts)):
+            if i in results[j]:
+                z,err = results[j][i]
+                res[j].append((ts[i],z,err))
+            else:
+                res[j].append(None)
+    return res
+
+def _grid_checkpoint_prefix(j,Z,ts,sigma,N,get_digits,prec):
+    r"""
+    Return the prefix of the checkpoint files of a grid computation
+    for the j-th function Z.
+    """
+    data = (Z._q,Z._working_prec,str(sigma),[str(t) for t in ts],int(N),int(get_digits),int(prec))
+    return "selberg_zeta-{0}-q{1}-{2}".format(j,Z._q,hashlib.sha1(repr(data)).hexdigest()[0:16])
+
+def _read_grid_checkpoint(checkpoint_dir,prefix,Z,prec=0):
+    r"""
+    Read the values stored in checkpoint files with a given prefix.
+    Incomplete lines (e.g. from a killed process) are ignored.
+    """
+    res = {}
+    CF = MPComplexField(prec if prec>0 else Z._working_prec)
+    for fn in os.listdir(checkpoint_dir):
+        if not (fn.startswith(prefix+"-") and fn.endswith(".txt")):
+            continue
+        fp = open(os.path.join(checkpoint_dir,fn))
+        try:
+            for line in fp:
+                if not line.endswith("\n"):
+                    continue
+                l = line.split()
+                if len(l)<>4:
+                    continue
+                try:
+                    res[int(l[0])] = (CF(l[1],l[2]),float(l[3]))
+                except (ValueError,TypeError):
+                    continue
+        finally:
+            fp.close()
+    return res
@@ -634,6 +634,316 @@ cdef setup_approximation_sym(mpc_t** A, int M,  mpz_t** Nij, int dim, int q, int
 
                         
 
+cdef class SymTransferApproximation(object):
+    r"""
+    The symmetrized matrix approximation of the transfer operator of size M
+    (see setup_approximation_sym) split into a part which is independent of s
+    and a part which depends on s.
+
+    The arguments x = alphas[i]/lambda+N_ij of the (Hurwitz) zeta functions,
+    their integer powers, the powers of the centers and radii of the discs and the
+    binomial coefficients do not depend on s. They are computed once here so that
+    when evaluating along a line only x**(-2s), lambda**(-2s), the Hurwitz zeta values
+    and the Pochhammer symbols (by a recursion) have to be recomputed for each s.
+    The s-dependent factors are kept for the last s, so that the matrices for eps=1
+    and eps=-1 at the same point share them.
+
+    EXAMPLES::
+
+        sage: from psage.zfunctions.selberg_z import TransferOperator
+        sage: T = TransferOperator(4)
+        sage: D = T.sym_approximation_data(10,prec=103)
+        sage: s = MPComplexField(103)(0.5,9.5)
+        sage: A = Matrix_complex_dense(MatrixSpace(s.parent(),11),0)
+        sage: D.fill(A,s,1)
+        sage: B = Matrix_complex_dense(MatrixSpace(s.parent(),11),0)
+        sage: alphas,rhos = T.get_markov_partition(itype='float',iformat='ar')
+        sage: trop_approximation(B,T.Nij(),10,4,2,2,s,T.lambdaq_r(103),approx_type=3,eps=1,alphas=alphas,rhos=rhos)
+        sage: max([abs(A[i,j]-B[i,j]) for i in range(11) for j in range(11)]) < 1e-15
+        True
+
+    """
+    cdef int _M,_dim,_sym_dim,_q,_prec,_np
+    cdef int *_sgn
+    cdef int *_hurwitz
+    cdef mpfr_t *_xinvpow
+    cdef mpfr_t *_lpow
+    cdef mpfr_t *_bapow
+    cdef mpfr_t *_rpow
+    cdef mpfr_t *_rinvpow
+    cdef mpc_t *_Z
+    cdef mpc_t *_poc
+    cdef mpfr_t _llambda
+    cdef object _x
+    cdef MPComplexNumber _s
+    cdef int _s_is_set
+
+    def __cinit__(self):
+        self._np = 0; self._M = 0; self._sym_dim = 0
+        self._sgn = NULL; self._hurwitz = NULL
+        self._xinvpow = NULL; self._lpow = NULL; self._bapow = NULL
+        self._rpow = NULL; self._rinvpow = NULL
+        self._Z = NULL; self._poc = NULL
+        self._s_is_set = 0
+
+    def __init__(self,Nij,int M,int q,alphas,rhos,RealNumber llambda,int prec):
+        r"""
+        INPUT:
+
+        - ``Nij`` -- integer matrix (of the transfer operator)
+        - ``M`` -- integer (the point of truncation of the power series)
+        - ``q`` -- integer
+        - ``alphas``, ``rhos`` -- lists of the centers and radii of the discs
+        - ``llambda`` -- real number (lambda_q)
+        - ``prec`` -- integer (bits of precision)
+        """
+        cdef int i,j,k,l,n,ii,p
+        cdef int N2 = 2*M+1, M1 = M+1
+        cdef RealNumber x,a,r
+        cdef mpfr_t tmp
+        cdef mpz_t binc
+        if M < 0:
+            raise ValueError,"Need M >= 0! Got M={0}".format(M)
+        self._M = M; self._q = q; self._prec = prec
+        self._dim = Nij.nrows()
+        self._sym_dim = self._dim / 2
+        if len(alphas)<>self._dim or len(rhos)<>self._dim:
+            raise ValueError,"Must have valid format for intervals! Got alphas={0} and rhos={1}".format(alphas,rhos)
+        self._np = 2*self._sym_dim*self._sym_dim
+        RF = RealField(prec)
+        mpfr_init2(self._llambda,prec)
+        mpfr_set(self._llambda,(<RealNumber>RF(llambda)).value,rnd_re)
+        mpfr_init2(tmp,prec)
+        mpz_init(binc)
+        self._sgn = <int*>sage_malloc(sizeof(int)*self._np)
+        self._hurwitz = <int*>sage_malloc(sizeof(int)*self._np)
+        if self._sgn==NULL or self._hurwitz==NULL: raise MemoryError
+        self._x = []
+        for i in range(self._sym_dim):
+            a = RF(alphas[i])/RF(llambda)
+            for j in range(self._sym_dim):
+                for ii in range(2):
+                    p = (i*self._sym_dim+j)*2+ii
+                    if ii==0:
+                        n = Nij[i,j]
+                        x = a + RF(n)
+                    else:
+                        n = Nij[i,self._dim-1-j]
+                        x = -a - RF(n)
+                    self._sgn[p] = 0 if n==0 else (1 if n>0 else -1)
+                    self._hurwitz[p] = 1 if j==self._sym_dim-1 else 0
+                    self._x.append(x)
+        ## x**-n, times lambda**-n if q>3
+        self._lpow = <mpfr_t*>sage_malloc(sizeof(mpfr_t)*N2)
+        if self._lpow==NULL: raise MemoryError
+        for n in range(N2):
+            mpfr_init2(self._lpow[n],prec)
+            if q<>3:
+                mpfr_pow_si(self._lpow[n],self._llambda,-n,rnd_re)
+            else:
+                mpfr_set_ui(self._lpow[n],1,rnd_re)
+        self._xinvpow = <mpfr_t*>sage_malloc(sizeof(mpfr_t)*self._np*N2)
+        if self._xinvpow==NULL: raise MemoryError
+        for p in range(self._np):
+            x = self._x[p]
+            for n in range(N2):
+                mpfr_init2(self._xinvpow[p*N2+n],prec)
+                mpfr_pow_si(self._xinvpow[p*N2+n],x.value,-n,rnd_re)
+                mpfr_mul(self._xinvpow[p*N2+n],self._xinvpow[p*N2+n],self._lpow[n],rnd_re)
+        ## binomial(k,l)*alphas[j]**(k-l)
+        self._bapow = <mpfr_t*>sage_malloc(sizeof(mpfr_t)*self._sym_dim*M1*M1)
+        self._rpow = <mpfr_t*>sage_malloc(sizeof(mpfr_t)*self._sym_dim*M1)
+        self._rinvpow = <mpfr_t*>sage_malloc(sizeof(mpfr_t)*self._sym_dim*M1)
+        if self._bapow==NULL or self._rpow==NULL or self._rinvpow==NULL: raise MemoryError
+        for j in range(self._sym_dim):
+            a = RF(alphas[j])
+            r = RF(rhos[j])
+            for k in range(M1):
+                mpfr_init2(self._rpow[j*M1+k],prec)
+                mpfr_init2(self._rinvpow[j*M1+k],prec)
+                mpfr_pow_si(self._rpow[j*M1+k],r.value,k,rnd_re)
+                mpfr_pow_si(self._rinvpow[j*M1+k],r.value,-k,rnd_re)
+                for l in range(M1):
+                    p = (j*M1+k)*M1+l
+                    mpfr_init2(self._bapow[p],prec)
+                    if l>k:
+                        mpfr_set_ui(self._bapow[p],0,rnd_re)
+                        continue
+                    mpfr_pow_si(tmp,a.value,k-l,rnd_re)
+                    mpz_bin_uiui(binc,k,l)
+                    mpfr_mul_z(self._bapow[p],tmp,binc,rnd_re)
+        ## Storage for the factors depending on s
+        self._Z = <mpc_t*>sage_malloc(sizeof(mpc_t)*self._np*N2)
+        self._poc = <mpc_t*>sage_malloc(sizeof(mpc_t)*M1*M1)
+        if self._Z==NULL or self._poc==NULL: raise MemoryError
+        for p in range(self._np*N2):
+            mpc_init2(self._Z[p],prec)
+        for p in range(M1*M1):
+            mpc_init2(self._poc[p],prec+20)
+        mpfr_clear(tmp)
+        mpz_clear(binc)
+
+    def __dealloc__(self):
+        cdef int p
+        cdef int N2 = 2*self._M+1, M1 = self._M+1
+        if self._np==0:
+            return
+        mpfr_clear(self._llambda)
+        if self._sgn<>NULL: sage_free(self._sgn)
+        if self._hurwitz<>NULL: sage_free(self._hurwitz)
+        if self._lpow<>NULL:
+            for p in range(N2):
+                mpfr_clear(self._lpow[p])
+            sage_free(self._lpow)
+        if self._xinvpow<>NULL:
+            for p in range(self._np*N2):
+                mpfr_clear(self._xinvpow[p])
+            sage_free(self._xinvpow)
+        if self._rpow<>NULL and self._rinvpow<>NULL and self._bapow<>NULL:
+            for p in range(self._sym_dim*M1):
+                mpfr_clear(self._rpow[p])
+                mpfr_clear(self._rinvpow[p])
+            for p in range(self._sym_dim*M1*M1):
+                mpfr_clear(self._bapow[p])
+        if self._rpow<>NULL: sage_free(self._rpow)
+        if self._rinvpow<>NULL: sage_free(self._rinvpow)
+        if self._bapow<>NULL: sage_free(self._bapow)
+        if self._Z<>NULL:
+            for p in range(self._np*N2):
+                mpc_clear(self._Z[p])
+            sage_free(self._Z)
+        if self._poc<>NULL:
+            for p in range(M1*M1):
+                mpc_clear(self._poc[p])
+            sage_free(self._poc)
+
+    def __repr__(self):
+        return "Data for the symmetrized approximation of size {0} of a transfer operator with {1} bits of precision".format(self._M,self._prec)
+
+    def M(self):
+        return self._M
+
+    def prec(self):
+        return self._prec
+
+    cdef _set_s(self,MPComplexNumber s):
+        r"""
+        Compute the factors of the approximation which depend on s.
+        """
+        cdef int p,n,l
+        cdef int N2 = 2*self._M+1, M1 = self._M+1
+        cdef mpc_t w,minus_twos,zarg,lam
+        cdef MPComplexNumber z
+        CF = MPComplexField(self._prec)
+        CFF = ComplexField(self._prec+20)
+        mpmath.mp.prec = self._prec
+        self._s = CF(s.real(),s.imag())
+        z = CF(0)
+        mpc_init2(w,self._prec+20); mpc_init2(minus_twos,self._prec+20)
+        mpc_init2(zarg,self._prec); mpc_init2(lam,self._prec)
+        mpc_mul_ui(minus_twos,self._s.value,2,rnd)
+        mpc_neg(minus_twos,minus_twos,rnd)
+        if self._q<>3:
+            mpc_set_fr(zarg,self._llambda,rnd)
+            mpc_pow(lam,zarg,minus_twos,rnd)
+        else:
+            mpc_set_ui(lam,1,rnd)
+        twos = CFF(2*self._s.real(),2*self._s.imag())
+        for p in range(self._np):
+            if self._sgn[p]==0:
+                continue
+            if self._hurwitz[p]==1:
+                for n in range(N2):
+                    mpz = mpmath.mp.zeta(twos+n,self._x[p])
+                    z = CF(mpz.real,mpz.imag)
+                    mpc_mul(self._Z[p*N2+n],z.value,lam,rnd)
+                    mpc_mul_fr(self._Z[p*N2+n],self._Z[p*N2+n],self._lpow[n],rnd)
+            else:
+                ## x**(-2s-n) = x**(-2s)*x**(-n) also for x < 0 since n is an integer.
+                mpc_set_fr(zarg,(<RealNumber>self._x[p]).value,rnd)
+                mpc_pow(w,zarg,minus_twos,rnd)
+                mpc_mul(w,w,lam,rnd)
+                for n in range(N2):
+                    mpc_mul_fr(self._Z[p*N2+n],w,self._xinvpow[p*N2+n],rnd)
+        ## (2s+l)_n/n! = (2s+l)_{n-1}/(n-1)! * (2s+l+n-1)/n
+        mpc_neg(minus_twos,minus_twos,rnd)
+        for l in range(M1):
+            mpc_set_ui(self._poc[l*M1],1,rnd)
+            for n in range(1,M1):
+                mpc_add_ui(w,minus_twos,l+n-1,rnd)
+                mpc_div_ui(w,w,n,rnd)
+                mpc_mul(self._poc[l*M1+n],self._poc[l*M1+n-1],w,rnd)
+        mpc_clear(w); mpc_clear(minus_twos)
+        mpc_clear(zarg); mpc_clear(lam)
+        self._s_is_set = 1
+
+    cpdef fill(self,Matrix_complex_dense A,MPComplexNumber s,int eps=1):
+        r"""
+        Set A to the symmetrized approximation at s with sign eps.
+
+        INPUT:
+
+        - ``A`` -- square Matrix_complex_dense of size sym_dim*(M+1)
+        - ``s`` -- complex number
+        - ``eps`` -- integer (1 or -1)
+        """
+        cdef int n = self._sym_dim*(self._M+1)
+        if A.nrows()<>n or A.ncols()<>n:
+            raise ValueError,"Matrix must be of size {0}x{0}!".format(n)
+        if abs(eps)<>1:
+            raise ValueError,"eps must be 1 or -1! Got eps={0}".format(eps)
+        if self._s_is_set==0 or s.prec()<>self._prec or s<>self._s:
+            self._set_s(s)
+        sig_on()
+        _fill_sym_approximation(A._matrix,self._M,self._sym_dim,eps,self._sgn,
+                                self._Z,self._poc,self._bapow,self._rpow,self._rinvpow,
+                                self._prec,rnd,rnd_re)
+        sig_off()
+
+
+cdef void _fill_sym_approximation(mpc_t** A,int M,int sym_dim,int eps,int* sgn,mpc_t* Z,mpc_t* poc,mpfr_t* bapow,mpfr_t* rpow,mpfr_t* rinvpow,int prec,mpc_rnd_t rnd,mpfr_rnd_t rnd_re) nogil:
+    r"""
+    Fill in the symmetrized approximation from the tables of SymTransferApproximation.
+    This is the main loop of setup_approximation_sym with all factors precomputed.
+    """
+    cdef int i,j,k,l,n,ii,p,ni,kj
+    cdef int N2 = 2*M+1, M1 = M+1
+    cdef mpc_t AA[2]
+    cdef mpc_t tmp
+    cdef mpfr_t fak
+    mpc_init2(AA[0],prec); mpc_init2(AA[1],prec)
+    mpc_init2(tmp,prec)
+    mpfr_init2(fak,prec)
+    for n in range(M1):
+        for k in range(M1):
+            for i in range(sym_dim):
+                for j in range(sym_dim):
+                    ni = i*M1+n
+                    kj = j*M1+k
+                    for ii in range(2):
+                        p = (i*sym_dim+j)*2+ii
+                        mpc_set_ui(AA[ii],0,rnd)
+                        if sgn[p]==0:
+                            continue
+                        for l in range(k+1):
+                            mpc_mul(tmp,poc[l*M1+n],Z[p*N2+l+n],rnd)
+                            mpc_mul_fr(tmp,tmp,bapow[(j*M1+k)*M1+l],rnd)
+                            mpc_add(AA[ii],AA[ii],tmp,rnd)
+                        if sgn[p]>0 and (n+k) % 2 == 1:
+                            mpc_neg(AA[ii],AA[ii],rnd)
+                    if (k % 2) == 1:
+                        mpc_neg(AA[1],AA[1],rnd)
+                    if eps == -1:
+                        mpc_neg(AA[1],AA[1],rnd)
+                    mpc_add(A[ni][kj],AA[0],AA[1],rnd)
+                    mpfr_mul(fak,rinvpow[j*M1+k],rpow[i*M1+n],rnd_re)
+                    mpc_mul_fr(A[ni][kj],A[ni][kj],fak,rnd)
+    mpc_clear(AA[0]); mpc_clear(AA[1])
+    mpc_clear(tmp)
+    mpfr_clear(fak)
+
+
+
 # def FE_Psi(s,q,prec=0):
 #     r"""  Compute the factor Psi in the functional equation Z(1-s)=Psi(s)*Z(s). """
 #     if hasattr(s,"prec"):
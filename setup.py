@@ -120,7 +120,9 @@ ext_modules = [
     Extension('psage.modform.maass.lpkbessel',
               ['psage/modform/maass/lpkbessel.pyx'],
               libraries = ['m', 'gmp','mpfr','mpc'],
-              include_dirs = numpy_include_dirs),
+              include_dirs = numpy_include_dirs,
+              extra_compile_args=['-fopenmp'],
+              extra_link_args=['-fopenmp']),
 
     Extension("psage.modform.rational.modular_symbol_map",
               ["psage/modform/rational/modular_symbol_map.pyx"]),
@@ -131,6 +133,7 @@ ext_modules = [
     Extension("psage.modform.hilbert.sqrt5.sqrt5_fast",
               ["psage/modform/hilbert/sqrt5/sqrt5_fast.pyx"],
               libraries = ['ntl', 'gmp'],
+              include_dirs = numpy_include_dirs,
               language = 'c++'),
 
     Extension("psage.ellcurve.lseries.sqrt5",
@@ -190,7 +193,8 @@ for g in [1, 2]:
     e = Extension('psage.libs.smalljac.wrapper%s'%g,
                   sources = ['psage/libs/smalljac/wrapper%s.pyx'%g,
                              'psage/libs/smalljac/wrapper_g%s.c'%g],
-                  libraries = ['gmp', 'm'])
+                  libraries = ['gmp', 'm'],
+                  include_dirs = numpy_include_dirs)
     ext_modules.append(e)
 ## Fredrik Stroemberg: my additional modules.
 my_extensions = [
@@ -268,7 +272,11 @@ my_extensions = [
                   libraries = ['m','gmp','mpfr','mpc'],
                   include_dirs = numpy_include_dirs),
     Extension('psage.modform.maass.lpkbessel',
-              ['psage/modform/maass/lpkbessel.pyx']),
+              ['psage/modform/maass/lpkbessel.pyx'],
+              libraries = ['m', 'gmp','mpfr','mpc'],
+              include_dirs = numpy_include_dirs,
+              extra_compile_args=['-fopenmp'],
+              extra_link_args=['-fopenmp']),
     Extension('psage.modules.vector_complex_dense',
               sources = ['psage/modules/vector_complex_dense.pyx'],
               libraries = ['m','gmp','mpfr','mpc'],